@@ -0,0 +1,58 @@
+"""Settled nodes and query time of ALT vs Dijkstra on maps without geometry
+
+Grids of plain Node intersections whose street lengths are random (travel
+times, say), so there is no coordinate-based A* heuristic to use. ALT is
+run with a growing number of landmarks; preprocessing time and the memory
+of the landmark arrays are reported with it. Query time includes computing
+the bounds for the target.
+
+Run from the repository root with: python -m bench.alt
+"""
+import random
+import time
+
+from src.components import StreetGraph
+
+
+def weighted_grid(n, rng):
+  sg = StreetGraph()
+  for x in range(n):
+    for y in range(n):
+      sg.add_node(x, y, (x, y))
+  for x in range(n):
+    for y in range(n):
+      if x + 1 < n:
+        sg.add_edge((x, y), (x + 1, y), rng.uniform(1, 10))
+      if y + 1 < n:
+        sg.add_edge((x, y), (x, y + 1), rng.uniform(1, 10))
+  return sg
+
+
+def run(sg, pairs, landmarks):
+  settled = 0
+  start = time.perf_counter()
+  for s, t in pairs:
+    if landmarks is None:
+      settled += sg._search(s, t)[2]
+    else:
+      settled += sg._search(s, t, bound = landmarks.bounds(t._id))[2]
+  return settled / len(pairs), (time.perf_counter() - start) / len(pairs) * 1e3
+
+
+if __name__ == "__main__":
+  rng = random.Random(0)
+  print("{:>8} {:>10} {:>10} {:>10} {:>10} {:>10}".format(
+    "nodes", "landmarks", "prep s", "MB", "settled", "ms/query"))
+  for side in (32, 100, 224):
+    sg = weighted_grid(side, rng)
+    pairs = [(sg._node_from_label(a), sg._node_from_label(b)) for a, b in
+             (rng.sample(sorted(sg._labels), 2) for _ in range(30))]
+    settled, ms = run(sg, pairs, None)
+    print("{:>8} {:>10} {:>10} {:>10} {:>10,.0f} {:>10.2f}".format(side * side, "dijkstra", "-", "-", settled, ms))
+    for count in (4, 8, 16):
+      start = time.perf_counter()
+      landmarks = sg.select_landmarks(count)
+      prep = time.perf_counter() - start
+      settled, ms = run(sg, pairs, landmarks)
+      print("{:>8} {:>10} {:>10.2f} {:>10.2f} {:>10,.0f} {:>10.2f}".format(
+        side * side, count, prep, landmarks.nbytes() / 1e6, settled, ms))
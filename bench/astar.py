@@ -0,0 +1,44 @@
+"""Settled nodes and query time of A* vs Dijkstra
+
+Random origin/destination pairs on grid maps whose nodes are jittered a
+little off the lattice, once with EuclideanNode and once with ManhattanNode
+geometry. A* takes its heuristic from the node class.
+
+Run from the repository root with: python -m bench.astar
+"""
+import random
+import time
+
+from src.components import StreetGraph, EuclideanNode, ManhattanNode
+
+
+def jittered_grid(n, nodeCls, rng):
+  sg = StreetGraph(nodeCls = nodeCls)
+  for x in range(n):
+    for y in range(n):
+      sg.add_node(x + rng.uniform(-0.2, 0.2), y + rng.uniform(-0.2, 0.2), (x, y))
+  for x in range(n):
+    for y in range(n):
+      if x + 1 < n:
+        sg.add_edge((x, y), (x + 1, y))
+      if y + 1 < n:
+        sg.add_edge((x, y), (x, y + 1))
+  return sg
+
+
+if __name__ == "__main__":
+  rng = random.Random(0)
+  print("{:>10} {:>8} {:>10} {:>12} {:>10}".format("nodes", "method", "geometry", "settled", "ms/query"))
+  for side in (32, 100, 224):
+    for nodeCls in (EuclideanNode, ManhattanNode):
+      sg = jittered_grid(side, nodeCls, rng)
+      pairs = [(sg._node_from_label(a), sg._node_from_label(b)) for a, b in
+               (rng.sample(sorted(sg._labels), 2) for _ in range(30))]
+      for method, estimate in (("dijkstra", None), ("astar", nodeCls.metric)):
+        settled = 0
+        start = time.perf_counter()
+        for s, t in pairs:
+          settled += sg._search(s, t, estimate)[2]
+        elapsed = (time.perf_counter() - start) / len(pairs) * 1e3
+        print("{:>10} {:>8} {:>10} {:>12,.0f} {:>10.2f}".format(
+          side * side, method, nodeCls.__name__[:-4], settled / len(pairs), elapsed))
@@ -0,0 +1,65 @@
+"""Per-event dispatch vs same-timestamp batch dispatch
+
+A fleet of cars drives on integer ticks; slow cars every other tick. In the
+per-event style every car has its own handler that advances its position.
+In the batch style one BatchHandler receives the ids of every car due at
+that instant as a NumPy array and advances them with one vectorized update.
+Both re-schedule each car individually, so the difference is the dispatch.
+
+Run from the repository root with: python -m bench.batching
+"""
+import time
+
+import numpy as np
+
+from src.discrete import Environment, BatchHandler
+
+
+def per_event(cars, ticks):
+  env = Environment()
+  position = np.zeros(cars)
+  speed = np.linspace(1, 2, cars)
+  period = 1 + np.arange(cars) % 2
+
+  def make_car(car):
+    def drive():
+      position[car] += speed[car]
+      if env.time_elapsed < ticks:
+        env.add_event(drive, period[car])
+    return drive
+
+  for car in range(cars):
+    env.add_event(make_car(car), 1)
+  return env
+
+
+def batched(cars, ticks):
+  env = Environment()
+  position = np.zeros(cars)
+  speed = np.linspace(1, 2, cars)
+  period = (1 + np.arange(cars) % 2).tolist()
+
+  def drive(ids):
+    position[ids] += speed[ids]
+    if env.time_elapsed < ticks:
+      add_event = env.add_event
+      for car in ids.tolist():
+        add_event(handler, period[car], payload = car)
+
+  handler = BatchHandler(drive, as_array = True)
+  for car in range(cars):
+    env.add_event(handler, 1, payload = car)
+  return env
+
+
+if __name__ == "__main__":
+  print("{:>8} {:>10} {:>14}".format("cars", "style", "events/sec"))
+  for cars in (1000, 10000, 100000):
+    for name, build in (("per-event", per_event), ("batched", batched)):
+      env = build(cars, 10)
+      start = time.perf_counter()
+      env.run()
+      elapsed = time.perf_counter() - start
+      # Fast cars drive at t=1..10, slow ones at t=1,3..11
+      events = (cars + 1) // 2 * 10 + cars // 2 * 6
+      print("{:>8} {:>10} {:>14,.0f}".format(cars, name, events / elapsed))
@@ -0,0 +1,45 @@
+"""Nodes settled by bidirectional vs one directional Dijkstra
+
+Long cross-city routes (between opposite edges of the map) and random
+routes on jittered grids of growing size, with the graph in its regular
+and its frozen form.
+
+Run from the repository root with: python -m bench.bidirectional
+"""
+import random
+import time
+
+from src.components import EuclideanNode
+from .astar import jittered_grid
+
+
+def run(sg, pairs, bidirectional):
+  settled = 0
+  start = time.perf_counter()
+  for origin, destination in pairs:
+    s, t = sg._key(origin), sg._key(destination)
+    if bidirectional:
+      settled += sg._bidirectional(s, t)[2]
+    else:
+      settled += sg._search(s, t)[2]
+  return settled / len(pairs), (time.perf_counter() - start) / len(pairs) * 1e3
+
+
+if __name__ == "__main__":
+  rng = random.Random(0)
+  print("{:>7} {:>7} {:>7} {:>12} {:>12} {:>10} {:>10}".format(
+    "nodes", "routes", "frozen", "uni settled", "bi settled", "uni ms", "bi ms"))
+  for side in (32, 100, 224):
+    sg = jittered_grid(side, EuclideanNode, rng)
+    routes = {
+      "across": [((0, rng.randrange(side)), (side - 1, rng.randrange(side))) for _ in range(20)],
+      "random": [tuple(rng.sample(sorted(sg._labels), 2)) for _ in range(20)],
+    }
+    for frozen in (False, True):
+      if frozen:
+        sg.freeze()
+      for name, pairs in routes.items():
+        uni, uni_ms = run(sg, pairs, False)
+        bi, bi_ms = run(sg, pairs, True)
+        print("{:>7} {:>7} {:>7} {:>12,.0f} {:>12,.0f} {:>10.2f} {:>10.2f}".format(
+          side * side, name, str(frozen), uni, bi, uni_ms, bi_ms))
@@ -0,0 +1,52 @@
+"""Memory and routing speed of a frozen (CSR array) StreetGraph
+
+Builds grid maps up to ~1M directed edges, measures the memory they hold
+with tracemalloc before and after freeze(), and times random A* and
+Dijkstra queries in both modes.
+
+Run from the repository root with: python -m bench.compact [grid sides...]
+"""
+import gc
+import random
+import sys
+import time
+import tracemalloc
+
+from src.components import EuclideanNode
+from .astar import jittered_grid
+
+
+def per_query(sg, pairs, method):
+  start = time.perf_counter()
+  for origin, destination in pairs:
+    sg.shortest_path(origin, destination, method)
+  return (time.perf_counter() - start) / len(pairs) * 1e3
+
+
+if __name__ == "__main__":
+  sides = [int(arg) for arg in sys.argv[1:]] or [100, 300, 500]
+  rng = random.Random(0)
+  print("{:>8} {:>10} {:>10} {:>10} {:>10} {:>10} {:>10} {:>10}".format(
+    "edges", "dict MB", "frozen MB", "arrays MB", "dict A*", "frozen A*", "dict dij", "frozen dij"))
+  for side in sides:
+    # Memory first, on its own - tracemalloc slows everything down
+    tracemalloc.start()
+    sg = jittered_grid(side, EuclideanNode, random.Random(side))
+    gc.collect()
+    before = tracemalloc.get_traced_memory()[0]
+    sg.freeze()
+    gc.collect()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del sg
+
+    sg = jittered_grid(side, EuclideanNode, random.Random(side))
+    labels = sorted(sg._labels)
+    pairs = [tuple(rng.sample(labels, 2)) for _ in range(20)]
+    timings = [per_query(sg, pairs, 'astar'), per_query(sg, pairs, 'dijkstra')]
+    sg.freeze()
+    timings += [per_query(sg, pairs, 'astar'), per_query(sg, pairs, 'dijkstra')]
+    print("{:>8,} {:>10.1f} {:>10.1f} {:>10.1f} {:>8.1f}ms {:>8.1f}ms {:>8.1f}ms {:>8.1f}ms".format(
+      len(sg._compact.targets), before / 2**20, after / 2**20, sg._compact.nbytes() / 2**20,
+      timings[0], timings[2], timings[1], timings[3]))
+    del sg, labels
@@ -0,0 +1,40 @@
+"""Spawning cars from a few depots, with and without shared path trees
+
+Every car leaves from one of a handful of depots. Point-to-point routing
+runs one search per car; with the shortest path tree cache each depot is
+searched once (routes_from) and every car's route is read off its tree.
+
+Run from the repository root with: python -m bench.depots [cars] [grid side]
+"""
+import random
+import sys
+import time
+
+from src.components import EuclideanNode
+from .astar import jittered_grid
+
+
+def spawn(sg, trips, warm):
+  start = time.perf_counter()
+  if warm:
+    for depot in sorted(set(origin for origin, _ in trips)):
+      sg.routes_from(depot, [destination for origin, destination in trips if origin == depot])
+  for i, (origin, destination) in enumerate(trips):
+    sg.add_car(origin, destination, i)
+  return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+  cars = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+  side = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+  rng = random.Random(0)
+  sg = jittered_grid(side, EuclideanNode, rng)
+  labels = sorted(sg._labels)
+  print("{:>7} {:>7} {:>14} {:>14}".format("nodes", "depots", "A* cars/sec", "tree cars/sec"))
+  for depots in (1, 4, 16):
+    sources = rng.sample(labels, depots)
+    trips = [(rng.choice(sources), rng.choice(labels)) for _ in range(cars)]
+    sg._invalidate()
+    point = spawn(sg, trips, False)
+    tree = spawn(sg, trips, True)
+    print("{:>7} {:>7} {:>14,.0f} {:>14,.0f}".format(side * side, depots, cars / point, cars / tree))
@@ -0,0 +1,84 @@
+"""Incremental D* Lite route repair vs rerouting every car from scratch
+
+A grid city with random street lengths and a fleet of cars. Congestion
+updates change the lengths of a few random streets at a time, and between
+updates every car drives a step. update_edges repairs the affected cars'
+routes from their saved search state. The baseline re-runs shortest_path
+for every car after each update. Both end with the same route lengths.
+
+Run from the repository root with: python -m bench.dynamic [cars] [grid side]
+"""
+import random
+import sys
+import time
+
+from src.components import StreetGraph
+
+
+def weighted_grid(n, rng):
+  sg = StreetGraph()
+  for x in range(n):
+    for y in range(n):
+      sg.add_node(x, y, (x, y))
+  streets = []
+  for x in range(n):
+    for y in range(n):
+      if x + 1 < n:
+        streets.append(((x, y), (x + 1, y)))
+      if y + 1 < n:
+        streets.append(((x, y), (x, y + 1)))
+  for a, b in streets:
+    sg.add_edge(a, b, rng.uniform(1, 5))
+  return sg, streets
+
+
+def congestion(streets, rng, rounds, per_round):
+  return [[(a, b, rng.uniform(1, 20)) for a, b in rng.sample(streets, per_round)] for _ in range(rounds)]
+
+
+def remaining(sg, car):
+  route = [car._next_node] + car._route if car._next_node is not None else []
+  return sum(sg.get_edge(a, b) for a, b in zip(route, route[1:]))
+
+
+def simulate(sg, trips, updates, incremental):
+  cars = [sg.add_car(s, t, i, 1) for i, (s, t) in enumerate(trips)]
+  start = time.perf_counter()
+  for changes in updates:
+    if incremental:
+      sg.update_edges(changes)
+    else:
+      for a, b, w in changes:
+        sg._set_weight(sg.node_id(a), sg.node_id(b), w)
+        sg._set_weight(sg.node_id(b), sg.node_id(a), w)
+      for car in cars:
+        if car._next_node is not None:
+          car._next_node_dist = sg.get_edge(car._last_node, car._next_node)
+        if car._next_node is not None and car._next_node != car._destination:
+          route, _ = sg.shortest_path(car._next_node, car._destination, 'dijkstra')
+          car._route = route[1:]
+    for car in cars:
+      if car._next_node is not None:
+        car.drive()
+  elapsed = time.perf_counter() - start
+  lengths = [round(remaining(sg, car), 6) for car in cars]
+  sg._cars.clear()
+  return elapsed, lengths
+
+
+if __name__ == "__main__":
+  ncars = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+  side = int(sys.argv[2]) if len(sys.argv) > 2 else 60
+  rng = random.Random(0)
+  labels = [(x, y) for x in range(side) for y in range(side)]
+  trips = [tuple(rng.sample(labels, 2)) for _ in range(ncars)]
+  print("{} cars on a {}x{} grid".format(ncars, side, side))
+  print("{:>14} {:>14} {:>12} {:>10}".format("streets/update", "from scratch s", "D* Lite s", "same"))
+  for per_round in (1, 10, 50):
+    results = []
+    for incremental in (False, True):
+      sg, streets = weighted_grid(side, random.Random(1))
+      updates = congestion(streets, random.Random(2), 20, per_round)
+      results.append(simulate(sg, trips, updates, incremental))
+    (scratch, expected), (dstar, actual) = results
+    print("{:>14} {:>14.2f} {:>12.2f} {:>10}".format(per_round, scratch, dstar, str(actual == expected)))
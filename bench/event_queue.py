@@ -0,0 +1,36 @@
+"""Event queue throughput for Environment
+
+Classic "hold" benchmark: the queue is prefilled with N pending events, then
+each executed event schedules one replacement at a random future time, so the
+queue depth stays at N for the whole measurement.
+
+Run from the repository root with: python -m bench.event_queue
+"""
+import random
+import time
+
+from src.discrete import Environment
+
+
+def hold(pending, executed, seed = 0):
+  rng = random.Random(seed)
+  env = Environment()
+
+  def event():
+    env.add_event(event, rng.random() * pending)
+
+  for _ in range(pending):
+    env.add_event(event, rng.random() * pending)
+
+  start = time.perf_counter()
+  for _ in range(executed):
+    env.do_next_event()
+  return executed / (time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+  print("{:>10} {:>14}".format("pending", "events/sec"))
+  for exp in range(3, 7):
+    pending = 10**exp
+    rate = hold(pending, 100000)
+    print("{:>10} {:>14,.0f}".format(pending, rate))
@@ -0,0 +1,52 @@
+"""Contraction hierarchy preprocessing cost and query speedup vs map size
+
+For jittered grid maps of growing size: time to contract, shortcuts added,
+size of the hierarchy arrays and of the file it saves to, and per-query
+time against Dijkstra and A*. Grids are about the hardest case for
+contraction hierarchies, real street maps have far more hierarchy to exploit.
+
+Run from the repository root with: python -m bench.hierarchy [grid sides...]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+
+from src.components import EuclideanNode
+from .astar import jittered_grid
+
+
+def per_query(sg, pairs, method):
+  start = time.perf_counter()
+  for origin, destination in pairs:
+    sg.shortest_path(origin, destination, method)
+  return (time.perf_counter() - start) / len(pairs) * 1e6
+
+
+if __name__ == "__main__":
+  sides = [int(arg) for arg in sys.argv[1:]] or [16, 32, 64]
+  rng = random.Random(0)
+  print("{:>7} {:>9} {:>10} {:>9} {:>9} {:>10} {:>10} {:>8} {:>8}".format(
+    "nodes", "build s", "shortcuts", "array MB", "file MB",
+    "dijkstra us", "astar us", "ch us", "speedup"))
+  for side in sides:
+    sg = jittered_grid(side, EuclideanNode, rng)
+    labels = sorted(sg._labels)
+    pairs = [tuple(rng.sample(labels, 2)) for _ in range(200)]
+
+    start = time.perf_counter()
+    ch = sg.contract()
+    build = time.perf_counter() - start
+
+    with tempfile.TemporaryDirectory() as directory:
+      path = os.path.join(directory, "map.ch")
+      ch.save(path)
+      size = os.path.getsize(path)
+
+    dijkstra = per_query(sg, pairs[:50], 'dijkstra')
+    astar = per_query(sg, pairs[:50], 'astar')
+    contracted = per_query(sg, pairs, 'ch')
+    print("{:>7} {:>9.1f} {:>10,} {:>9.2f} {:>9.2f} {:>10,.0f} {:>10,.0f} {:>8,.0f} {:>7.1f}x".format(
+      side * side, build, ch.shortcuts, ch.nbytes() / 2**20, size / 2**20,
+      dijkstra, astar, contracted, dijkstra / contracted))
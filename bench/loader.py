@@ -0,0 +1,70 @@
+"""Bulk map loading vs one add_node/add_edge call per element
+
+Writes a jittered grid city with about 500k edges as CSV and npz node and
+edge tables, then times building it with add_node/add_edge and with
+loader.load_map, into a regular and into a frozen StreetGraph.
+
+Run from the repository root with: python -m bench.loader [grid side]
+"""
+import csv
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from src.components import StreetGraph, EuclideanNode
+from src.loader import load_map
+
+
+def tables(side):
+  rng = np.random.default_rng(0)
+  gx, gy = np.meshgrid(np.arange(side), np.arange(side), indexing = 'ij')
+  labels = np.arange(side * side)
+  x = gx.ravel() + rng.uniform(-0.2, 0.2, side * side)
+  y = gy.ravel() + rng.uniform(-0.2, 0.2, side * side)
+  ids = labels.reshape(side, side)
+  sources = np.concatenate((ids[:-1, :].ravel(), ids[:, :-1].ravel()))
+  targets = np.concatenate((ids[1:, :].ravel(), ids[:, 1:].ravel()))
+  return labels, x, y, sources, targets
+
+
+def one_by_one(labels, x, y, sources, targets):
+  sg = StreetGraph(nodeCls = EuclideanNode)
+  for label, node_x, node_y in zip(labels.tolist(), x.tolist(), y.tolist()):
+    sg.add_node(node_x, node_y, label)
+  for source, target in zip(sources.tolist(), targets.tolist()):
+    sg.add_edge(source, target)
+  return sg
+
+
+if __name__ == "__main__":
+  side = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+  labels, x, y, sources, targets = tables(side)
+  print("{:,} nodes, {:,} edges".format(len(labels), len(sources)))
+
+  with tempfile.TemporaryDirectory() as directory:
+    paths = {}
+    for ext in ("csv", "npz"):
+      paths[ext] = (os.path.join(directory, "nodes." + ext), os.path.join(directory, "edges." + ext))
+    np.savez(paths["npz"][0], label = labels, x = x, y = y)
+    np.savez(paths["npz"][1], source = sources, target = targets)
+    with open(paths["csv"][0], "w", newline = "") as f:
+      writer = csv.writer(f)
+      writer.writerow(("label", "x", "y"))
+      writer.writerows(zip(labels.tolist(), x.tolist(), y.tolist()))
+    with open(paths["csv"][1], "w", newline = "") as f:
+      writer = csv.writer(f)
+      writer.writerow(("source", "target"))
+      writer.writerows(zip(sources.tolist(), targets.tolist()))
+
+    start = time.perf_counter()
+    one_by_one(labels, x, y, sources, targets)
+    print("{:<24} {:>8.2f}s".format("add_node/add_edge", time.perf_counter() - start))
+    for ext in ("csv", "npz"):
+      for freeze in (False, True):
+        start = time.perf_counter()
+        load_map(*paths[ext], nodeCls = EuclideanNode, freeze = freeze)
+        name = "load_map {}{}".format(ext, " frozen" if freeze else "")
+        print("{:<24} {:>8.2f}s".format(name, time.perf_counter() - start))
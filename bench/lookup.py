@@ -0,0 +1,39 @@
+"""Node label lookups and car position queries vs map size
+
+Times StreetGraph._node_from_label through the label index, the linear
+scan over _nodes it replaced, and get_xy_coords (what Car.position() is made
+of) on grid maps from 100 to 50k intersections. Indexed lookups and
+coordinate queries should stay flat.
+
+Run from the repository root with: python -m bench.lookup
+"""
+import random
+import time
+
+from .parallel import grid
+
+
+def scan(sg, label):
+  # The lookup StreetGraph used before it had a label index
+  for n in sg._nodes:
+    if n._label == label:
+      return n
+
+
+def per_call(func, args):
+  start = time.perf_counter()
+  for arg in args:
+    func(arg)
+  return (time.perf_counter() - start) / len(args) * 1e9
+
+
+if __name__ == "__main__":
+  rng = random.Random(0)
+  print("{:>8} {:>12} {:>12} {:>12}".format("nodes", "index ns", "scan ns", "coords ns"))
+  for side in (10, 32, 100, 224):
+    sg = grid(side)
+    labels = [(rng.randrange(side), rng.randrange(side)) for _ in range(20000)]
+    indexed = per_call(sg._node_from_label, labels)
+    scanned = per_call(lambda label: scan(sg, label), labels[:max(20, 20000 // side ** 2)])
+    coords = per_call(sg.get_xy_coords, labels)
+    print("{:>8} {:>12,.0f} {:>12,.0f} {:>12,.0f}".format(side * side, indexed, scanned, coords))
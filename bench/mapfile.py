@@ -0,0 +1,75 @@
+"""Worker startup: opening a saved map file vs rebuilding or unpickling
+
+A large perturbed grid, frozen, with landmarks for ALT routing. Startup is
+timed for rebuilding it (generator plus landmark preprocessing), reading
+node and edge CSV tables with load_map, unpickling the StreetGraph, and
+open_map on the binary map file - then for the first ALT query on the
+result, which is where open_map pays for the pages it touches.
+
+Run from the repository root with: python -m bench.mapfile [grid side]
+"""
+import csv
+import os
+import pickle
+import shutil
+import sys
+import tempfile
+import time
+
+from src.loader import load_map
+from src.mapfile import save_map, open_map
+from src.synthetic import perturbed_grid
+
+
+def timed(f):
+  start = time.perf_counter()
+  result = f()
+  return result, time.perf_counter() - start
+
+
+def build(side):
+  sg = perturbed_grid(side, side, seed = 0, freeze = True)
+  sg.select_landmarks(4)
+  return sg
+
+
+if __name__ == "__main__":
+  side = int(sys.argv[1]) if len(sys.argv) > 1 else 700
+  tmp = tempfile.mkdtemp()
+  try:
+    sg, rebuild = timed(lambda: build(side))
+    paths = {name: os.path.join(tmp, name) for name in ("nodes.csv", "edges.csv", "city.pickle", "city.map")}
+    with open(paths["nodes.csv"], "w", newline = "") as f:
+      w = csv.writer(f)
+      w.writerow(("label", "x", "y"))
+      w.writerows((n._label, n._x, n._y) for n in sg._node_list)
+    with open(paths["edges.csv"], "w", newline = "") as f:
+      w = csv.writer(f)
+      w.writerow(("source", "target"))
+      w.writerows((u, v) for u, v, _ in sg._arcs() if u < v)
+    with open(paths["city.pickle"], "wb") as f:
+      pickle.dump(sg, f, protocol = pickle.HIGHEST_PROTOCOL)
+    save_map(paths["city.map"], sg)
+
+    def unpickle():
+      with open(paths["city.pickle"], "rb") as f:
+        return pickle.load(f)
+
+    # CSV labels come back as strings, so does the route query
+    n = len(sg._node_list)
+    runs = [
+      ("rebuild", lambda: build(side), (0, n - 1)),
+      ("csv load_map", lambda: load_map(paths["nodes.csv"], paths["edges.csv"], freeze = True), ("0", str(n - 1))),
+      ("pickle", unpickle, (0, n - 1)),
+      ("open_map", lambda: open_map(paths["city.map"]), (0, n - 1)),
+    ]
+    print("{:,} nodes, map file {:.1f} MB, pickle {:.1f} MB".format(
+      n, os.path.getsize(paths["city.map"]) / 1e6, os.path.getsize(paths["city.pickle"]) / 1e6))
+    print("{:>14} {:>12} {:>16}".format("", "startup s", "first query s"))
+    for name, start, (s, t) in runs:
+      graph, startup = timed(start)
+      method = 'alt' if graph._landmarks is not None else None
+      _, query = timed(lambda: graph.shortest_path(s, t, method))
+      print("{:>14} {:>12.2f} {:>16.2f}".format(name, startup, query))
+  finally:
+    shutil.rmtree(tmp)
@@ -0,0 +1,52 @@
+"""Scaling of the conservative parallel mode from 1 to N worker processes
+
+Builds a grid city, spawns a fixed-seed set of trips and runs them once on a
+single Environment and then split into 1..N vertical strip regions. Every
+parallel run is checked against the sequential results.
+
+Run from the repository root with: python -m bench.parallel [cars] [grid side]
+"""
+import multiprocessing
+import sys
+import time
+
+from src.components import StreetGraph, EuclideanNode
+from src.parallel import random_trips, strip_regions, run_sequential, run_parallel
+
+
+def grid(n):
+  sg = StreetGraph(nodeCls = EuclideanNode)
+  for x in range(n):
+    for y in range(n):
+      sg.add_node(x, y, (x, y))
+  for x in range(n):
+    for y in range(n):
+      if x + 1 < n:
+        sg.add_edge((x, y), (x + 1, y))
+      if y + 1 < n:
+        sg.add_edge((x, y), (x, y + 1))
+  return sg
+
+
+if __name__ == "__main__":
+  cars = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+  side = int(sys.argv[2]) if len(sys.argv) > 2 else 12
+  sg = grid(side)
+  trips = random_trips(sg, cars, seed = 0)
+  cores = max(2, multiprocessing.cpu_count())
+
+  start = time.perf_counter()
+  expected = run_sequential(sg, trips)
+  sequential = time.perf_counter() - start
+
+  rows = []
+  for k in range(1, cores + 1):
+    start = time.perf_counter()
+    actual = run_parallel(sg, trips, strip_regions(sg, k))
+    rows.append((k, time.perf_counter() - start, actual == expected))
+
+  print("{} cars on a {}x{} grid, {} cpus".format(cars, side, side, multiprocessing.cpu_count()))
+  print("{:>10} {:>10} {:>10} {:>10}".format("workers", "seconds", "speedup", "matches"))
+  print("{:>10} {:>10.2f} {:>10.2f} {:>10}".format("sequential", sequential, 1.0, "-"))
+  for k, elapsed, matches in rows:
+    print("{:>10} {:>10.2f} {:>10.2f} {:>10}".format(k, elapsed, sequential / elapsed, str(matches)))
@@ -0,0 +1,52 @@
+"""Graph partitioning: cut edges and balance of strips, coordinate bisection and multilevel refinement
+
+Random geometric maps (synthetic.random_geometric, whose node ids are in
+random spatial order) split into k regions three ways: parallel.strip_regions,
+partition(refine = False) and partition. Edges cut are directed edges between
+regions, balance the heaviest region over the average. Then the largest map
+is renumbered region by region and the same A* queries are timed on both.
+
+Run from the repository root with: python -m bench.partition
+"""
+import random
+import time
+
+import numpy as np
+
+from src.parallel import strip_regions
+from src.partition import Partition, partition
+from src.synthetic import random_geometric
+
+
+def per_query(sg, queries):
+  start = time.perf_counter()
+  for s, t in queries:
+    sg.shortest_path(s, t, 'astar')
+  return (time.perf_counter() - start) / len(queries) * 1e3
+
+
+if __name__ == "__main__":
+  print("{:>9} {:>4} {:>11} {:>11} {:>11} {:>8} {:>8} {:>8}".format(
+    "nodes", "k", "strip cut", "rcb cut", "refined", "balance", "rcb s", "refine s"))
+  for n in (10000, 100000, 1000000):
+    sg = random_geometric(n, seed = 0, freeze = True)
+    for k in (4, 16, 64):
+      regions = strip_regions(sg, k)
+      strips = Partition(sg, np.array([regions[node._label] for node in sg._node_list]), k, None)
+      start = time.perf_counter()
+      bisected = partition(sg, k, refine = False)
+      rcb = time.perf_counter() - start
+      start = time.perf_counter()
+      refined = partition(sg, k)
+      elapsed = time.perf_counter() - start
+      print("{:>9,} {:>4} {:>11,} {:>11,} {:>11,} {:>8.3f} {:>8.2f} {:>8.2f}".format(
+        n, k, strips.cut(), bisected.cut(), refined.cut(), refined.weights.max() / (n / k), rcb, elapsed))
+
+  start = time.perf_counter()
+  renumbered, _ = refined.renumber()
+  elapsed = time.perf_counter() - start
+  q = random.Random(0)
+  queries = [(q.randrange(n), q.randrange(n)) for _ in range(50)]
+  print("\nrenumber {:,} nodes: {:.2f} s".format(n, elapsed))
+  print("A* per query: {:.1f} ms in generated order, {:.1f} ms renumbered by region".format(
+    per_query(sg, queries), per_query(renumbered, queries)))
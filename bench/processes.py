@@ -0,0 +1,59 @@
+"""Closure style actors vs generator processes
+
+Each car advances a counter once per time unit for a fixed number of ticks.
+The closure style mirrors run_till_done in sim.py: every step the handler
+re-registers itself with add_event. The process style is a generator that
+yields 1 and is resumed directly by the Environment.
+
+Run from the repository root with: python -m bench.processes
+"""
+import time
+import tracemalloc
+
+from src.discrete import Environment
+
+
+def closure_style(env, cars, ticks):
+  def make_car():
+    left = ticks
+    def drive():
+      nonlocal left
+      left -= 1
+      if left:
+        env.add_event(drive, 1, "Driving the Car")
+    return drive
+  for _ in range(cars):
+    env.add_event(make_car(), 1, "Driving the Car")
+
+
+def process_style(env, cars, ticks):
+  def drive():
+    for _ in range(ticks):
+      yield 1
+  for _ in range(cars):
+    env.process(drive(), "Driving the Car")
+
+
+def measure(setup, cars, ticks):
+  env = Environment()
+  setup(env, cars, ticks)
+  start = time.perf_counter()
+  env.run()
+  elapsed = time.perf_counter() - start
+
+  # Second run under tracemalloc, which is too slow to time with
+  env = Environment()
+  setup(env, cars, ticks)
+  tracemalloc.start()
+  env.run()
+  _, peak = tracemalloc.get_traced_memory()
+  tracemalloc.stop()
+  return cars * ticks / elapsed, peak
+
+
+if __name__ == "__main__":
+  print("{:>8} {:>8} {:>9} {:>14} {:>14}".format("cars", "ticks", "style", "steps/sec", "peak alloc MB"))
+  for cars in (1000, 10000, 100000):
+    for name, setup in (("closure", closure_style), ("process", process_style)):
+      rate, peak = measure(setup, cars, 20)
+      print("{:>8} {:>8} {:>9} {:>14,.0f} {:>14.1f}".format(cars, 20, name, rate, peak / 2**20))
@@ -0,0 +1,56 @@
+"""Per-event enqueue/dequeue cost of each Environment scheduler backend
+
+Three workloads, all in the hold model (each dequeue is followed by one
+enqueue so the queue depth stays at the fleet size):
+  tick     every car drives at the same integer ticks t=1,2,3...
+  phased   every car drives once per time unit, with a random phase
+  uniform  re-schedule at a uniformly random delay
+
+Run from the repository root with: python -m bench.schedulers
+"""
+import random
+import time
+
+from src.schedulers import HeapScheduler, CalendarQueue, LadderQueue
+
+BACKENDS = (HeapScheduler, CalendarQueue, LadderQueue)
+
+
+def hold(cls, fleet, ops, phase, delay, seed = 0):
+  rng = random.Random(seed)
+  s = cls()
+  seq = 0
+  start = time.perf_counter()
+  for car in range(fleet):
+    s.push((phase(rng), seq, car))
+    seq += 1
+  enqueue = (time.perf_counter() - start) / fleet
+
+  push = s.push
+  pop = s.pop
+  start = time.perf_counter()
+  for _ in range(ops):
+    t, _, car = pop()
+    push((t + delay(rng), seq, car))
+    seq += 1
+  per_event = (time.perf_counter() - start) / ops
+  return enqueue, per_event
+
+
+# name: (first event time, delay until the next one)
+WORKLOADS = {
+  'tick': (lambda rng: 1, lambda rng: 1),
+  'phased': (lambda rng: rng.random(), lambda rng: 1),
+  'uniform': (lambda rng: rng.random(), lambda rng: rng.random()),
+}
+
+if __name__ == "__main__":
+  print("{:>8} {:>10} {:>14} {:>18} {:>18}".format(
+    "workload", "fleet", "backend", "enqueue (us)", "dequeue+enq (us)"))
+  for name, (phase, delay) in WORKLOADS.items():
+    for exp in range(3, 7):
+      fleet = 10**exp
+      for cls in BACKENDS:
+        enqueue, per_event = hold(cls, fleet, 200000, phase, delay)
+        print("{:>8} {:>10} {:>14} {:>18.3f} {:>18.3f}".format(
+          name, fleet, cls.__name__, enqueue * 1e6, per_event * 1e6))
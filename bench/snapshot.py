@@ -0,0 +1,61 @@
+"""Warm start from a snapshot vs re-simulating the warm-up
+
+Simulates a warm-up period for a fleet on a grid city, snapshots it, and
+compares the time to re-simulate the warm-up with the time to load the
+snapshot, per parameter variant of a sweep.
+
+Run from the repository root with: python -m bench.snapshot [cars] [grid side] [warm-up time]
+"""
+import functools
+import os
+import sys
+import tempfile
+import time
+
+from bench.parallel import grid
+from src.discrete import Environment
+from src.parallel import random_trips
+from src.snapshot import save_snapshot, load_snapshot
+
+
+def drive_all(sg):
+  for car in sg._cars:
+    if car._next_node is not None:
+      car.drive()
+
+
+def warm_up(sg, trips, until):
+  env = Environment()
+  for origin, destination, label, speed in trips:
+    sg.add_car(origin, destination, label, speed)
+  env.add_periodic_event(functools.partial(drive_all, sg), 1)
+  env.run_till_time(until)
+  return env
+
+
+if __name__ == "__main__":
+  cars = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+  side = int(sys.argv[2]) if len(sys.argv) > 2 else 12
+  until = int(sys.argv[3]) if len(sys.argv) > 3 else 30
+  sg = grid(side)
+  trips = random_trips(sg, cars, seed = 0)
+  path = os.path.join(tempfile.mkdtemp(), "warm.snap")
+
+  start = time.perf_counter()
+  env = warm_up(sg, trips, until)
+  simulate = time.perf_counter() - start
+
+  start = time.perf_counter()
+  save_snapshot(path, env, sg)
+  save = time.perf_counter() - start
+
+  start = time.perf_counter()
+  load_snapshot(path)
+  load = time.perf_counter() - start
+
+  print("{} cars on a {}x{} grid, warm-up to t={}".format(cars, side, side, until))
+  print("snapshot size   {:>10.1f} KB".format(os.path.getsize(path) / 1024))
+  print("simulate warmup {:>10.3f} s".format(simulate))
+  print("save snapshot   {:>10.3f} s".format(save))
+  print("load snapshot   {:>10.3f} s   ({:.0f}x faster per variant)".format(load, simulate / load))
+  os.remove(path)
@@ -0,0 +1,60 @@
+"""Nearest node and range queries: grid index vs a linear scan
+
+Random intersections over a square map, loaded with build_graph. Each
+query runs through StreetGraph.nearest_nodes / nodes_in_box and, for the
+baseline, through a NumPy scan of every node's coordinates. Index build
+time is the first query's, add_node time is per node once the index is up.
+
+Run from the repository root with: python -m bench.spatial
+"""
+import random
+import time
+
+import numpy as np
+
+from src.components import Node
+from src.loader import build_graph
+
+
+def per_query(f, queries):
+  start = time.perf_counter()
+  for q in queries:
+    f(*q)
+  return (time.perf_counter() - start) / len(queries) * 1e6
+
+
+if __name__ == "__main__":
+  rng = np.random.default_rng(0)
+  print("{:>9} {:>8} {:>10} {:>12} {:>12} {:>12} {:>12} {:>10}".format(
+    "nodes", "build s", "add us", "nearest us", "scan us", "10-near us", "box us", "scan us"))
+  for n in (10000, 100000, 1000000):
+    side = 1000.0
+    x = rng.uniform(0, side, n)
+    y = rng.uniform(0, side, n)
+    sg = build_graph(range(n), x, y, [], [], nodeCls = Node)
+    q = random.Random(0)
+    points = [(q.uniform(0, side), q.uniform(0, side)) for _ in range(200)]
+    # Boxes holding about 100 nodes
+    w = side * (100 / n) ** 0.5
+    boxes = [(px, py, px + w, py + w) for px, py in points]
+
+    start = time.perf_counter()
+    sg.nearest_nodes(0, 0)
+    build = time.perf_counter() - start
+
+    def scan_nearest(px, py):
+      return int(np.argmin((x - px) ** 2 + (y - py) ** 2))
+
+    def scan_box(x0, y0, x1, y1):
+      return np.flatnonzero((x >= x0) & (x <= x1) & (y >= y0) & (y <= y1))
+
+    start = time.perf_counter()
+    for i in range(1000):
+      sg.add_node(q.uniform(0, side), q.uniform(0, side), n + i)
+    add = (time.perf_counter() - start) / 1000 * 1e6
+
+    print("{:>9,} {:>8.2f} {:>10.1f} {:>12.1f} {:>12.1f} {:>12.1f} {:>12.1f} {:>10.1f}".format(
+      n, build, add,
+      per_query(sg.nearest_nodes, points), per_query(scan_nearest, points),
+      per_query(lambda px, py: sg.nearest_nodes(px, py, 10), points),
+      per_query(sg.nodes_in_box, boxes), per_query(scan_box, boxes)))
@@ -0,0 +1,91 @@
+"""Speed limits: trip times when routing by travel time vs by distance, and the cost on the hot path
+
+A grid city with arterials every 8th row and column (speed limit 2) between
+local streets (limit 0.5), built in one go by build_graph from limit arrays.
+For random trips the travel time of the fastest route (routing on travel
+time) is compared with the travel time of the shortest route by distance,
+and cars of speed 2 are driven to their destinations on both kinds of route.
+Then the same trips on contraction hierarchies. Last, Car.drive throughput
+on the same city with and without speed limits.
+
+Run from the repository root with: python -m bench.speeds
+"""
+import random
+import time
+
+import numpy as np
+
+from src.components import ManhattanNode
+from src.loader import build_graph
+
+
+def city(side, limits):
+  ids = np.arange(side * side).reshape(side, side)
+  x = np.repeat(np.arange(side, dtype = np.float64), side)
+  y = np.tile(np.arange(side, dtype = np.float64), side)
+  u = np.concatenate((ids[:-1, :].ravel(), ids[:, :-1].ravel()))
+  v = np.concatenate((ids[1:, :].ravel(), ids[:, 1:].ravel()))
+  # Streets along an arterial row or column
+  arterial = ((x[u] == x[v]) & (x[u] % 8 == 0)) | ((y[u] == y[v]) & (y[u] % 8 == 0))
+  speed_limits = np.where(arterial, 2.0, 0.5) if limits else None
+  return build_graph(range(side * side), x, y, u, v, nodeCls = ManhattanNode, freeze = True,
+                     speed_limits = speed_limits)
+
+
+def trip_time(sg, path):
+  # Travel time of PATH on SG at the speed limits
+  return sum(sg.get_edge(a, b) / sg.get_limits(a, b)[0] for a, b in zip(path, path[1:]))
+
+
+def drive(sg, trips, speed):
+  # Steps for every car to arrive and drive() calls per second
+  cars = [sg._carCls(a, b, i, sg, speed) for i, (a, b) in enumerate(trips)]
+  steps = 0
+  start = time.perf_counter()
+  while cars:
+    for car in cars:
+      car.drive()
+    steps += len(cars)
+    cars = [car for car in cars if car._next_node is not None]
+  return steps, steps / (time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+  side = 200
+  limited = city(side, True)
+  plain = city(side, False)
+  rng = random.Random(0)
+  trips = [(rng.randrange(side * side), rng.randrange(side * side)) for _ in range(300)]
+
+  start = time.perf_counter()
+  fastest = [limited.shortest_path(a, b)[0] for a, b in trips]
+  by_time = time.perf_counter() - start
+  start = time.perf_counter()
+  shortest = [plain.shortest_path(a, b)[0] for a, b in trips]
+  by_distance = time.perf_counter() - start
+  print("{:,} intersections, {} trips".format(side * side, len(trips)))
+  print("mean trip time: {:.1f} on fastest routes, {:.1f} on shortest routes".format(
+    np.mean([trip_time(limited, p) for p in fastest]), np.mean([trip_time(limited, p) for p in shortest])))
+  print("A* per query: {:.1f} ms on travel times, {:.1f} ms on distances".format(
+    by_time / len(trips) * 1e3, by_distance / len(trips) * 1e3))
+  columns = sum(a.nbytes for a in limited._edges.slots(limited._compact))
+  print("edge columns: {:,} rows, {:.1f} MB (CSR {:.1f} MB)".format(
+    len(limited._edges), columns / 1e6, limited._compact.nbytes() / 1e6))
+  for sg in (limited, plain):
+    sg.contract()
+  start = time.perf_counter()
+  for a, b in trips:
+    limited.shortest_path(a, b, 'ch')
+  by_time = time.perf_counter() - start
+  start = time.perf_counter()
+  for a, b in trips:
+    plain.shortest_path(a, b, 'ch')
+  by_distance = time.perf_counter() - start
+  print("CH per query: {:.2f} ms on travel times, {:.2f} ms on distances".format(
+    by_time / len(trips) * 1e3, by_distance / len(trips) * 1e3))
+
+  # Cars of speed 2 along routes they pick themselves, all the way to the destination
+  steps, rate = drive(limited, trips, 2)
+  print("\ndriving with limits: {:,} steps, {:.2f} M drive() per s".format(steps, rate / 1e6))
+  steps, rate = drive(plain, trips, 2)
+  print("driving without:     {:,} steps, {:.2f} M drive() per s".format(steps, rate / 1e6))
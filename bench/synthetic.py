@@ -0,0 +1,53 @@
+"""Time to generate synthetic maps
+
+Each generator at growing sizes, frozen (CSR arrays) and not (neighbour
+dicts), next to building the same grid with add_node/add_edge calls the
+way the older benchmarks do.
+
+Run from the repository root with: python -m bench.synthetic
+"""
+import math
+import time
+
+from src.components import StreetGraph, ManhattanNode
+from src.synthetic import grid_map, perturbed_grid, random_geometric, ring_radial
+
+
+def loop_grid(side):
+  sg = StreetGraph(nodeCls = ManhattanNode)
+  for x in range(side):
+    for y in range(side):
+      sg.add_node(x, y, x * side + y)
+  for x in range(side):
+    for y in range(side):
+      if x + 1 < side:
+        sg.add_edge(x * side + y, (x + 1) * side + y)
+      if y + 1 < side:
+        sg.add_edge(x * side + y, x * side + y + 1)
+  return sg
+
+
+def timed(make):
+  start = time.perf_counter()
+  sg = make()
+  return time.perf_counter() - start, sg
+
+
+if __name__ == "__main__":
+  print("{:>10} {:>18} {:>10} {:>10} {:>10}".format("nodes", "map", "edges", "frozen s", "dicts s"))
+  for n in (10000, 100000, 1000000):
+    side = int(math.sqrt(n))
+    makers = {
+      "grid": lambda freeze: grid_map(side, side, freeze = freeze),
+      "perturbed grid": lambda freeze: perturbed_grid(side, side, drop = 0.1, seed = 0, freeze = freeze),
+      "random geometric": lambda freeze: random_geometric(n, seed = 0, freeze = freeze),
+      "ring radial": lambda freeze: ring_radial(side, side, freeze = freeze),
+    }
+    for name, make in makers.items():
+      frozen, sg = timed(lambda: make(True))
+      dicts = timed(lambda: make(False))[0] if n <= 100000 else math.nan
+      print("{:>10,} {:>18} {:>10,} {:>10.2f} {:>10.2f}".format(
+        len(sg._node_list), name, len(sg._compact.targets), frozen, dicts))
+    if n <= 100000:
+      elapsed = timed(lambda: loop_grid(side))[0]
+      print("{:>10,} {:>18} {:>10} {:>10} {:>10.2f}".format(side * side, "add_node loop", "", "", elapsed))
@@ -0,0 +1,44 @@
+"""Conservative barrier windows vs optimistic Time Warp
+
+Runs the same fixed-seed trips with run_parallel and with run_timewarp at a
+few optimism settings, checks both against the sequential run, and reports
+wall time, coordinator rounds and how much work was rolled back.
+
+Run from the repository root with: python -m bench.timewarp [cars] [grid side] [regions]
+"""
+import sys
+import time
+
+from bench.parallel import grid
+from src.parallel import random_trips, strip_regions, run_sequential, run_parallel
+from src.timewarp import run_timewarp
+
+
+if __name__ == "__main__":
+  cars = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+  side = int(sys.argv[2]) if len(sys.argv) > 2 else 12
+  k = int(sys.argv[3]) if len(sys.argv) > 3 else 2
+  sg = grid(side)
+  trips = random_trips(sg, cars, seed = 0)
+  regions = strip_regions(sg, k)
+
+  rows = []
+  expected = run_sequential(sg, trips)
+
+  start = time.perf_counter()
+  matches = run_parallel(sg, trips, regions) == expected
+  rows.append(("conservative", time.perf_counter() - start, matches, {}))
+
+  for optimism in (5, 20, 100):
+    stats = {}
+    start = time.perf_counter()
+    matches = run_timewarp(sg, trips, regions, optimism = optimism, stats = stats) == expected
+    rows.append(("timewarp/{}".format(optimism), time.perf_counter() - start, matches, stats))
+
+  print("{} cars on a {}x{} grid, {} regions".format(cars, side, side, k))
+  print("{:>14} {:>8} {:>8} {:>8} {:>10} {:>12}".format(
+    "mode", "seconds", "matches", "rounds", "rollbacks", "rolled back"))
+  for name, elapsed, matches, stats in rows:
+    print("{:>14} {:>8.2f} {:>8} {:>8} {:>10} {:>12}".format(
+      name, elapsed, str(matches), stats.get('rounds', '-'), stats.get('rollbacks', '-'),
+      "{}/{}".format(stats['rolled_back'], stats['executed']) if stats else '-'))
@@ -0,0 +1,35 @@
+"""Event throughput with tracing detached, attached, and never attached
+
+An untraced Environment runs the class methods unchanged, so "never" and
+"detached" should match; "attached" pays for the timing and the records.
+
+Run from the repository root with: python -m bench.trace
+"""
+import time
+
+from src.discrete import Environment
+from src.trace import Tracer
+
+
+def build(events):
+  env = Environment()
+  noop = lambda: None
+  for i in range(events):
+    env.add_event(noop, i % 1000)
+  return env
+
+
+if __name__ == "__main__":
+  events = 200000
+  print("{:>10} {:>14}".format("tracing", "events/sec"))
+  for mode in ("never", "detached", "attached"):
+    env = build(events)
+    tracer = Tracer()
+    if mode != "never":
+      tracer.attach(env)
+      if mode == "detached":
+        tracer.detach()
+    start = time.perf_counter()
+    env.run()
+    elapsed = time.perf_counter() - start
+    print("{:>10} {:>14,.0f}".format(mode, events / elapsed))
@@ -0,0 +1,150 @@
+import heapq
+import math
+
+import numpy as np
+
+# Compact, array backed form of a StreetGraph, see StreetGraph.freeze().
+#
+# Nodes are their integer ids. The edges leaving node u are TARGETS[OFFSETS[u]:OFFSETS[u + 1]],
+# sorted by target, with the matching WEIGHTS (CSR, compressed sparse rows). Coordinates are in X and
+# Y. That is 8 bytes per number instead of a dict entry, a float object and a Node per edge.
+#
+# Python level loops go through memoryviews of the arrays: indexing one returns a plain int or
+# float, about as fast as indexing a list, where indexing the array itself builds a NumPy scalar.
+# Classes holding such views pickle through _Views.
+
+
+def _is_view(value):
+  return isinstance(value, memoryview) or (type(value) is tuple and len(value) > 0 and
+                                           all(isinstance(v, memoryview) for v in value))
+
+
+class _Views(object):
+  """Pickling for classes that keep memoryviews (or tuples of them) of their arrays, built by _views()"""
+  def __getstate__(self):
+    # Memoryviews can't be pickled, they are rebuilt on the other side
+    return {name: value for name, value in self.__dict__.items() if not _is_view(value)}
+
+  def __setstate__(self, state):
+    self.__dict__.update(state)
+    self._views()
+
+
+class CompactGraph(_Views):
+  """Nodes and edges of a StreetGraph in NumPy arrays"""
+  def __init__(self, offsets, targets, weights, x, y):
+    self.offsets = offsets
+    self.targets = targets
+    self.weights = weights
+    self.x = x
+    self.y = y
+    self._views()
+
+  def _views(self):
+    self._offsets = memoryview(self.offsets)
+    self._targets = memoryview(self.targets)
+    self._weights = memoryview(self.weights)
+    self._x = memoryview(self.x)
+    self._y = memoryview(self.y)
+
+  def nbytes(self):
+    return self.offsets.nbytes + self.targets.nbytes + self.weights.nbytes + self.x.nbytes + self.y.nbytes
+
+  def edge(self, u, v):
+    # Weight of edge U -> V
+    targets = self._targets
+    for i in range(self._offsets[u], self._offsets[u + 1]):
+      if targets[i] == v:
+        return self._weights[i]
+    raise KeyError((u, v))
+
+  def slot(self, u, v):
+    # Index of edge U -> V in TARGETS and WEIGHTS
+    targets = self._targets
+    for i in range(self._offsets[u], self._offsets[u + 1]):
+      if targets[i] == v:
+        return i
+    raise KeyError((u, v))
+
+  def set_edge(self, u, v, w):
+    # Change the weight of edge U -> V
+    targets = self._targets
+    for i in range(self._offsets[u], self._offsets[u + 1]):
+      if targets[i] == v:
+        self._weights[i] = w
+        return
+    raise KeyError((u, v))
+
+  def row(self, u):
+    # (target, weight) of every edge leaving U
+    start = self._offsets[u]
+    end = self._offsets[u + 1]
+    return zip(self._targets[start:end], self._weights[start:end])
+
+  def transpose(self):
+    # The same graph with every edge reversed
+    n = len(self.offsets) - 1
+    sources = np.repeat(np.arange(n), np.diff(self.offsets))
+    order = np.lexsort((sources, self.targets))
+    offsets = np.zeros(n + 1, dtype = np.int64)
+    np.cumsum(np.bincount(self.targets, minlength = n), out = offsets[1:])
+    return CompactGraph(offsets, sources[order], self.weights[order], self.x, self.y)
+
+  def xy(self, u):
+    return self._x[u], self._y[u]
+
+  def search(self, s, t, metric = None, bound = None):
+    # StreetGraph._search on node ids: Dijkstra, or A* with METRIC(x0, y0, x1, y1) or BOUND(node id) as
+    # the heuristic, from S until T is settled (or everything, if T is None). Heap entries are ordered
+    # the same way, so both find the same paths. Returns (dist, prev, number of nodes settled)
+    offsets = self._offsets
+    targets = self._targets
+    weights = self._weights
+    x = self._x
+    y = self._y
+    if metric is not None:
+      xt, yt = x[t], y[t]
+    dist = {s: 0}
+    prev = {s: None}
+    if bound is not None:
+      heap = [(bound(s), 0, s)]
+    else:
+      heap = [(0 if metric is None else metric(x[s], y[s], xt, yt), 0, s)]
+    settled = 0
+    while heap:
+      _, d, u = heapq.heappop(heap)
+      d = -d
+      if d > dist[u]:
+        # Stale entry, u was reached through a shorter path since
+        continue
+      settled += 1
+      if u == t:
+        break
+      for i in range(offsets[u], offsets[u + 1]):
+        v = targets[i]
+        newdist = d + weights[i]
+        if newdist < dist.get(v, math.inf):
+          dist[v] = newdist
+          prev[v] = u
+          if bound is not None:
+            key = newdist + bound(v)
+          else:
+            key = newdist if metric is None else newdist + metric(x[v], y[v], xt, yt)
+          heapq.heappush(heap, (key, -newdist, v))
+    return dist, prev, settled
+
+
+def compact(sg):
+  # Freeze the nodes and edges of SG into a CompactGraph, indexed by node id
+  nodes = sg._node_list
+  offsets = np.zeros(len(nodes) + 1, dtype = np.int64)
+  targets = []
+  weights = []
+  for node in nodes:
+    row = sorted((other._id, w) for other, w in node._neighbors.items())
+    targets.extend(v for v, _ in row)
+    weights.extend(w for _, w in row)
+    offsets[node._id + 1] = len(targets)
+  return CompactGraph(offsets, np.array(targets, dtype = np.int64), np.array(weights, dtype = np.float64),
+                      np.array([n._x for n in nodes], dtype = np.float64),
+                      np.array([n._y for n in nodes], dtype = np.float64))
@@ -1,5 +1,16 @@
-import copy
+import heapq
 import math
+from collections import OrderedDict
+from itertools import count
+
+import numpy as np
+
+from .compact import compact
+from .hierarchy import ContractionHierarchy
+from .landmarks import Landmarks
+from .dynamic import DStarLite
+from .edges import EdgeColumns, NO_LIMIT, travel_time
+from .spatial import GridIndex
 
 class Car(object):
   """web enabled car"""
@@ -13,6 +24,8 @@ class Car(object):
     self._next_node_dist_traveled = 0
     self._linkLife = dict()
     self._rad = rad
+    # D* Lite search state for repairing the route, built when an edge weight change first affects the car
+    self._planner = None
     self._calculate_route()
 
   def getSpeed(self):
@@ -37,34 +50,98 @@ class Car(object):
   def set_speed(self, speed):
     self._speed = speed
 
+  def __getstate__(self):
+    # The street graph isn't shipped along when a car is pickled (e.g. handed to another
+    # process) - the receiving side points _sg at its own copy
+    state = self.__dict__.copy()
+    state['_sg'] = None
+    state['_planner'] = None
+    return state
+
   def _calculate_route(self):
     route, _ = self._sg.shortest_path(self._source, self._destination)
     self._last_node = route.pop(0)
     self._route = route
     self._update_next_dest()
 
-  def _update_next_dest(self):
+  def _update_next_dest(self, passed = None):
+    # PASSED is the node the car just drove from to reach _last_node, if any
+    if passed is not None:
+      self._sg._leave(self, (passed, self._last_node))
     if self._route:
       self._next_node = self._route.pop(0)
-      self._next_node_dist = self._sg.get_edge(self._last_node, self._next_node)
+      sg = self._sg
+      self._next_node_dist = sg.get_edge(self._last_node, self._next_node)
+      self._next_node_limit = NO_LIMIT if sg._edges is None else sg._speed_limit(self._last_node, self._next_node)
     else:
       self._next_node = None
       self._next_node_dist = 0
       self._next_node_dist_traveled = 0
+      self._next_node_limit = NO_LIMIT
+
+  def _reroute(self, changes, ahead = True):
+    # Called by StreetGraph.update_edges and set_limits with the (node, node, old weight, new weight) of
+    # every edge that changed, nodes as _search keys. AHEAD is whether one of them is on the route past the
+    # edge being driven, or got shorter. Updates the length and speed limit of the edge being driven and
+    # repairs the rest of the route, which is kept when the destination can't be reached anymore.
+    # Returns whether the route changed
+    if self._next_node is None:
+      return False
+    sg = self._sg
+    last = sg._key(self._last_node)
+    nxt = sg._key(self._next_node)
+    for u, v, _, _ in changes:
+      if u == last and v == nxt:
+        self._next_node_dist = sg.get_edge(self._last_node, self._next_node)
+        self._next_node_limit = NO_LIMIT if sg._edges is None else sg._speed_limit(self._last_node, self._next_node)
+    goal = sg._key(self._destination)
+    if nxt == goal:
+      return False
+    planner = self._planner
+    if planner is None or planner.version != sg._version:
+      # Nothing to repair yet: only a longer edge on the route or a shorter one anywhere can matter
+      if not ahead:
+        return False
+      planner = self._planner = DStarLite(sg, nxt, goal)
+      sg._planning.add(self)
+    else:
+      planner.update(nxt, changes)
+    path = planner.path()
+    if path is None:
+      return False
+    if sg._compact is None:
+      route = [node._label for node in path[1:]]
+    else:
+      route = [sg._node_list[i]._label for i in path[1:]]
+    if route == self._route:
+      return False
+    sg._leave(self, [self._next_node] + self._route)
+    self._route = route
+    sg._ride(self, [self._next_node] + route)
+    return True
 
   def drive(self):
-    if self._next_node:
-      self._next_node_dist_traveled += self._speed
-      while True:
-        if self._next_node and self._next_node_dist_traveled >= self._next_node_dist:
-          self._next_node_dist_traveled -= self._next_node_dist
-          print("Passing {}".format(self._next_node))
-          self._last_node = self._next_node
-          self._update_next_dest()
-        else:
-          break
-    else:
+    if self._next_node is None:
       raise Exception("We are done driving")
+    # No faster than the speed limit of the street
+    speed = self._speed
+    if self._next_node_limit < speed:
+      speed = self._next_node_limit
+    self._next_node_dist_traveled += speed
+    while self._next_node is not None and self._next_node_dist_traveled >= self._next_node_dist:
+      self._next_node_dist_traveled -= self._next_node_dist
+      if self._sg._on_pass is not None:
+        self._sg._on_pass(self, self._next_node)
+      passed = self._last_node
+      self._last_node = self._next_node
+      self._update_next_dest(passed)
+      # The rest of the step goes on at the speed the next street allows
+      limit = self._next_node_limit
+      if limit < speed or (speed < limit and speed < self._speed):
+        limited = self._speed if limit > self._speed else limit
+        if speed > 0:
+          self._next_node_dist_traveled *= limited / speed
+        speed = limited
 
   def position(self):
     # Calculates the position as a weighted average of the prev and next nodes
@@ -82,16 +159,31 @@ class Car(object):
 
 #########################################################################################
 
+def euclidean(x0, y0, x1, y1):
+  return math.sqrt((x0 - x1)**2 + (y0 - y1)**2)
+
+
+def manhattan(x0, y0, x1, y1):
+  return abs(x0 - x1) + abs(y0 - y1)
+
+
 class Node(object):
   """Simple node in a graph containing a label, x + y coordinates for drawing, and a neighbors map"""
+  __slots__ = ('_x', '_y', '_label', '_id', '_neighbors')
+  # metric(x0, y0, x1, y1) weighting the edges between nodes by their coordinates, which also makes
+  # it a lower bound on path lengths for A*. Edge weights of plain nodes are arbitrary, so they have none
+  metric = None
+
   def __init__(self, x, y, label):
     self._x = x
     self._y = y
     self._label = label
+    # Integer id, dense from 0 in insertion order - assigned by StreetGraph.add_node
+    self._id = None
     self._neighbors = {}
-    
+
   def __repr__(self):
-    return self._label
+    return str(self._label)
 
   def add_neighbor(self, other, dist = 1):
     assert isinstance(other, Node)
@@ -104,118 +196,641 @@ class Node(object):
 
 class EuclideanNode(Node):
   """Node in a graph representing a single street intersection. Calculates Euclidian distance between other's x and y"""
+  __slots__ = ()
+  metric = staticmethod(euclidean)
+
   def __init__(self, *args):
     super(EuclideanNode, self).__init__(*args)
 
   def add_neighbor(self, other, dist = 1):
     assert isinstance(other, Node)
     assert other not in self._neighbors
-    self._neighbors[other] = math.sqrt((self._x - other._x)**2 + (self._y - other._y)**2)
+    self._neighbors[other] = euclidean(self._x, self._y, other._x, other._y)
 
 
 class ManhattanNode(Node):
   """Node in a graph representing a single street intersection. Calculates Manhattan distance between other's x and y"""
+  __slots__ = ()
+  metric = staticmethod(manhattan)
+
   def __init__(self, *args):
     super(ManhattanNode, self).__init__(*args)
 
   def add_neighbor(self, other, dist = 1):
     assert isinstance(other, Node)
     assert other not in self._neighbors
-    self._neighbors[other] = abs(self._x - other._x) + abs(self._y - other._y)
+    self._neighbors[other] = manhattan(self._x, self._y, other._x, other._y)
 
 
 class StreetGraph(object):
   """Graph class containing information and methods related to roadways"""
+  # Most nodes all cached shortest path trees may hold together, each costs about 250 bytes
+  TREE_CACHE_NODES = 1 << 20
+
   def __init__(self, nodeCls = Node, carCls = Car):
     self._nodes = set()
+    # Label -> node index, and nodes by integer id
+    self._labels = {}
+    self._node_list = []
     self._cars = set()
+    # {(node id, node id): cars} of the streets left on the route of each car, so a changed street only
+    # reaches the cars that will drive it - built the first time weights change
+    self._riders = None
+    # Cars with D* Lite state, which has to see every change
+    self._planning = set()
+    # Contraction hierarchy routing queries go through, dropped whenever the graph changes
+    self._hierarchy = None
+    # Landmark distances for ALT routing, dropped whenever the graph changes
+    self._landmarks = None
+    # Shortest path trees by source node, least recently used first, and the nodes they hold in total
+    self._trees = OrderedDict()
+    self._tree_nodes = 0
+    # Incoming edges of every node, for searching backwards - built when first needed
+    self._reverse = None
+    # Bumped whenever nodes or edges are added and on freeze/thaw, so cars can tell their D* Lite state
+    # is out of date
+    self._version = 0
+    # GridIndex over the node coordinates for nearest node and range queries, built when first needed
+    self._spatial = None
+    # EdgeColumns with the length, speed limit and capacity of streets that have a limit or capacity (of
+    # every street while frozen), created with the first one (see edges.py)
+    self._edges = None
+    # CompactGraph holding the edges and coordinates while the graph is frozen
+    self._compact = None
     self._nodeCls = nodeCls
     self._carCls = carCls
+    # Called as _on_pass(car, label) whenever a car passes a node - set by trace.Tracer
+    self._on_pass = None
 
-  def add_car(self, origin, destination, label, speed = 1):
-    delorian = self._carCls(origin, destination, label, self, speed)
+  def add_car(self, origin, destination = None, label = None, speed = 1):
+    # Either registers an existing Car, or builds a new carCls driving from origin to destination
+    if isinstance(origin, Car):
+      delorian = origin
+    else:
+      delorian = self._carCls(origin, destination, label, self, speed)
     self._cars.add(delorian)
+    self._board(delorian)
     return delorian
 
-  def add_car(self, vehicle):
-    assert isinstance(vehicle, Car)
-    self._cars.add(vehicle)
-    return
+  def _board(self, car):
+    # Put the route ahead of CAR into _riders
+    if car._next_node is not None:
+      self._ride(car, [car._last_node, car._next_node] + car._route)
+
+  def _ride(self, car, path):
+    # CAR will drive the streets between the labels PATH
+    riders = self._riders
+    if riders is not None:
+      for leg in self._legs(path):
+        cars = riders.get(leg)
+        if cars is None:
+          cars = riders[leg] = set()
+        cars.add(car)
+
+  def _leave(self, car, path):
+    # CAR won't drive the streets between the labels PATH (anymore)
+    riders = self._riders
+    if riders is not None:
+      for leg in self._legs(path):
+        cars = riders.get(leg)
+        if cars is not None:
+          cars.discard(car)
+          if not cars:
+            del riders[leg]
+
+  def _legs(self, path):
+    ids = [self._labels[label]._id for label in path]
+    return zip(ids, ids[1:])
 
   def add_node(self, x, y, label):
+    self._invalidate()
     node = self._nodeCls(x, y, label)
+    self._register(node)
+    return node._id
+
+  def _register(self, node):
+    assert node._label not in self._labels, "Duplicate node label: {}".format(node._label)
+    node._id = len(self._node_list)
+    self._node_list.append(node)
+    self._labels[node._label] = node
     self._nodes.add(node)
-
-  def add_edge(self, label1, label2, linkLife = 1):
+    if self._spatial is not None:
+      self._spatial.insert(node._x, node._y)
+
+  def _invalidate(self):
+    # The graph is changing, drop all routing data computed from it
+    if self._compact is not None:
+      raise Exception("The street graph is frozen, thaw() it before changing it")
+    self._version += 1
+    self._hierarchy = None
+    self._landmarks = None
+    self._drop_caches()
+
+  def _drop_caches(self):
+    # Routing data that depends on how the edges are stored
+    self._trees.clear()
+    self._tree_nodes = 0
+    self._reverse = None
+
+  def node_id(self, label):
+    # Integer id of the node labelled LABEL, for code that wants to index arrays by node
+    return self._node_from_label(label)._id
+
+  def node_label(self, node_id):
+    return self._node_list[node_id]._label
+
+  def add_edge(self, label1, label2, linkLife = 1, directed = False, speed_limit = NO_LIMIT, capacity = NO_LIMIT):
+    # A two way street, or only from label1 to label2 if DIRECTED. Cars drive it no faster than SPEED_LIMIT,
+    # and routing takes its travel time (see edges.py); CAPACITY is how many cars it holds
     node1 = self._node_from_label(label1)
     node2 = self._node_from_label(label2)
+    limited = speed_limit < NO_LIMIT or capacity < NO_LIMIT
+    if limited:
+      self._check_limits(speed_limit, capacity)
+    self._invalidate()
     node1.add_neighbor(node2, linkLife)
-    node2.add_neighbor(node1, linkLife)
+    if not directed:
+      node2.add_neighbor(node1, linkLife)
+    if limited:
+      if self._edges is None:
+        self._edges = EdgeColumns()
+      arcs = ((node1, node2),) if directed else ((node1, node2), (node2, node1))
+      for a, b in arcs:
+        self._edges.set(a._id, b._id, a._neighbors[b], speed_limit, capacity)
+      nodes = self._node_list
+      for (u, v), weight in self._travel_times((a._id, b._id) for a, b in arcs).items():
+        nodes[u]._neighbors[nodes[v]] = weight
+
+  def _check_limits(self, speed_limit, capacity):
+    if not speed_limit > 0:
+      raise ValueError("Speed limits must be positive, not {}".format(speed_limit))
+    if not capacity >= 0:
+      raise ValueError("Capacities must be non-negative, not {}".format(capacity))
+
+  def update_edge(self, label1, label2, weight, directed = False):
+    # Change the weight of an existing street, see update_edges
+    return self.update_edges([(label1, label2, weight)], directed)
+
+  def update_edges(self, changes, directed = False):
+    # Change the weights (lengths) of existing streets mid-run - congestion, or math.inf for a closure -
+    # from (label1, label2, weight) triples, both ways unless DIRECTED. Works on a frozen graph too. Cars
+    # the changes affect repair their remaining routes incrementally (see dynamic.py); the set of
+    # cars whose route changed is returned
+    metric = self._nodeCls.metric
+    edges = self._edges
+    # A street given more than once takes the last weight
+    weights = {}
+    lengths = []
+    for label1, label2, weight in changes:
+      if not weight >= 0:
+        raise ValueError("Edge weights must be non-negative, not {}".format(weight))
+      if metric is not None and weight < metric(*(self.get_xy_coords(label1) + self.get_xy_coords(label2))):
+        raise ValueError("{} edges can't be shorter than the distance between their ends".format(
+          self._nodeCls.__name__))
+      u = self.node_id(label1)
+      v = self.node_id(label2)
+      for a, b in ((u, v),) if directed else ((u, v), (v, u)):
+        row = None if edges is None else edges.row(a, b)
+        self._street_weight(a, b)
+        weights[(a, b)] = weight if row is None else travel_time(weight, edges.speed_limit[row], edges.fastest)
+        if row is not None:
+          lengths.append((row, weight))
+    for row, length in lengths:
+      edges.length[row] = length
+    return self._retime(weights)
+
+  def set_limit(self, label1, label2, speed_limit, capacity = NO_LIMIT, directed = False):
+    # Change the speed limit and capacity of an existing street, see set_limits
+    return self.set_limits([(label1, label2, speed_limit, capacity)], directed)
+
+  def set_limits(self, changes, directed = False):
+    # Change the speed limits and capacities of existing streets from (label1, label2, speed limit, capacity)
+    # tuples, both ways unless DIRECTED, NO_LIMIT (math.inf) for none. Routing goes by the new travel times
+    # and cars reroute as with update_edges, returning the set of cars whose route changed
+    for _, _, speed_limit, capacity in changes:
+      self._check_limits(speed_limit, capacity)
+    limits = []
+    for label1, label2, speed_limit, capacity in changes:
+      u = self.node_id(label1)
+      v = self.node_id(label2)
+      for a, b in ((u, v),) if directed else ((u, v), (v, u)):
+        limits.append((a, b, self._street_weight(a, b), speed_limit, capacity))
+    if self._edges is None:
+      self._edges = EdgeColumns()
+    edges = self._edges
+    for a, b, old, speed_limit, capacity in limits:
+      row = edges.row(a, b)
+      # Streets without a row have their length as weight
+      length = old if row is None else edges.length[row]
+      edges.set(a, b, length, speed_limit, capacity)
+    return self._retime(self._travel_times((a, b) for a, b, _, _, _ in limits))
+
+  def _travel_times(self, arcs):
+    # {(node id, node id): weight} of the streets ARCS, whose limits changed, and of every street with a
+    # limit if that moved the reference speed (see edges.py)
+    edges = self._edges
+    weights = {}
+    if edges.refresh():
+      for u, v, row in edges.limited():
+        weights[(u, v)] = edges.weight(row)
+    for u, v in arcs:
+      weights[(u, v)] = edges.weight(edges.row(u, v))
+    return weights
+
+  def _retime(self, weights):
+    # Put new WEIGHTS, {(node id, node id): weight}, into the edges and reroute cars. Each street appears
+    # once, so D* Lite gets its weight from before the call as the old one
+    arcs = [(a, b, self._weight(a, b), weight) for (a, b), weight in weights.items()]
+    for a, b, _, weight in arcs:
+      self._set_weight(a, b, weight)
+    # The node and edge sets are the same, only routing data built from the weights goes
+    self._hierarchy = None
+    self._landmarks = None
+    self._trees.clear()
+    self._tree_nodes = 0
+    if self._riders is None:
+      self._riders = {}
+      for car in self._cars:
+        self._board(car)
+    if any(new < old for _, _, old, new in arcs):
+      # A shorter street can shorten any route
+      ahead = dict.fromkeys(self._cars, True)
+    else:
+      # Cars with current D* Lite state see every change, the others only the streets on their routes
+      version = self._version
+      ahead = {car: False for car in self._planning if car._planner is not None and car._planner.version == version}
+      self._planning = set(ahead)
+      labels = self._labels
+      for a, b in weights:
+        for car in self._riders.get((a, b), ()):
+          if not ahead.get(car):
+            # Past the street being driven
+            ahead[car] = labels[car._last_node]._id != a or labels[car._next_node]._id != b
+    if self._compact is None:
+      nodes = self._node_list
+      arcs = [(nodes[a], nodes[b], old, new) for a, b, old, new in arcs]
+    return {car for car, flag in ahead.items() if car._reroute(arcs, flag)}
+
+  def _set_weight(self, u, v, w):
+    # Weight of edge U -> V, in both the edges and the incoming edges if those were built
+    if self._compact is not None:
+      self._compact.set_edge(u, v, w)
+      if self._reverse is not None:
+        self._reverse.set_edge(v, u, w)
+      return
+    node1 = self._node_list[u]
+    node2 = self._node_list[v]
+    node1._neighbors[node2] = w
+    if self._reverse is not None:
+      row = self._reverse[node2]
+      for i, (other, _) in enumerate(row):
+        if other is node1:
+          row[i] = (node1, w)
+          break
 
   def get_edge(self, label1, label2):
+    # Length of the street from label1 to label2
     node1 = self._node_from_label(label1)
     node2 = self._node_from_label(label2)
+    if self._edges is not None:
+      row = self._edges.row(node1._id, node2._id)
+      if row is not None:
+        return self._edges.length[row]
+    if self._compact is not None:
+      return self._compact.edge(node1._id, node2._id)
     return node1._neighbors[node2]
 
+  def get_limits(self, label1, label2):
+    # (speed limit, capacity) of the street from label1 to label2, NO_LIMIT where it has none
+    node1 = self._node_from_label(label1)
+    node2 = self._node_from_label(label2)
+    self._street_weight(node1._id, node2._id)
+    row = None if self._edges is None else self._edges.row(node1._id, node2._id)
+    if row is None:
+      return NO_LIMIT, NO_LIMIT
+    return self._edges.speed_limit[row], self._edges.capacity[row]
+
+  def _speed_limit(self, label1, label2):
+    # get_limits(label1, label2)[0] for the streets cars drive, which exist
+    row = self._edges.row(self._labels[label1]._id, self._labels[label2]._id)
+    return NO_LIMIT if row is None else self._edges.speed_limit[row]
+
+  def congested_edges(self):
+    # {(label1, label2): number of cars} for the streets more cars are driving than their capacity
+    if self._edges is None:
+      return {}
+    load = {}
+    for car in self._cars:
+      if car._next_node is not None:
+        street = (car._last_node, car._next_node)
+        load[street] = load.get(street, 0) + 1
+    return {street: cars for street, cars in load.items() if cars > self.get_limits(*street)[1]}
+
   def get_xy_coords(self, label):
     node = self._node_from_label(label)
+    if self._compact is not None:
+      return self._compact.xy(node._id)
     return node._x, node._y 
 
+  def _spatial_index(self):
+    if self._spatial is None:
+      nodes = self._node_list
+      self._spatial = GridIndex([n._x for n in nodes], [n._y for n in nodes])
+    return self._spatial
+
+  def nearest_nodes(self, x, y, k = 1):
+    # Labels of the K nodes closest to (X, Y) in straight line distance, closest first
+    nodes = self._node_list
+    return [nodes[i]._label for i in self._spatial_index().nearest(x, y, k)]
+
+  def nodes_in_box(self, x0, y0, x1, y1):
+    # Labels of the nodes with X0 <= x <= X1 and Y0 <= y <= Y1, in node id order
+    nodes = self._node_list
+    return [nodes[i]._label for i in self._spatial_index().box(x0, y0, x1, y1)]
+
+  def nodes_within(self, x, y, radius):
+    # Labels of the nodes at most RADIUS from (X, Y), in node id order
+    nodes = self._node_list
+    return [nodes[i]._label for i in self._spatial_index().within(x, y, radius)]
+
+  def _weight(self, u, v):
+    # Weight of the edge between node ids U and V
+    if self._compact is not None:
+      return self._compact.edge(u, v)
+    return self._node_list[u]._neighbors[self._node_list[v]]
+
+  def _street_weight(self, u, v):
+    # _weight for edges given by callers, a KeyError naming the labels when there is no such street
+    try:
+      return self._weight(u, v)
+    except KeyError:
+      raise KeyError("No street could be found from {} to {}".format(self.node_label(u), self.node_label(v))) from None
+
+  def _arcs(self):
+    # Every edge as (node id, node id, weight), by first id - both directions of an add_edge are there
+    if self._compact is not None:
+      c = self._compact
+      sources = np.repeat(np.arange(len(self._node_list)), np.diff(c.offsets))
+      return zip(sources.tolist(), c.targets.tolist(), c.weights.tolist())
+    return ((node._id, other._id, w) for node in self._node_list for other, w in node._neighbors.items())
+
+  def freeze(self):
+    # Compact mode: move the edges and coordinates into NumPy arrays (see compact.py) and drop the per
+    # node neighbour dicts. get_edge, get_xy_coords and routing then run on the arrays. A frozen graph
+    # can't be changed until thaw() is called
+    if self._compact is None:
+      self._compact = compact(self)
+      if self._edges is not None:
+        self._edges.freeze(self._compact)
+      self._version += 1
+      self._drop_caches()
+      for node in self._node_list:
+        node._neighbors = None
+    return self._compact
+
+  def thaw(self):
+    # Back to neighbour dicts on the nodes
+    c = self._compact
+    if c is None:
+      return
+    nodes = self._node_list
+    for node in nodes:
+      node._neighbors = {}
+    for u, v, w in self._arcs():
+      nodes[u]._neighbors[nodes[v]] = w
+    self._compact = None
+    if self._edges is not None:
+      self._edges.thaw()
+    self._version += 1
+    self._drop_caches()
+
+  def _key(self, label):
+    # What _search works on: nodes, or node ids when frozen
+    node = self._node_from_label(label)
+    return node if self._compact is None else node._id
+
   def _node_from_label(self, label):
-    for n in self._nodes:
-      if n._label == label:
-        return n
+    node = self._labels.get(label)
+    if node is not None:
+      return node
     raise Exception("No node could be found corresponding to label: {}".format(label))
 
-  def shortest_path(self, label1, label2):
+  def shortest_path(self, label1, label2, method = None):
     # Returns a list of labels corresponding to the shortest path from label1 to label2 and the total distance
-    s = self._node_from_label(label1)
-    t = self._node_from_label(label2)
-    if not s or not t:
-      return
-
-    dist = {}
-    prev = {}
-
-    for n in self._nodes:
-      dist[n] = math.inf
-      prev[n] = None
-
-    dist[s] = 0
-
-    Q = copy.copy(self._nodes)
-    while Q:
-      # O(n^2) time because I'm a piece of human garbage
-      _, smallest = min([ (dist[n], n) for n in Q ], key = lambda x: x[0])
-      Q.remove(smallest)
+    # METHOD is 'dijkstra', 'bidirectional', 'astar', 'alt', 'ch' or 'tree'. By default the path is read off a cached
+    # shortest path tree from label1 if there is one, then the contraction hierarchy is used if the graph has one,
+    # then ALT if landmarks were selected, then A* when the node class has a distance estimate (EuclideanNode,
+    # ManhattanNode) and Dijkstra otherwise
+    s = self._key(label1)
+    if method == 'tree' or (method is None and s in self._trees):
+      return self.routes_from(label1, [label2])[0]
+    if method == 'ch' or (method is None and self._hierarchy is not None):
+      if self._hierarchy is None:
+        raise ValueError("No contraction hierarchy, call contract() first")
+      return self._hierarchy.shortest_path(label1, label2)
+    t = self._key(label2)
+    if method == 'bidirectional':
+      path, dist, _ = self._bidirectional(s, t)
+      if self._compact is None:
+        return [n._label for n in path], dist
+      return [self._node_list[i]._label for i in path], dist
+    if method == 'alt' or (method is None and self._landmarks is not None):
+      if self._landmarks is None:
+        raise ValueError("No landmarks, call select_landmarks() first")
+      dist, prev, _ = self._search(s, t, bound = self._landmarks.bounds(self.node_id(label2)))
+      return self._route(dist, prev, t)
+    dist, prev, _ = self._search(s, t, self._heuristic(method))
+    return self._route(dist, prev, t)
+
+  def _route(self, dist, prev, t):
+    path = []
+    bt = t
+    while bt is not None:
+      path.append(bt)
+      bt = prev.get(bt)
+    path.reverse()
+
+    if self._compact is None:
+      return [n._label for n in path], dist.get(t, math.inf)
+    return [self._node_list[i]._label for i in path], dist.get(t, math.inf)
+
+  def shortest_path_tree(self, label):
+    # Dijkstra from LABEL to every node it reaches, as ({node: distance}, {node: previous node}), keyed by
+    # node ids when frozen. Trees are kept in an LRU cache holding at most TREE_CACHE_NODES nodes, until
+    # the graph changes
+    s = self._key(label)
+    tree = self._trees.get(s)
+    if tree is not None:
+      self._trees.move_to_end(s)
+      return tree
+    dist, prev, _ = self._search(s, None)
+    tree = (dist, prev)
+    if len(dist) <= self.TREE_CACHE_NODES:
+      self._trees[s] = tree
+      self._tree_nodes += len(dist)
+      while self._tree_nodes > self.TREE_CACHE_NODES:
+        _, (evicted, _) = self._trees.popitem(last = False)
+        self._tree_nodes -= len(evicted)
+    return tree
+
+  def routes_from(self, label1, labels):
+    # One to many routing: the shortest_path from label1 to each of LABELS, all read off one tree.
+    # Cars built from label1 afterwards get their routes from the same cached tree
+    dist, prev = self.shortest_path_tree(label1)
+    return [self._route(dist, prev, self._key(label)) for label in labels]
+
+  def contract(self, hierarchy = None):
+    # Preprocess the graph into a contraction hierarchy, or use HIERARCHY (from hierarchy.load_hierarchy).
+    # Routing goes through it until the next add_node or add_edge
+    self._hierarchy = hierarchy if hierarchy is not None else ContractionHierarchy(self)
+    return self._hierarchy
+
+  def select_landmarks(self, count = 8, landmarks = None):
+    # Preprocess for ALT routing: distances from and to COUNT landmarks (see landmarks.py), or use LANDMARKS
+    # (from mapfile.open_map). More landmarks give tighter bounds for 2 * COUNT floats per node. Used until
+    # the next add_node or add_edge
+    self._landmarks = landmarks if landmarks is not None else Landmarks(self, count)
+    return self._landmarks
+
+  def _heuristic(self, method):
+    metric = self._nodeCls.metric
+    if method is None:
+      method = 'dijkstra' if metric is None else 'astar'
+    if method == 'dijkstra':
+      return None
+    if method == 'astar':
+      if metric is None:
+        raise ValueError("A* needs a node class with a distance metric, not {}".format(self._nodeCls.__name__))
+      # Travel times too are no shorter than lengths (see edges.py)
+      return metric
+    raise ValueError("Unknown routing method: {}".format(method))
+
+  def _search(self, s, t, metric = None, bound = None):
+    # Dijkstra on a binary heap, or A* with METRIC(x0, y0, x1, y1) as the heuristic, from S until T is
+    # settled (or everything, if T is None). S and T come from _key. Returns (dist, prev, number of nodes settled)
+    # BOUND, a lower bound on the distance to T as a function of the node id (Landmarks.bounds), is the heuristic
+    # instead of METRIC when given
+    # Heap entries are (key, -dist, node id, node): among equal keys the node furthest along goes first,
+    # which keeps A* from fanning out over every tied node on grids, and the node id makes the remaining
+    # ties always go the same way
+    if self._compact is not None:
+      return self._compact.search(s, t, metric, bound)
+    dist = {s: 0}
+    prev = {s: None}
+    if bound is not None:
+      heap = [(bound(s._id), 0, s._id, s)]
+    else:
+      heap = [(0 if metric is None else metric(s._x, s._y, t._x, t._y), 0, s._id, s)]
+    settled = 0
+    while heap:
+      _, d, _, smallest = heapq.heappop(heap)
+      d = -d
+      if d > dist[smallest]:
+        # Stale entry, smallest was reached through a shorter path since
+        continue
+      settled += 1
+      if smallest is t:
+        break
       for neighbor, ndist in smallest.neighbors():
-        newdist = dist[smallest] + ndist
-        if newdist < dist[neighbor]:
+        newdist = d + ndist
+        if newdist < dist.get(neighbor, math.inf):
           dist[neighbor] = newdist
           prev[neighbor] = smallest
-
-    path = []
-    bt = t
-    while bt:
-      path.insert(0, bt._label)
-      bt = prev[bt]
-
-    return path, dist[t]
+          if bound is not None:
+            key = newdist + bound(neighbor._id)
+          else:
+            key = newdist if metric is None else newdist + metric(neighbor._x, neighbor._y, t._x, t._y)
+          heapq.heappush(heap, (key, -newdist, neighbor._id, neighbor))
+    return dist, prev, settled
+
+  def _reversed(self):
+    # Incoming edges: a transposed CompactGraph when frozen, otherwise {node: [(node, weight)]}
+    if self._reverse is None:
+      if self._compact is not None:
+        self._reverse = self._compact.transpose()
+      else:
+        reverse = {}
+        for node in self._node_list:
+          for other, w in node._neighbors.items():
+            reverse.setdefault(other, []).append((node, w))
+        self._reverse = reverse
+    return self._reverse
+
+  def _bidirectional(self, s, t):
+    # Dijkstra forward from S and backward from T over the incoming edges, advancing whichever side has
+    # the closer node. Every edge relaxed into a node the other side has reached gives an S-T path; once
+    # the closest nodes left on both sides add up to no less than the best of those, nothing can beat it.
+    # S and T come from _key. Returns (path as keys, distance, number of nodes settled)
+    if s == t:
+      return [s], 0, 1
+    if self._compact is not None:
+      adjacency = (self._compact.row, self._reversed().row)
+    else:
+      reverse = self._reversed()
+      adjacency = (lambda u: u._neighbors.items(), lambda u: reverse.get(u, ()))
+    dist = ({s: 0}, {t: 0})
+    # Previous node towards S on the forward side, next node towards T with the edge weight on the backward side
+    prev = ({s: None}, {t: None})
+    heaps = ([(0, 0, s)], [(0, 1, t)])
+    seq = count(2)
+    best = math.inf
+    meet = None
+    settled = 0
+    while heaps[0] and heaps[1]:
+      if heaps[0][0][0] + heaps[1][0][0] >= best:
+        break
+      side = 0 if heaps[0][0][0] <= heaps[1][0][0] else 1
+      d, _, u = heapq.heappop(heaps[side])
+      mine = dist[side]
+      if d > mine[u]:
+        continue
+      settled += 1
+      theirs = dist[1 - side]
+      back = prev[side]
+      heap = heaps[side]
+      for v, w in adjacency[side](u):
+        newdist = d + w
+        known = mine.get(v, math.inf)
+        if newdist < known:
+          mine[v] = known = newdist
+          back[v] = (u, w)
+          heapq.heappush(heap, (newdist, next(seq), v))
+        other = theirs.get(v)
+        if other is not None and known + other < best:
+          best = known + other
+          meet = v
+    if meet is None:
+      return [t], math.inf, settled
+
+    x = meet
+    path = [x]
+    while prev[0][x] is not None:
+      x = prev[0][x][0]
+      path.append(x)
+    path.reverse()
+    # Summed from S edge by edge, the way the one directional search accumulates it
+    total = dist[0][meet]
+    x = meet
+    while prev[1][x] is not None:
+      x, w = prev[1][x]
+      total = total + w
+      path.append(x)
+    return path, total, settled
 
 #########################################################################################
 
-class RoutingGraph(Object):
+class RoutingGraph(object):
   """Routing Graph keeps track of the LinkLife/Edges"""
   def __init__(self, sGraph):
     assert isinstance(sGraph, StreetGraph)
     self._nodes = sGraph._cars
-    edges = dict()
-    setEdges(sGraph)
+    self.edges = dict()
+    self.setEdges()
 
   def setEdges(self):
     for c in self._nodes:
-      for k, v in c._linkLife:
-        edges[c] = (k, v)
+      for k, v in c._linkLife.items():
+        self.edges[c] = (k, v)
 
 
 
@@ -1,47 +1,365 @@
-from heapq import heappop, heappush
+from itertools import count
+
+import numpy as np
+
+from .schedulers import HeapScheduler
 
 class NoEventError(Exception):
   pass
 
+class EventHandle(object):
+  """Returned by add_event. cancel() revokes the event in O(1) by turning its queue entry into a tombstone"""
+  __slots__ = ('time', 'eventfunc', 'message', '_env')
+
+  def __init__(self, env, time, eventfunc, message):
+    self.time = time
+    self.eventfunc = eventfunc
+    self.message = message
+    self._env = env
+
+  def __repr__(self):
+    return "<EventHandle {} at {}>".format(self.message, self.time)
+
+  @property
+  def pending(self):
+    # False once the event has run or been cancelled
+    return self._env is not None
+
+  def _schedule(self, env, time):
+    # (Re)insert this handle into env's queue
+    self._env = env
+    self.time = time
+    env.event_queue.push((time, next(env._seq), self))
+
+  def cancel(self):
+    # Returns whether anything was cancelled - cancelling a finished event is a no-op
+    env = self._env
+    if env is None:
+      return False
+    self._env = None
+    self.eventfunc = None
+    env._add_tombstone()
+    return True
+
+class _Taken(object):
+  """Environment of the events popped for a batch that hasn't run them yet. They are out of the queue,
+  so cancelling one leaves no tombstone behind"""
+  def _add_tombstone(self):
+    pass
+
+_TAKEN = _Taken()
+
+class BatchHandler(object):
+  """Batch-aware event handler. All of its events due at the same instant are delivered in one call
+  as a list of their payloads (or a NumPy array with as_array), instead of one Python call per event"""
+  def __init__(self, func, as_array = False):
+    self.func = func
+    self.as_array = as_array
+
+  def __call__(self, payloads):
+    if self.as_array:
+      payloads = np.asarray(payloads)
+    self.func(payloads)
+
+class BatchEvent(EventHandle):
+  """Queue entry for a BatchHandler, carrying the payload handed to it"""
+  __slots__ = ('payload',)
+
+  def __init__(self, env, time, eventfunc, message, payload):
+    super(BatchEvent, self).__init__(env, time, eventfunc, message)
+    self.payload = payload
+
+class Signal(object):
+  """Something processes can wait on. A process that yields a signal is suspended until fire(value)
+  is called, and the yield then evaluates to value. Signals can be fired any number of times"""
+  def __init__(self, env):
+    self._env = env
+    self._waiters = []
+
+  def fire(self, value = None):
+    # Wake everything currently waiting. They resume at the current time, after the running event
+    waiters, self._waiters = self._waiters, []
+    for process in waiters:
+      process._waiting = None
+      process._send = value
+      process._schedule(self._env, self._env.time_elapsed)
+
+class Process(EventHandle):
+  """Actor driven by a generator. The generator yields a delay to sleep for, a Signal or another Process
+  to wait on. The Environment resumes it directly and the process is its own queue entry handle, so each
+  step costs one queue tuple - no closures or bound methods are created per step"""
+  __slots__ = ('env', 'alive', 'value', 'finished', '_gen', '_send', '_waiting')
+
+  def __init__(self, env, generator, message = "process"):
+    super(Process, self).__init__(None, env.time_elapsed, self._resume, message)
+    self.env = env
+    self.alive = True
+    # Whatever the generator returned, once it is done
+    self.value = None
+    # Fired with value when the generator finishes
+    self.finished = Signal(env)
+    self._gen = generator
+    self._send = None
+    self._waiting = None
+
+  def __repr__(self):
+    return "<Process {}>".format(self.message)
+
+  def _resume(self):
+    value, self._send = self._send, None
+    try:
+      target = self._gen.send(value)
+    except StopIteration as stop:
+      if self.alive:
+        self._finish(stop.value)
+      return
+    except BaseException:
+      self.alive = False
+      raise
+    if not self.alive:
+      # Cancelled itself while running, it is closed now that it has stopped
+      self._gen.close()
+      return
+    if isinstance(target, Signal):
+      self._waiting = target
+      target._waiters.append(self)
+    elif isinstance(target, Process):
+      if target.alive:
+        self._waiting = target.finished
+        target.finished._waiters.append(self)
+      else:
+        self._send = target.value
+        self._schedule(self.env, self.env.time_elapsed)
+    else:
+      self._schedule(self.env, self.env.time_elapsed + target)
+
+  def _finish(self, value):
+    self.alive = False
+    self.value = value
+    self.finished.fire(value)
+
+  def cancel(self):
+    # Kill the process wherever it is - sleeping in the queue or waiting on a signal. A process may cancel
+    # itself: it is dead at once and its generator is closed at its next yield
+    if not self.alive:
+      return False
+    if self._waiting is not None:
+      self._waiting._waiters.remove(self)
+      self._waiting = None
+    elif self._env is not None:
+      env = self._env
+      self._env = None
+      env._add_tombstone()
+    if not self._gen.gi_running:
+      self._gen.close()
+    self._finish(None)
+    return True
+
+class PeriodicEvent(EventHandle):
+  """Recurring event. The handle re-inserts itself after every firing, so nothing is allocated per
+  period beyond the queue tuple. Cancelling it stops all future firings"""
+  __slots__ = ('env', 'period', 'until', 'fired', '_func', '_start')
+
+  def __init__(self, env, func, period, start, until, message):
+    super(PeriodicEvent, self).__init__(None, start, self._fire, message)
+    self.env = env
+    self.period = period
+    self.until = until
+    # Number of times func has run so far
+    self.fired = 0
+    self._func = func
+    self._start = start
+
+  def __repr__(self):
+    return "<PeriodicEvent {} every {}>".format(self.message, self.period)
+
+  def _fire(self):
+    # Reschedule before running, so func may cancel its own recurrence
+    self.fired += 1
+    # Computed from the start time rather than accumulated, so float periods don't drift
+    time = self._start + self.fired * self.period
+    if self.until is None or time <= self.until:
+      self._schedule(self.env, time)
+    self._func()
+
 class Environment(object):
   """Parent environment used to run Discrete Event Simulations"""
-  def __init__(self, verbosity = False):
+  # Compact the queue once this fraction of it is cancelled events...
+  COMPACT_RATIO = 0.5
+  # ...but don't bother for small queues
+  COMPACT_MIN = 1024
+
+  def __init__(self, verbosity = False, scheduler = None):
     self.time_elapsed = 0
-    self.event_queue = []
+    # Scheduler holding (absolute time, sequence number, EventHandle)
+    # The sequence number breaks ties so same-time events run in insertion order
+    # Any backend from schedulers.py can be plugged in, the default is a binary heap
+    self.event_queue = scheduler if scheduler is not None else HeapScheduler()
+    self._seq = count()
+    # Cancelled events still sitting in event_queue
+    self._tombstones = 0
+    # When set, events are run through _run_handler(handle, args) instead of handle.eventfunc(*args) -
+    # trace.Tracer times them this way
+    self._run_handler = None
     self.v = verbosity
-    
-  def add_event(self, eventfunc, time, message="some"):
+
+  def add_event(self, eventfunc, time, message="some", payload=None):
     # Events are just functions. When the function is executed, the event is done
     # Time is relative- an event with time=5 added at time_elapsed=2 will occur at time_elapsed=7
-    heappush(self.event_queue, (time, eventfunc, message))
-    
-  def add_fixed_event(self, eventfunc, time, message="some"):
+    # If eventfunc is a BatchHandler, payload is what it receives for this event
+    return self.add_fixed_event(eventfunc, self.time_elapsed + time, message, payload)
+
+  def add_fixed_event(self, eventfunc, time, message="some", payload=None):
     # Adds an event at an absolute time - not relative
-    self.add_event(eventfunc, time-self.time_elapsed, message)
-    
+    if isinstance(eventfunc, BatchHandler):
+      handle = BatchEvent(self, time, eventfunc, message, payload)
+    else:
+      handle = EventHandle(self, time, eventfunc, message)
+    self.event_queue.push((time, next(self._seq), handle))
+    return handle
+
+  def add_periodic_event(self, eventfunc, period, message="some", phase=None, until=None):
+    # Run eventfunc every PERIOD time units. The first run is PHASE from now (a full period by default)
+    # and no run happens after the absolute time UNTIL. Returns a handle whose cancel() stops it
+    assert period > 0
+    start = self.time_elapsed + (period if phase is None else phase)
+    handle = PeriodicEvent(self, eventfunc, period, start, until, message)
+    if until is None or start <= until:
+      handle._schedule(self, start)
+    return handle
+
+  def process(self, generator, message = "process"):
+    # Start a generator based process. It first runs at the current time, after any events already due now
+    process = Process(self, generator, message)
+    process._schedule(self, self.time_elapsed)
+    return process
+
+  def signal(self):
+    return Signal(self)
+
+  def next_event_time(self):
+    # Time of the soonest event that hasn't been cancelled, or None if nothing is pending
+    queue = self.event_queue
+    while len(queue):
+      entry = queue.peek()
+      if entry[2]._env is not None:
+        return entry[0]
+      queue.pop()
+      self._tombstones -= 1
+    return None
+
+  def pending_events(self):
+    # Number of events still due to run, not counting cancelled ones
+    return len(self.event_queue) - self._tombstones
+
+  def _add_tombstone(self):
+    self._tombstones += 1
+    if self._tombstones >= self.COMPACT_MIN and self._tombstones > self.COMPACT_RATIO * len(self.event_queue):
+      self.compact()
+
+  def compact(self):
+    # Drop every cancelled event from the queue in one O(n) pass
+    self.event_queue.compact(lambda entry: entry[2]._env is not None)
+    self._tombstones = 0
+
+  def _pop_live(self):
+    # Pop the soonest event that hasn't been cancelled and advance the clock to it
+    pop = self.event_queue.pop
+    while True:
+      try:
+        time, _, handle = pop()
+      except IndexError:
+        self.v and print("No events left in queue")
+        raise NoEventError()
+      if handle._env is not None:
+        break
+      self._tombstones -= 1
+    assert time >= self.time_elapsed
+    self.time_elapsed = time
+    return handle
+
   def do_next_event(self):
-    # Pop the soonest event off the heap and run it
-    # Decrease the time of all the other events
-    try:
-      time, eventfunc, message = heappop(self.event_queue)
-      assert time > 0
-      self.time_elapsed += time
-      self.v and print("Executing {} event at time {}".format(message, self.time_elapsed))
-      self.event_queue = [(t-time, e, m) for t,e,m in self.event_queue]
-      eventfunc()
-    except IndexError:
-      self.v and print("No events left in queue")
-      raise NoEventError()
-      
+    # Pop the soonest event off the scheduler and run it
+    # Times are absolute, so nothing else in the queue has to be touched
+    # Cancelled events are skipped on the way
+    handle = self._pop_live()
+    handle._env = None
+    self.v and print("Executing {} event at time {}".format(handle.message, self.time_elapsed))
+    args = ([handle.payload],) if handle.__class__ is BatchEvent else ()
+    if self._run_handler is None:
+      handle.eventfunc(*args)
+    else:
+      self._run_handler(handle, args)
+
+  def _pop_batch(self):
+    # Pop every live event due at the next timestamp and mark them taken. Returns them in order, along
+    # with the BatchEvents among them grouped by handler
+    first = self._pop_live()
+    first._env = _TAKEN
+    time = self.time_elapsed
+    batch = [first]
+    grouped = first.__class__ is BatchEvent
+    queue = self.event_queue
+    while len(queue):
+      if queue.peek()[0] != time:
+        break
+      handle = queue.pop()[2]
+      if handle._env is None:
+        self._tombstones -= 1
+        continue
+      handle._env = _TAKEN
+      grouped = grouped or handle.__class__ is BatchEvent
+      batch.append(handle)
+    self.v and print("Executing batch of {} events at time {}".format(len(batch), time))
+
+    groups = {}
+    if grouped:
+      for handle in batch:
+        if handle.__class__ is BatchEvent:
+          groups.setdefault(handle.eventfunc, []).append(handle)
+    return batch, groups
+
+  def _take_payloads(self, handle, groups):
+    # Claim the payloads of every event in HANDLE's group that is still pending
+    payloads = []
+    for member in groups.pop(handle.eventfunc):
+      if member._env is not None:
+        member._env = None
+        payloads.append(member.payload)
+    return payloads
+
+  def do_next_batch(self):
+    # Pop every event due at the next timestamp and run them in order
+    # Each BatchHandler is called once, at the position of its first event, with all of its payloads
+    # Events added for this same time while the batch runs make up the next batch
+    batch, groups = self._pop_batch()
+    run = self._run_handler
+    for handle in batch:
+      # Cancelled by an earlier event in the batch
+      if handle._env is None:
+        continue
+      if handle.__class__ is BatchEvent:
+        payloads = self._take_payloads(handle, groups)
+        if run is None:
+          handle.eventfunc(payloads)
+        else:
+          run(handle, (payloads,))
+      else:
+        handle._env = None
+        if run is None:
+          handle.eventfunc()
+        else:
+          run(handle, ())
+
   def run(self):
     # Run events until there are no more in the queue
     while True:
       try:
-        self.do_next_event()
+        self.do_next_batch()
       except NoEventError:
         break
 
   def run_till_time(self, time):
     # Run till total time elapsed is greater than TIME
     while self.time_elapsed < time:
-      self.do_next_event()
+      self.do_next_batch()
@@ -0,0 +1,182 @@
+import heapq
+import math
+from itertools import count
+
+# D* Lite (Koenig & Likhachev), for repairing a car's route when edge weights change while it drives.
+#
+# The search runs backwards, from the car's destination towards the node it is heading to, and keeps
+# for every node it has touched g, the distance to the goal it last settled on, and rhs, the one
+# step lookahead min over edges u -> v of w(u, v) + g(v). A node is consistent when the two agree;
+# inconsistent nodes wait in a priority queue. When weights change only the tails of the changed
+# edges get their rhs fixed, and the search settles just the inconsistent region that can reach the
+# car - everything else carries over from the previous search. The car moving towards the goal is
+# handled with KM, which raises every new key by how far the start moved instead of re-keying the
+# queue. With a node class metric the keys include it as an A* estimate from the start.
+#
+# This is the optimised version from the paper: settling a node only relaxes its predecessors' rhs,
+# and an rhs is recomputed over all edges only when the edge it came through got worse.
+
+
+class DStarLite(object):
+  """Shortest path from START (where a car is heading) to GOAL on SG, repaired with update() as edge
+  weights change. Nodes are _search keys. Built by Car when a weight change first affects it"""
+  def __init__(self, sg, start, goal):
+    # Search state is only good for the graph and node keys it was built with, see StreetGraph._version
+    self.version = sg._version
+    if sg._compact is not None:
+      self._successors = sg._compact.row
+      self._predecessors = sg._reversed().row
+      xy = sg._compact.xy
+    else:
+      reverse = sg._reversed()
+      self._successors = lambda u: u._neighbors.items()
+      self._predecessors = lambda v: reverse.get(v, ())
+      xy = lambda u: (u._x, u._y)
+    metric = None if sg._nodeCls.metric is None else sg._heuristic('astar')
+    self._h = None if metric is None else lambda u, v: metric(*(xy(u) + xy(v)))
+    self.start = start
+    self.goal = goal
+    self._last = start
+    self._km = 0
+    self._g = {}
+    self._rhs = {goal: 0}
+    # Node -> key of its live heap entry. Superseded entries stay in the heap and are skipped
+    self._queued = {}
+    self._heap = []
+    self._seq = count()
+    self._queue(goal)
+    self._compute()
+
+  def _key(self, u):
+    m = min(self._g.get(u, math.inf), self._rhs.get(u, math.inf))
+    if self._h is None:
+      return (m + self._km, m)
+    return (m + self._h(self.start, u) + self._km, m)
+
+  def _queue(self, u):
+    # Queue U if it is inconsistent, with a fresh key, or take it out if it isn't
+    if self._g.get(u, math.inf) != self._rhs.get(u, math.inf):
+      key = self._key(u)
+      self._queued[u] = key
+      heapq.heappush(self._heap, (key, next(self._seq), u))
+    else:
+      self._queued.pop(u, None)
+
+  def _top(self):
+    # (key, node) of the first live heap entry, ((inf, inf), None) when there is none
+    heap = self._heap
+    queued = self._queued
+    while heap:
+      key, _, u = heap[0]
+      if queued.get(u) == key:
+        return key, u
+      heapq.heappop(heap)
+    return (math.inf, math.inf), None
+
+  def _lookahead(self, u):
+    g = self._g
+    return min((w + g.get(v, math.inf) for v, w in self._successors(u)), default = math.inf)
+
+  def _compute(self, full = False):
+    # Settle inconsistent nodes until the start's distance is known, or until none are left if FULL
+    g = self._g
+    rhs = self._rhs
+    goal = self.goal
+    start = self.start
+    while True:
+      key, u = self._top()
+      if u is None or (not full and key >= self._key(start) and rhs.get(start, math.inf) <= g.get(start, math.inf)):
+        break
+      new = self._key(u)
+      if key < new:
+        # Its key rose since it was queued (KM grew), try again later
+        self._queue(u)
+        continue
+      heapq.heappop(self._heap)
+      del self._queued[u]
+      gu = rhs.get(u, math.inf)
+      if g.get(u, math.inf) > gu:
+        # Overconsistent: settle it at its lookahead distance, as Dijkstra would
+        g[u] = gu
+        for p, w in self._predecessors(u):
+          if p != goal and w + gu < rhs.get(p, math.inf):
+            rhs[p] = w + gu
+            self._queue(p)
+      else:
+        # Underconsistent: its distance went up, so it and whatever was routed through it is redone
+        old = g[u]
+        g[u] = math.inf
+        for p, w in self._predecessors(u):
+          if p != goal and rhs.get(p, math.inf) == w + old:
+            rhs[p] = self._lookahead(p)
+            self._queue(p)
+        self._queue(u)
+
+  def update(self, start, changes):
+    # The car is now heading to START and CHANGES, (node, node, old weight, new weight), happened
+    if self._h is not None:
+      self._km += self._h(self._last, start)
+    self._last = start
+    self.start = start
+    g = self._g
+    rhs = self._rhs
+    for u, v, old, new in changes:
+      if u == self.goal:
+        continue
+      if new < old:
+        rhs[u] = min(rhs.get(u, math.inf), new + g.get(v, math.inf))
+      elif rhs.get(u, math.inf) == old + g.get(v, math.inf):
+        rhs[u] = self._lookahead(u)
+      self._queue(u)
+    self._compute()
+
+  def path(self):
+    # Nodes from start to goal, or None if the goal can't be reached. Repairs only settle what the start's
+    # distance depends on, and zero weight cycles can leave g values propping each other up, so g can't
+    # just be followed downhill. The path is looked for among tight edges instead, and if there is none,
+    # after settling every inconsistent node and then once more after a search from scratch
+    path = self._tight()
+    if path is False:
+      self._compute(full = True)
+      path = self._tight()
+    if path is False:
+      self._g = {}
+      self._rhs = {self.goal: 0}
+      self._queued = {}
+      self._heap = []
+      self._queue(self.goal)
+      self._compute(full = True)
+      path = self._tight()
+    return path or None
+
+  def _tight(self):
+    # Depth first search from the start along edges u -> v with w(u, v) + g(v) = g(u), the start's
+    # distance being its rhs, trying the successor closest to the goal first. Any path found this way
+    # has the start's distance as its length. Returns None if the start's distance is inf, False if no
+    # such path reaches the goal
+    g = self._g
+    start = self.start
+    goal = self.goal
+    d = self._rhs.get(start, math.inf)
+    if d == math.inf:
+      return None
+    prev = {start: None}
+    stack = [(start, d)]
+    while stack:
+      u, du = stack.pop()
+      if u == goal:
+        path = []
+        while u is not None:
+          path.append(u)
+          u = prev[u]
+        return path[::-1]
+      tight = []
+      for v, w in self._successors(u):
+        gv = g.get(v, math.inf)
+        if v not in prev and gv < math.inf and w + gv == du:
+          prev[v] = u
+          tight.append((gv, v))
+      # Closest to the goal on top
+      tight.sort(key = lambda e: e[0], reverse = True)
+      stack.extend((v, gv) for gv, v in tight)
+    return False
@@ -0,0 +1,172 @@
+import math
+from array import array
+
+import numpy as np
+
+from .compact import _Views
+
+# Speed limits and capacities of streets, kept out of the routing data.
+#
+# Routing only ever looks at one number per edge, its weight in the node neighbour dicts or the CSR
+# arrays (compact.py). That weight is the street's travel time, so every routing method - Dijkstra,
+# A*, CH, ALT, trees, D* Lite - minimises time without knowing about limits. Every street is timed at
+# the same reference speed, the highest speed limit on the map (at least 1), or at its own limit if
+# that is lower: a street without a limit is no slower than any other. Times are counted in lengths
+# driven at the reference speed, so a street's weight is length * fastest / limit, and just its length
+# without a limit - graphs without limits route exactly as before, and weights are never shorter than
+# lengths, which keeps the node class metric a valid A* estimate. Raising or lowering the highest limit
+# changes the weight of every limited street.
+#
+# Everything else about an edge lives here, in array columns: its length (which the weight no longer
+# is), speed limit and capacity. While the graph can change, only streets with a limit or capacity
+# have a row, found through a dict keyed by (node id, node id). Once it is frozen there is a row for
+# every CSR slot instead, so the columns line up with TARGETS and WEIGHTS, an edge's row is found the
+# way CompactGraph.edge finds its weight, and a million streets take 24 MB rather than a dict entry
+# each. Cars look their street up once when they turn onto it.
+
+NO_LIMIT = math.inf
+
+_COLUMNS = ('length', 'speed_limit', 'capacity')
+
+
+class EdgeColumns(_Views):
+  """Length, speed limit and capacity of the edges of a StreetGraph, in array columns"""
+  def __init__(self, compact = None, rows = None, slots = None):
+    # Empty, or from the (source id, target id, length, speed limit, capacity) arrays ROWS of the
+    # streets with a limit or capacity, or from the per slot (length, speed limit, capacity) arrays
+    # SLOTS of the CompactGraph COMPACT (mapfile.open_map). With COMPACT the columns have a row per slot
+    self._rows = {}
+    self._compact = None
+    self._slots = None
+    self.length = array('d')
+    self.speed_limit = array('d')
+    self.capacity = array('d')
+    if slots is not None:
+      self._place(compact, slots)
+    elif rows is not None:
+      source, target = np.asarray(rows[0]), np.asarray(rows[1])
+      if compact is not None:
+        self._place(compact, _spread(compact, source, target, *rows[2:]))
+      else:
+        self._fill(source, target, rows[2:])
+    # The reference speed travel times are taken at
+    self.fastest = top_speed(self.speed_limit)
+
+  def _place(self, compact, slots):
+    # One row per slot of COMPACT. Scalars are read through memoryviews, like CompactGraph does
+    self._rows = {}
+    self._compact = compact
+    self._slots = [np.asarray(column, dtype = np.float64) for column in slots]
+    self._views()
+
+  def _fill(self, source, target, columns):
+    # A row for every (SOURCE, TARGET) edge, with the (length, speed limit, capacity) COLUMNS
+    self._rows = dict(zip(zip(source.tolist(), target.tolist()), range(len(source))))
+    self._compact = None
+    self._slots = None
+    for name, column in zip(_COLUMNS, columns):
+      setattr(self, name, array('d', np.asarray(column, dtype = np.float64).tobytes()))
+
+  def _views(self):
+    # Only with a row per slot, the columns are growable arrays otherwise
+    if self._slots is not None:
+      self.length, self.speed_limit, self.capacity = (memoryview(column) for column in self._slots)
+
+  def __len__(self):
+    return len(self.length)
+
+  def row(self, u, v):
+    # Row of edge U -> V, None if it has none
+    if self._compact is not None:
+      return self._compact.slot(u, v)
+    return self._rows.get((u, v))
+
+  def set(self, u, v, length, speed_limit, capacity):
+    # Attributes of edge U -> V. Call refresh() once done changing limits
+    row = self.row(u, v)
+    if row is None:
+      self._rows[(u, v)] = len(self.length)
+      self.length.append(length)
+      self.speed_limit.append(speed_limit)
+      self.capacity.append(capacity)
+    else:
+      self.length[row] = length
+      self.speed_limit[row] = speed_limit
+      self.capacity[row] = capacity
+
+  def refresh(self):
+    # Recompute the reference speed after changing limits, returns whether it moved
+    fastest = top_speed(self.speed_limit)
+    moved = fastest != self.fastest
+    self.fastest = fastest
+    return moved
+
+  def weight(self, row):
+    # Travel time of the edge in ROW
+    return travel_time(self.length[row], self.speed_limit[row], self.fastest)
+
+  def limited(self):
+    # (source id, target id, row) of every edge with a speed limit
+    if self._compact is not None:
+      c = self._compact
+      source = np.repeat(np.arange(len(c.offsets) - 1), np.diff(c.offsets))
+      rows = np.flatnonzero(self._slots[1] < NO_LIMIT)
+      return zip(source[rows].tolist(), c.targets[rows].tolist(), rows.tolist())
+    limits = self.speed_limit
+    return ((u, v, row) for (u, v), row in self._rows.items() if limits[row] < NO_LIMIT)
+
+  def freeze(self, compact):
+    # Switch to a row per slot of COMPACT, the graph's new CSR arrays
+    if self._compact is None:
+      self._place(compact, _spread(compact, *self.rows()))
+
+  def thaw(self):
+    # Back to rows for the streets with a limit or capacity only
+    if self._compact is not None:
+      rows = self.rows()
+      self._fill(rows[0], rows[1], rows[2:])
+
+  def rows(self):
+    # (source id, target id, length, speed limit, capacity) arrays of the streets with a limit or capacity
+    if self._compact is not None:
+      c = self._compact
+      length, speed_limit, capacity = self._slots
+      keep = np.flatnonzero((speed_limit < NO_LIMIT) | (capacity < NO_LIMIT))
+      source = np.repeat(np.arange(len(c.offsets) - 1), np.diff(c.offsets))
+      return source[keep], c.targets[keep], length[keep], speed_limit[keep], capacity[keep]
+    source, target = np.array(list(self._rows), dtype = np.int64).reshape(-1, 2).T
+    # Copies, views would stop the columns from growing
+    return (source, target) + tuple(np.array(getattr(self, name), dtype = np.float64) for name in _COLUMNS)
+
+  def slots(self, compact):
+    # (length, speed limit, capacity) arrays with a row per slot of COMPACT, a CompactGraph of the graph
+    if self._compact is not None:
+      return tuple(column.copy() for column in self._slots)
+    return _spread(compact, *self.rows())
+
+
+def _spread(compact, source, target, length, speed_limit, capacity):
+  # Per slot columns of COMPACT from rows for some of its edges. The others keep their weight as length
+  # and have no limit or capacity
+  n = len(compact.offsets) - 1
+  columns = (np.array(compact.weights, dtype = np.float64), np.full(len(compact.targets), NO_LIMIT),
+             np.full(len(compact.targets), NO_LIMIT))
+  if len(source):
+    # CSR slots are sorted by source, then target
+    keys = np.repeat(np.arange(n), np.diff(compact.offsets)) * n + compact.targets
+    at = np.searchsorted(keys, np.asarray(source) * n + np.asarray(target))
+    for column, values in zip(columns, (length, speed_limit, capacity)):
+      column[at] = values
+  return columns
+
+
+def top_speed(speed_limits):
+  # Reference speed for streets with SPEED_LIMITS: the highest limit, at least 1
+  limits = np.asarray(speed_limits)
+  limits = limits[limits < NO_LIMIT]
+  return max(1.0, float(limits.max())) if len(limits) else 1.0
+
+
+def travel_time(length, speed_limit, fastest):
+  # Weight routing uses for a street of LENGTH: its travel time in lengths driven at reference speed FASTEST
+  return length if speed_limit == NO_LIMIT else length * (fastest / speed_limit)
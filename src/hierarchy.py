@@ -0,0 +1,299 @@
+import heapq
+import math
+
+import numpy as np
+
+from .compact import _Views
+
+# Contraction hierarchies, for answering many point-to-point queries on a StreetGraph that doesn't change.
+#
+# Preprocessing contracts the nodes one at a time, least important first. Importance is the number
+# of shortcuts contracting a node would add minus the number of edges it would remove, plus the
+# number of its neighbours already contracted, which spreads contraction evenly over the map.
+# Contracting v removes it from the remaining graph and adds a shortcut u -> w, skipping v, for
+# every u -> v -> w that a bounded witness search can't beat with some other path. The order of
+# contraction is the node's rank. Every edge, original or shortcut, is kept at its lower ranked end:
+# edges going up from a node in the FWD arrays, edges coming down to it in the BWD arrays.
+#
+# A query is a Dijkstra search from both ends that only ever goes up in rank, so it settles a small
+# part of what a plain Dijkstra would. The two searches meet at the highest node of the shortest path.
+# Shortcuts remember the node they skip (MIDDLE, -1 for an original edge), which is how the path is
+# unpacked back onto the original graph.
+
+VERSION = 1
+# Nodes a witness search settles before giving up and adding the shortcut anyway
+WITNESS_LIMIT = 200
+# ...and when it only estimates how many shortcuts a node would need
+ESTIMATE_LIMIT = 30
+
+_ARRAYS = ('rank', 'fwd_offsets', 'fwd_targets', 'fwd_weights', 'fwd_middle',
+           'bwd_offsets', 'bwd_sources', 'bwd_weights', 'bwd_middle')
+
+
+def _witness(out, source, skip, targets, limit, settle_limit):
+  # Lengths of paths from SOURCE that avoid SKIP. The search stops once every one of TARGETS is
+  # settled, past distance LIMIT, or after SETTLE_LIMIT nodes
+  dist = {source: 0}
+  heap = [(0, source)]
+  left = len(targets)
+  settled = 0
+  while heap and settled < settle_limit:
+    d, u = heapq.heappop(heap)
+    if d > dist[u]:
+      continue
+    if d > limit:
+      break
+    settled += 1
+    if u in targets:
+      left -= 1
+      if not left:
+        break
+    for v, (w, _) in out[u].items():
+      if v == skip:
+        continue
+      newdist = d + w
+      if newdist < dist.get(v, math.inf):
+        dist[v] = newdist
+        heapq.heappush(heap, (newdist, v))
+  return dist
+
+
+def _shortcuts(out, inn, v, settle_limit = WITNESS_LIMIT):
+  # The (u, w, length) shortcuts contracting V needs
+  found = []
+  targets = out[v]
+  if not targets:
+    return found
+  longest = max(w for w, _ in targets.values())
+  for u, (wu, _) in inn[v].items():
+    dist = _witness(out, u, v, targets, wu + longest, settle_limit)
+    for x, (wx, _) in targets.items():
+      if x != u and dist.get(x, math.inf) > wu + wx:
+        found.append((u, x, wu + wx))
+  return found
+
+
+def _csr(rows, n):
+  # {other: (weight, middle)} per node -> offsets, others, weights, middles with rows sorted by other
+  offsets = np.zeros(n + 1, dtype = np.int64)
+  others = []
+  weights = []
+  middles = []
+  for v, row in enumerate(rows):
+    for other in sorted(row):
+      w, middle = row[other]
+      others.append(other)
+      weights.append(w)
+      middles.append(middle)
+    offsets[v + 1] = len(others)
+  return (offsets, np.array(others, dtype = np.int64), np.array(weights, dtype = np.float64),
+          np.array(middles, dtype = np.int64))
+
+
+def _contract(sg):
+  nodes = sg._node_list
+  n = len(nodes)
+  # Remaining graph as {neighbour id: (weight, middle)} in both directions
+  out = [{} for _ in range(n)]
+  inn = [{} for _ in range(n)]
+  for u, v, w in sg._arcs():
+    if u != v:
+      out[u][v] = (w, -1)
+      inn[v][u] = (w, -1)
+
+  deleted = [0] * n
+  rank = np.full(n, -1, dtype = np.int64)
+  fwd = [None] * n
+  bwd = [None] * n
+
+  def priority(v):
+    # Estimated with a cheaper witness search than the one contraction uses
+    return len(_shortcuts(out, inn, v, ESTIMATE_LIMIT)) - len(out[v]) - len(inn[v]) + deleted[v]
+
+  current = [priority(v) for v in range(n)]
+  heap = [(p, v) for v, p in enumerate(current)]
+  heapq.heapify(heap)
+  order = 0
+  while heap:
+    p, v = heapq.heappop(heap)
+    if rank[v] >= 0 or p != current[v]:
+      # Contracted already, or superseded by a newer priority
+      continue
+    shortcuts = _shortcuts(out, inn, v)
+
+    rank[v] = order
+    order += 1
+    fwd[v] = out[v]
+    bwd[v] = inn[v]
+    for x in out[v]:
+      del inn[x][v]
+    for u in inn[v]:
+      del out[u][v]
+    for u, x, w in shortcuts:
+      if w < out[u].get(x, (math.inf,))[0]:
+        out[u][x] = (w, v)
+        inn[x][u] = (w, v)
+    out[v] = {}
+    inn[v] = {}
+    # Only the neighbours' priorities change
+    neighbours = set(fwd[v]) | set(bwd[v])
+    for x in neighbours:
+      deleted[x] += 1
+    for x in neighbours:
+      current[x] = priority(x)
+      heapq.heappush(heap, (current[x], x))
+
+  arrays = {'rank': rank}
+  for prefix, other, rows in (('fwd', 'targets', fwd), ('bwd', 'sources', bwd)):
+    offsets, others, weights, middles = _csr(rows, n)
+    arrays[prefix + '_offsets'] = offsets
+    arrays[prefix + '_' + other] = others
+    arrays[prefix + '_weights'] = weights
+    arrays[prefix + '_middle'] = middles
+  return arrays
+
+
+def _fingerprint(sg):
+  # Node count, edge count and total weight - enough to refuse a hierarchy built for another map
+  weights = [w for _, _, w in sg._arcs()]
+  return np.array([len(sg._node_list), len(weights), math.fsum(weights)], dtype = np.float64)
+
+
+class ContractionHierarchy(_Views):
+  """Contraction hierarchy over the nodes of SG. Build it with StreetGraph.contract(), or load a saved one
+  with load_hierarchy(). shortest_path() returns the same distance as StreetGraph.shortest_path and a
+  path of that length - when several are equally short it may be a different one"""
+  def __init__(self, sg, arrays = None):
+    self._sg = sg
+    self.arrays = arrays if arrays is not None else _contract(sg)
+    self._views()
+
+  def _views(self):
+    # Queries read the arrays through memoryviews, like CompactGraph: indexing one returns a plain int or
+    # float, and nothing is copied, so a hierarchy opened from a map file stays a view of the mapping
+    a = self.arrays
+    self._fwd = tuple(memoryview(a[name]) for name in ('fwd_offsets', 'fwd_targets', 'fwd_weights', 'fwd_middle'))
+    self._bwd = tuple(memoryview(a[name]) for name in ('bwd_offsets', 'bwd_sources', 'bwd_weights', 'bwd_middle'))
+
+  @property
+  def shortcuts(self):
+    return int((self.arrays['fwd_middle'] >= 0).sum() + (self.arrays['bwd_middle'] >= 0).sum())
+
+  def nbytes(self):
+    return sum(array.nbytes for array in self.arrays.values())
+
+  def save(self, path):
+    with open(path, 'wb') as f:
+      np.savez(f, version = np.array([VERSION]), fingerprint = _fingerprint(self._sg), **self.arrays)
+
+  def _search(self, s, t):
+    # Upward searches from S and T. Returns (distance, meeting node, forward parents, backward parents)
+    # where parents map a node to (previous node, middle of the edge between them)
+    dist = ({s: 0}, {t: 0})
+    parents = ({s: None}, {t: None})
+    heaps = ([(0, s)], [(0, t)])
+    graphs = (self._fwd, self._bwd)
+    best = math.inf
+    meet = None
+    while heaps[0] or heaps[1]:
+      # Advance whichever side has the closer node. Once that is no closer than the best
+      # meeting found, nothing left in either queue can improve on it
+      side = 0 if heaps[0] and (not heaps[1] or heaps[0][0] <= heaps[1][0]) else 1
+      d, u = heapq.heappop(heaps[side])
+      if d >= best:
+        break
+      mine = dist[side]
+      if d > mine[u]:
+        continue
+      theirs = dist[1 - side]
+      if u in theirs and d + theirs[u] < best:
+        best = d + theirs[u]
+        meet = u
+      # Stall on demand: if a higher node this search already reached has a shorter way down to U
+      # than the one U was found by, no shortest path goes up through U and its edges can be skipped
+      offsets, others, weights, _ = graphs[1 - side]
+      stalled = False
+      for i in range(offsets[u], offsets[u + 1]):
+        if mine.get(others[i], math.inf) + weights[i] < d:
+          stalled = True
+          break
+      if stalled:
+        continue
+      offsets, others, weights, middles = graphs[side]
+      parent = parents[side]
+      heap = heaps[side]
+      for i in range(offsets[u], offsets[u + 1]):
+        v = others[i]
+        newdist = d + weights[i]
+        if newdist < mine.get(v, math.inf):
+          mine[v] = newdist
+          parent[v] = (u, middles[i])
+          heapq.heappush(heap, (newdist, v))
+    return best, meet, parents[0], parents[1]
+
+  def _middle(self, graph, v, other):
+    # Middle of the edge stored at V whose other end is OTHER
+    offsets, others, _, middles = graph
+    for i in range(offsets[v], offsets[v + 1]):
+      if others[i] == other:
+        return middles[i]
+    raise KeyError((v, other))
+
+  def _unpack(self, u, v, middle, path):
+    # Append the nodes after U on edge U -> V to PATH, expanding shortcuts
+    stack = [(u, v, middle)]
+    while stack:
+      u, v, middle = stack.pop()
+      if middle < 0:
+        path.append(v)
+        continue
+      # The skipped node ranks below both ends, so u -> middle is stored at middle with the edges
+      # coming down to it and middle -> v with the edges going up from it
+      stack.append((middle, v, self._middle(self._fwd, middle, v)))
+      stack.append((u, middle, self._middle(self._bwd, middle, u)))
+
+  def node_path(self, s, t):
+    # Shortest path between node ids S and T as a list of ids, or None if T can't be reached
+    best, meet, forward, backward = self._search(s, t)
+    if meet is None:
+      return None
+    edges = []
+    x = meet
+    while forward[x] is not None:
+      u, middle = forward[x]
+      edges.append((u, x, middle))
+      x = u
+    edges.reverse()
+    x = meet
+    while backward[x] is not None:
+      y, middle = backward[x]
+      edges.append((x, y, middle))
+      x = y
+    path = [s]
+    for u, v, middle in edges:
+      self._unpack(u, v, middle, path)
+    return path
+
+  def shortest_path(self, label1, label2):
+    # Same contract as StreetGraph.shortest_path
+    sg = self._sg
+    t = sg._node_from_label(label2)
+    ids = self.node_path(sg._node_from_label(label1)._id, t._id)
+    if ids is None:
+      return [t._label], math.inf
+    # Summed edge by edge from the start, the way Dijkstra accumulates it
+    dist = 0
+    for a, b in zip(ids, ids[1:]):
+      dist = dist + sg._weight(a, b)
+    return [sg._node_list[i]._label for i in ids], dist
+
+
+def load_hierarchy(path, sg):
+  # Read a hierarchy written by ContractionHierarchy.save for the street graph SG
+  with np.load(path) as f:
+    if f['version'][0] != VERSION:
+      raise ValueError("{} is not a version {} contraction hierarchy".format(path, VERSION))
+    if not np.array_equal(f['fingerprint'], _fingerprint(sg)):
+      raise ValueError("{} was built for a different street graph".format(path))
+    arrays = {name: f[name] for name in _ARRAYS}
+  return ContractionHierarchy(sg, arrays)
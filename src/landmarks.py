@@ -0,0 +1,76 @@
+import numpy as np
+
+from .compact import compact
+
+# ALT: A* with landmarks and the triangle inequality, for routing on maps with arbitrary non-negative
+# weights where the node coordinates say nothing useful about the distances.
+#
+# Preprocessing picks a few landmark nodes spread over the map and runs a full Dijkstra from and to
+# each of them. For any landmark L and nodes v, t the triangle inequality gives
+#   d(v, t) >= d(L, t) - d(L, v)    and    d(v, t) >= d(v, L) - d(t, L)
+# and the largest of these over all landmarks is a lower bound on the distance left from v to t,
+# which A* uses in place of a geometric metric. The bound is consistent, so A* still finds shortest
+# paths, and it is tightest for targets lying "behind" a landmark - which is why landmarks are picked
+# far apart, each one the node furthest from those picked before it.
+
+
+class Landmarks(object):
+  """Distances from and to COUNT landmarks on SG, in (count, nodes) float64 arrays indexed by node id:
+  FROM_[i, v] is the distance from landmark i to node v and TO[i, v] the distance from v to it,
+  inf where there is no path. Build it with StreetGraph.select_landmarks(), or pass ARRAYS, the
+  (nodes, from_, to) of a saved one"""
+  def __init__(self, sg, count = 8, arrays = None):
+    if arrays is not None:
+      self.nodes, self.from_, self.to = arrays
+      return
+    graph = sg._compact if sg._compact is not None else compact(sg)
+    reverse = graph.transpose()
+    n = len(sg._node_list)
+
+    def distances(g, source):
+      dist, _, _ = g.search(source, None)
+      row = np.full(n, np.inf)
+      row[list(dist)] = list(dist.values())
+      return row
+
+    nodes = []
+    from_ = []
+    to = []
+    # Distance from the nearest landmark picked so far. The first landmark is the node furthest from
+    # node 0, and nodes no landmark reaches yet (another component) come before everything else
+    nearest = distances(graph, 0) if n else None
+    for _ in range(min(count, n)):
+      v = int(np.argmax(nearest))
+      nodes.append(v)
+      from_.append(distances(graph, v))
+      to.append(distances(reverse, v))
+      nearest = from_[-1] if len(nodes) == 1 else np.minimum(nearest, from_[-1])
+    self.nodes = np.array(nodes, dtype = np.int64)
+    self.from_ = np.array(from_, dtype = np.float64).reshape(len(nodes), n)
+    self.to = np.array(to, dtype = np.float64).reshape(len(nodes), n)
+
+  def nbytes(self):
+    return self.nodes.nbytes + self.from_.nbytes + self.to.nbytes
+
+  def bounds(self, t):
+    # Lower bound on the distance from a node to node id T, as a function of the node id. Each node's
+    # bound is worked out the first time a search asks for it, so a query only pays for the nodes it
+    # reaches rather than COUNT * nodes up front. inf means the node can't reach T at all. Terms with
+    # inf on both sides (nan) tell nothing, and fail the comparisons below
+    terms = [(float(f[t]), memoryview(f), memoryview(to), float(to[t])) for f, to in zip(self.from_, self.to)]
+    known = {}
+
+    def bound(v):
+      b = known.get(v)
+      if b is None:
+        b = 0
+        for from_t, from_, to, to_t in terms:
+          ahead = from_t - from_[v]
+          behind = to[v] - to_t
+          if ahead > b:
+            b = ahead
+          if behind > b:
+            b = behind
+        known[v] = b
+      return b
+    return bound
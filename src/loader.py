@@ -0,0 +1,174 @@
+import csv
+import json
+import os
+
+import numpy as np
+
+from .compact import CompactGraph
+from .components import StreetGraph, Car, EuclideanNode, euclidean, manhattan
+from .edges import EdgeColumns, NO_LIMIT, top_speed
+
+# Bulk loading of street maps from node and edge tables.
+#
+# Node tables have a label, x and y per node; edge tables a source and target label per edge, and
+# optionally a weight, a speed limit and a capacity (see edges.py). Tables can be CSV files with a
+# header row naming those columns, JSON files holding a list of objects with those keys, or .npz files
+# with one array per column.
+#
+# Everything after reading the files is done on whole arrays: labels become node ids through one
+# dict, weights of geometric node classes (EuclideanNode, ManhattanNode) are computed for all edges
+# at once, exactly as add_neighbor would compute them one by one, and a frozen graph gets its CSR
+# arrays straight from a sort - no add_node/add_edge call per element.
+
+NODE_COLUMNS = ('label', 'x', 'y')
+EDGE_COLUMNS = ('source', 'target', 'weight', 'speed_limit', 'capacity')
+
+# NumPy versions of the node class metrics, with the same rounding
+_VECTOR_METRICS = {
+  euclidean: lambda x0, y0, x1, y1: np.sqrt((x0 - x1)**2 + (y0 - y1)**2),
+  manhattan: lambda x0, y0, x1, y1: np.abs(x0 - x1) + np.abs(y0 - y1),
+}
+
+
+def _hashable(label):
+  # JSON has no tuples, labels like (x, y) come back as lists
+  return tuple(_hashable(l) for l in label) if isinstance(label, list) else label
+
+
+def read_table(path, columns):
+  # {column: list of values} for the COLUMNS present in the CSV, JSON or npz table at PATH
+  ext = os.path.splitext(path)[1].lower()
+  if ext == '.csv':
+    with open(path, newline = '') as f:
+      reader = csv.reader(f)
+      header = next(reader, [])
+      rows = list(reader)
+    table = {}
+    for c in columns:
+      if c in header:
+        i = header.index(c)
+        table[c] = [row[i] for row in rows]
+    return table
+  if ext == '.json':
+    with open(path) as f:
+      rows = json.load(f)
+    present = [c for c in columns if rows and c in rows[0]]
+    return {c: [_hashable(row[c]) for row in rows] for c in present}
+  if ext == '.npz':
+    with np.load(path) as f:
+      return {c: f[c].tolist() for c in columns if c in f.files}
+  raise ValueError("Unknown table format: {}".format(path))
+
+
+def _weights(nodeCls, x, y, sources, targets, weights):
+  metric = nodeCls.metric
+  if metric is None:
+    # Plain nodes take the weight column, 1 by default like add_edge
+    return np.ones(len(sources)) if weights is None else np.asarray(weights, dtype = np.float64)
+  vector = _VECTOR_METRICS.get(metric)
+  if vector is not None:
+    return vector(x[sources], y[sources], x[targets], y[targets])
+  return np.fromiter(map(metric, x[sources].tolist(), y[sources].tolist(), x[targets].tolist(),
+                         y[targets].tolist()), dtype = np.float64, count = len(sources))
+
+
+def build_graph(labels, x, y, sources, targets, weights = None, nodeCls = EuclideanNode, carCls = Car,
+                directed = False, freeze = False, speed_limits = None, capacities = None):
+  # StreetGraph with a node per entry of LABELS, X and Y and an edge from each of SOURCES to the matching
+  # TARGETS label, with the matching SPEED_LIMITS and CAPACITIES if given (NO_LIMIT for none). Edges go
+  # both ways like add_edge unless DIRECTED. Returns the graph frozen with FREEZE
+  x = np.asarray(x, dtype = np.float64)
+  y = np.asarray(y, dtype = np.float64)
+  sg, index = _add_nodes(labels, x, y, nodeCls, carCls, freeze)
+  try:
+    u = np.array([index[label] for label in sources], dtype = np.int64)
+    v = np.array([index[label] for label in targets], dtype = np.int64)
+  except KeyError as e:
+    raise Exception("No node could be found corresponding to label: {}".format(e.args[0]))
+  _add_edges(sg, x, y, u, v, weights, directed, freeze, speed_limits, capacities)
+  return sg
+
+
+def _add_nodes(labels, x, y, nodeCls, carCls, freeze):
+  # StreetGraph holding a node per entry of LABELS, X and Y and no edges, and its label -> node id dict
+  sg = StreetGraph(nodeCls = nodeCls, carCls = carCls)
+  # Nodes are put together directly, like snapshot.py does, rather than through add_node
+  nodes = sg._node_list
+  for i, (node_x, node_y, label) in enumerate(zip(x.tolist(), y.tolist(), labels)):
+    node = nodeCls.__new__(nodeCls)
+    node._x = node_x
+    node._y = node_y
+    node._label = label
+    node._id = i
+    node._neighbors = None if freeze else {}
+    nodes.append(node)
+  index = {node._label: node._id for node in nodes}
+  if len(index) != len(nodes):
+    seen = set()
+    label = next(node._label for node in nodes if node._label in seen or seen.add(node._label))
+    raise AssertionError("Duplicate node label: {}".format(label))
+  sg._labels = {label: nodes[i] for label, i in index.items()}
+  sg._nodes = set(nodes)
+  return sg, index
+
+
+def _add_edges(sg, x, y, u, v, weights, directed, freeze, speed_limits = None, capacities = None):
+  # Edges from node ids U to node ids V on SG, whose nodes are in place with no edges yet
+  w = _weights(sg._nodeCls, x, y, u, v, weights)
+  limited = speed_limits is not None or capacities is not None
+  if limited:
+    limit = np.full(len(u), NO_LIMIT) if speed_limits is None else np.asarray(speed_limits, dtype = np.float64)
+    capacity = np.full(len(u), NO_LIMIT) if capacities is None else np.asarray(capacities, dtype = np.float64)
+    if not (limit > 0).all():
+      raise ValueError("Speed limits must be positive, not {}".format(limit[~(limit > 0)][0]))
+    if not (capacity >= 0).all():
+      raise ValueError("Capacities must be non-negative, not {}".format(capacity[~(capacity >= 0)][0]))
+  if not directed:
+    u, v = np.concatenate((u, v)), np.concatenate((v, u))
+    w = np.concatenate((w, w))
+    if limited:
+      limit = np.concatenate((limit, limit))
+      capacity = np.concatenate((capacity, capacity))
+  if limited:
+    # Streets with a limit get their travel time as weight, see edges.travel_time
+    _fill_edges(sg, x, y, u, v, np.where(limit < NO_LIMIT, w * (top_speed(limit) / limit), w), freeze)
+    # and those with a limit or capacity a row in the edge columns, or every street one when frozen
+    rows = (limit < NO_LIMIT) | (capacity < NO_LIMIT)
+    sg._edges = EdgeColumns(sg._compact, rows = (u[rows], v[rows], w[rows], limit[rows], capacity[rows]))
+  else:
+    _fill_edges(sg, x, y, u, v, w, freeze)
+
+
+def _fill_edges(sg, x, y, u, v, w, freeze):
+  # Edges (arcs) from node ids U to node ids V with weights W on SG, whose nodes are in place with no edges yet
+  nodes = sg._node_list
+  # Sorted by source then target: a CSR layout, and duplicates end up next to each other
+  order = np.lexsort((v, u))
+  u, v, w = u[order], v[order], w[order]
+  duplicate = (u[1:] == u[:-1]) & (v[1:] == v[:-1])
+  if duplicate.any():
+    i = int(np.argmax(duplicate))
+    raise ValueError("Duplicate edge {} -> {}".format(sg.node_label(int(u[i])), sg.node_label(int(v[i]))))
+
+  n = len(sg._node_list)
+  offsets = np.zeros(n + 1, dtype = np.int64)
+  np.cumsum(np.bincount(u, minlength = n), out = offsets[1:])
+  if freeze:
+    sg._compact = CompactGraph(offsets, v, w, x, y)
+  else:
+    targets = v.tolist()
+    weights = w.tolist()
+    bounds = offsets.tolist()
+    for i, node in enumerate(nodes):
+      neighbors = node._neighbors
+      for j in range(bounds[i], bounds[i + 1]):
+        neighbors[nodes[targets[j]]] = weights[j]
+
+
+def load_map(nodes_path, edges_path, nodeCls = EuclideanNode, carCls = Car, directed = False, freeze = False):
+  # StreetGraph from a node table and an edge table, see build_graph
+  nodes = read_table(nodes_path, NODE_COLUMNS)
+  edges = read_table(edges_path, EDGE_COLUMNS)
+  return build_graph(nodes['label'], nodes['x'], nodes['y'], edges['source'], edges['target'],
+                     edges.get('weight'), nodeCls, carCls, directed, freeze, edges.get('speed_limit'),
+                     edges.get('capacity'))
@@ -0,0 +1,92 @@
+import mmap
+import pickle
+
+import numpy as np
+
+from .compact import CompactGraph, compact
+from .edges import EdgeColumns
+from .hierarchy import ContractionHierarchy, _ARRAYS
+from .landmarks import Landmarks
+from .loader import _add_nodes
+from .sections import read_header, read_sections, write_sections
+
+# Street maps in a binary file that is memory-mapped back in, for starting many workers on one map.
+#
+# Layout as in snapshot.py (see sections.py): 64-byte aligned sections holding flat NumPy arrays -
+# coordinates, the CSR edge arrays (see compact.py), the label table and, when the graph has them, the
+# length, speed limit and capacity columns (edges.py) with a row per CSR slot, the contraction
+# hierarchy and the ALT landmark distances. A few scalars are pickled.
+#
+# open_map maps the file copy-on-write and hands out arrays that are views of the mapping, so the
+# edges, coordinates and routing tables are never read or copied up front: every process opening
+# the file shares the one copy in the page cache, and only pages a process writes to (update_edges)
+# become its own. Node objects and the label dict are still built per process.
+#
+# Labels are stored as an int64 array when they are all ints, as one UTF-8 blob with offsets when
+# they are all strings, and pickled otherwise (tuples and the like).
+
+MAGIC = b'EE122MAP'
+VERSION = 1
+
+
+def _label_arrays(labels):
+  if all(type(label) is int and -2**63 <= label < 2**63 for label in labels):
+    return 'int', {'labels': np.array(labels, dtype = np.int64)}
+  if all(type(label) is str for label in labels):
+    text = ''.join(labels)
+    offsets = np.zeros(len(labels) + 1, dtype = np.int64)
+    np.cumsum([len(label) for label in labels], out = offsets[1:])
+    return 'str', {'labels': np.frombuffer(text.encode('utf-8'), dtype = np.uint8), 'label_offsets': offsets}
+  blob = pickle.dumps(labels, protocol = pickle.HIGHEST_PROTOCOL)
+  return 'pickle', {'labels': np.frombuffer(blob, dtype = np.uint8)}
+
+
+def _labels(kind, a):
+  if kind == 'int':
+    return a['labels'].tolist()
+  if kind == 'str':
+    # Offsets count characters, so the text is decoded once and sliced
+    text = a['labels'].tobytes().decode('utf-8')
+    offsets = a['label_offsets'].tolist()
+    return [text[i:j] for i, j in zip(offsets, offsets[1:])]
+  return pickle.loads(a['labels'].tobytes())
+
+
+def save_map(path, sg, routing = True):
+  # Write SG to PATH: nodes, edges and, with ROUTING, its contraction hierarchy and landmarks if it has them
+  nodes = sg._node_list
+  c = sg._compact if sg._compact is not None else compact(sg)
+  kind, arrays = _label_arrays([node._label for node in nodes])
+  arrays.update({'x': c.x, 'y': c.y, 'offsets': c.offsets, 'targets': c.targets, 'weights': c.weights})
+  if sg._edges is not None:
+    # A row per CSR slot, like the weights
+    arrays.update(zip(('edge_length', 'edge_speed_limit', 'edge_capacity'), sg._edges.slots(c)))
+  if routing and sg._hierarchy is not None:
+    arrays.update(('ch_' + name, array) for name, array in sg._hierarchy.arrays.items())
+  if routing and sg._landmarks is not None:
+    lm = sg._landmarks
+    arrays.update({'alt_nodes': lm.nodes, 'alt_from': lm.from_, 'alt_to': lm.to})
+  meta = {'node_cls': sg._nodeCls, 'car_cls': sg._carCls, 'labels': kind}
+  arrays['meta'] = np.frombuffer(pickle.dumps(meta, protocol = pickle.HIGHEST_PROTOCOL), dtype = np.uint8)
+  write_sections(path, MAGIC, VERSION, arrays)
+
+
+def open_map(path):
+  # A frozen StreetGraph over the map saved at PATH, with its routing data, backed by a private mapping
+  # of the file. Thaw it to add nodes or edges; update_edges works on it as it is
+  with open(path, 'rb') as f:
+    mm = mmap.mmap(f.fileno(), 0, access = mmap.ACCESS_COPY)
+  if read_header(mm) != (MAGIC, VERSION):
+    raise ValueError("{} is not a version {} map file".format(path, VERSION))
+  a = read_sections(mm)
+  meta = pickle.loads(a['meta'].tobytes())
+
+  sg, _ = _add_nodes(_labels(meta['labels'], a), a['x'], a['y'], meta['node_cls'], meta['car_cls'], True)
+  sg._compact = CompactGraph(a['offsets'], a['targets'], a['weights'], a['x'], a['y'])
+  if 'edge_length' in a:
+    sg._edges = EdgeColumns(sg._compact, slots = (a['edge_length'], a['edge_speed_limit'], a['edge_capacity']))
+  if 'ch_rank' in a:
+    sg.contract(ContractionHierarchy(sg, {name: a['ch_' + name] for name in _ARRAYS}))
+  if 'alt_nodes' in a:
+    sg.select_landmarks(landmarks = Landmarks(sg, arrays = (a['alt_nodes'], a['alt_from'], a['alt_to'])))
+  return sg
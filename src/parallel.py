@@ -0,0 +1,203 @@
+import multiprocessing
+import random
+import traceback
+
+from .discrete import Environment
+
+# Conservative parallel simulation of cars driving on a StreetGraph.
+#
+# The graph is split into spatial regions and each region is simulated by its own Environment
+# in a worker process. A car belongs to the region of the last node it passed and is handed
+# off when it passes a node of another region. Cars drive once every DRIVE_PERIOD, so a car
+# handed off at time t needs nothing from its new region before t + DRIVE_PERIOD. That is the
+# lookahead: every region runs all of its events in [T, T + DRIVE_PERIOD) without hearing from
+# the others, then the coordinator delivers the hand-offs and opens the next window at the
+# earliest time anything is pending anywhere (barrier windows).
+#
+# Cars don't interact, so every car goes through exactly the same sequence of drive() calls
+# as in run_sequential and both return identical results.
+
+DRIVE_PERIOD = 1
+
+
+def random_trips(sg, count, seed, speeds = (0.5, 2.0)):
+  # Reproducible (origin, destination, label, speed) specs for COUNT cars
+  rng = random.Random(seed)
+  labels = sorted(n._label for n in sg._nodes)
+  trips = []
+  for i in range(count):
+    origin, destination = rng.sample(labels, 2)
+    trips.append((origin, destination, "car{}".format(i), rng.uniform(*speeds)))
+  return trips
+
+
+def strip_regions(sg, k):
+  # Assign every node label to one of K vertical strips holding about the same number of nodes
+  nodes = sorted(sg._nodes, key = lambda n: (n._x, n._y))
+  return {n._label: i * k // len(nodes) for i, n in enumerate(nodes)}
+
+
+def _drive(env, car, start, region, region_of, handoffs, finished):
+  # Process for one car: drive every DRIVE_PERIOD from START until arriving.
+  # With a REGION_OF map, stop and queue a hand-off as soon as the car passes into another region
+  yield start - env.time_elapsed
+  while car._next_node is not None:
+    car.drive()
+    if car._next_node is None:
+      break
+    if region_of is not None:
+      owner = region_of[car._last_node]
+      if owner != region:
+        handoffs.append((owner, car, env.time_elapsed + DRIVE_PERIOD))
+        return
+    yield DRIVE_PERIOD
+  finished.append((car._label, env.time_elapsed, car.position()))
+
+
+def _run_before(env, end):
+  # Run every event due strictly before END (everything if END is None)
+  while True:
+    time = env.next_event_time()
+    if time is None or (end is not None and time >= end):
+      return
+    env.do_next_batch()
+
+
+def run_sequential(sg, trips, until = None):
+  # Reference run on a single Environment. Returns {label: (arrival time or None, (x, y))}
+  # where positions of cars still driving are taken once every event before UNTIL has run
+  env = Environment()
+  cars = []
+  finished = []
+  for origin, destination, label, speed in trips:
+    car = sg._carCls(origin, destination, label, sg, speed)
+    cars.append(car)
+    env.process(_drive(env, car, DRIVE_PERIOD, None, None, None, finished))
+  _run_before(env, until)
+
+  results = {car._label: (None, car.position()) for car in cars}
+  for label, time, position in finished:
+    results[label] = (time, position)
+  return results
+
+
+def _region_worker(conn, sg, region, region_of, trips):
+  try:
+    env = Environment()
+    active = {}
+    handoffs = []
+    finished = []
+    for origin, destination, label, speed in trips:
+      car = sg._carCls(origin, destination, label, sg, speed)
+      active[label] = car
+      env.process(_drive(env, car, DRIVE_PERIOD, region, region_of, handoffs, finished))
+    conn.send(('ok', [], [], env.next_event_time()))
+
+    while True:
+      message = conn.recv()
+      if message[0] == 'finish':
+        conn.send(('ok', [(label, None, car.position()) for label, car in active.items()]))
+        return
+      _, end, incoming = message
+      for car, start in incoming:
+        car._sg = sg
+        active[car._label] = car
+        env.process(_drive(env, car, start, region, region_of, handoffs, finished))
+      _run_before(env, end)
+      for _, car, _ in handoffs:
+        del active[car._label]
+      for label, _, _ in finished:
+        del active[label]
+      conn.send(('ok', handoffs, finished, env.next_event_time()))
+      # The car processes hold on to these lists, so empty them rather than rebinding
+      del handoffs[:]
+      del finished[:]
+  except Exception:
+    conn.send(('error', traceback.format_exc()))
+
+
+def _worker_context():
+  if 'fork' in multiprocessing.get_all_start_methods():
+    # Workers inherit the street graph instead of unpickling their own copy
+    return multiprocessing.get_context('fork')
+  return multiprocessing.get_context()
+
+
+def _start_workers(target, sg, trips, region_of):
+  # A worker process running TARGET(conn, sg, region, region_of, trips starting in region) for every
+  # region of REGION_OF, and the coordinator's ends of their pipes
+  ctx = _worker_context()
+  conns = []
+  workers = []
+  for region in range(max(region_of.values()) + 1):
+    parent, child = ctx.Pipe()
+    local = [trip for trip in trips if region_of[trip[0]] == region]
+    worker = ctx.Process(target = target, args = (child, sg, region, region_of, local), daemon = True)
+    worker.start()
+    conns.append(parent)
+    workers.append(worker)
+  return conns, workers
+
+
+def _stop_workers(workers):
+  # Wait for WORKERS to exit after 'finish', killing any that hang or never got the message
+  for worker in workers:
+    worker.join(timeout = 5)
+    if worker.is_alive():
+      worker.terminate()
+
+
+def _recv(conn):
+  reply = conn.recv()
+  if reply[0] == 'error':
+    raise RuntimeError("Region worker failed:\n" + reply[1])
+  return reply[1:]
+
+
+def run_parallel(sg, trips, region_of, until = None):
+  # Same as run_sequential, but with every region of REGION_OF (node label -> region number)
+  # simulated by its own worker process. partition.partition(sg, k).region_of() gives regions with fewer
+  # streets between them, so fewer hand-offs, than strip_regions
+  conns, workers = _start_workers(_region_worker, sg, trips, region_of)
+  k = len(conns)
+
+  results = {}
+  try:
+    next_times = [_recv(conn)[2] for conn in conns]
+    inboxes = [[] for _ in range(k)]
+    while True:
+      pending = [t for t in next_times if t is not None] + [start for box in inboxes for _, start in box]
+      if not pending:
+        break
+      start = min(pending)
+      if until is not None and start >= until:
+        break
+      end = start + DRIVE_PERIOD
+      if until is not None:
+        end = min(end, until)
+
+      # Only regions with something due in this window take part in it
+      busy = [r for r in range(k) if inboxes[r] or (next_times[r] is not None and next_times[r] < end)]
+      for r in busy:
+        conns[r].send(('window', end, inboxes[r]))
+        inboxes[r] = []
+      for r in busy:
+        handoffs, finished, next_times[r] = _recv(conns[r])
+        for owner, car, due in handoffs:
+          inboxes[owner].append((car, due))
+        for label, time, position in finished:
+          results[label] = (time, position)
+
+    # Cars still waiting in an inbox are in flight between regions
+    for box in inboxes:
+      for car, _ in box:
+        car._sg = sg
+        results[car._label] = (None, car.position())
+    for conn in conns:
+      conn.send(('finish',))
+    for conn in conns:
+      for label, time, position in _recv(conn)[0]:
+        results[label] = (time, position)
+  finally:
+    _stop_workers(workers)
+  return results
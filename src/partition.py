@@ -0,0 +1,270 @@
+import numpy as np
+
+from .compact import compact
+from .edges import EdgeColumns
+from .loader import _add_nodes, _fill_edges
+
+# Splitting a StreetGraph into K spatial regions of about equal load with few edges between them,
+# for parallel runs (parallel.py, timewarp.py) and for laying each region out contiguously in memory.
+#
+# Every node has a weight, the load it brings to its region - 1 each by default, or the expected car
+# density from density(). Recursive coordinate bisection gives the starting regions: the nodes are cut
+# at the weighted median of their longer axis, each half gets half of the regions, and so on. That
+# balances the weights to within one node but knows nothing of the streets, so the cut is refined on
+# the graph, multilevel: nodes are matched with a neighbour in their region over the heaviest edge and
+# merged, again and again, into ever coarser graphs. Starting from the coarsest, boundary nodes move to
+# the neighbouring region they have the most edges to whenever that cuts fewer edges (or as many, with
+# better balance) and keeps every region under (1 + IMBALANCE) times the average load; then the regions
+# are projected onto the next finer graph and refined again. Moving a merged node moves a whole patch
+# of streets at once, which gets the cut out of the local minima single node moves are stuck in.
+#
+# Edges are counted the way StreetGraph stores them: a two way street is two edges.
+
+# Coarsening stops at about this many nodes per region
+COARSEST = 16
+
+
+class Partition(object):
+  """Region of every node of a StreetGraph"""
+  def __init__(self, sg, parts, k, weights):
+    self._sg = sg
+    # Region of every node by id
+    self.parts = parts
+    self.k = k
+    # Total node weight of every region
+    self.weights = weights
+
+  def region_of(self):
+    # {label: region}, as run_parallel and run_timewarp take it
+    return dict(zip((node._label for node in self._sg._node_list), self.parts.tolist()))
+
+  def _arcs(self):
+    c = self._sg._compact if self._sg._compact is not None else compact(self._sg)
+    u = np.repeat(np.arange(len(self.parts)), np.diff(c.offsets))
+    return u, c.targets, c.weights
+
+  def cut(self):
+    # Number of edges between regions
+    u, v, _ = self._arcs()
+    return int(np.count_nonzero(self.parts[u] != self.parts[v]))
+
+  def boundary(self):
+    # For every region, the (label, label) edges leaving it
+    u, v, _ = self._arcs()
+    crossing = self.parts[u] != self.parts[v]
+    u, v = u[crossing], v[crossing]
+    label = self._sg.node_label
+    edges = [[] for _ in range(self.k)]
+    for a, b, region in zip(u.tolist(), v.tolist(), self.parts[u].tolist()):
+      edges[region].append((label(a), label(b)))
+    return edges
+
+  def renumber(self):
+    # A copy of the graph with node ids in region order, so every region's nodes, coordinates and (when
+    # frozen) CSR rows sit together in memory. Within a region nodes follow a Z-order curve, which keeps
+    # nearby nodes - the ones a search touches one after the other - close in memory too. Returns the copy,
+    # frozen if the graph is, and its Partition. Cars, the contraction hierarchy and landmarks are not carried over
+    sg = self._sg
+    c = sg._compact if sg._compact is not None else compact(sg)
+    order = np.lexsort((_morton(c.x, c.y), self.parts))
+    rank = np.empty_like(order)
+    rank[order] = np.arange(len(order))
+    x = c.x[order]
+    y = c.y[order]
+    frozen = sg._compact is not None
+    copy, _ = _add_nodes([sg._node_list[i]._label for i in order.tolist()], x, y, sg._nodeCls, sg._carCls, frozen)
+    u = np.repeat(np.arange(len(order)), np.diff(c.offsets))
+    _fill_edges(copy, x, y, rank[u], rank[c.targets], c.weights, frozen)
+    if sg._edges is not None:
+      source, target, length, speed_limit, capacity = sg._edges.rows()
+      copy._edges = EdgeColumns(copy._compact, rows = (rank[source], rank[target], length, speed_limit, capacity))
+    return copy, Partition(copy, self.parts[order], self.k, self.weights)
+
+
+def _morton(x, y):
+  # Z-order curve position of every point, from coordinates scaled to 16 bits over their bounding box
+  key = np.zeros(len(x), dtype = np.uint64)
+  for shift, coord in enumerate((x, y)):
+    span = np.ptp(coord) if len(coord) else 0
+    bits = ((coord - coord.min()) * (65535 / span) if span > 0 else np.zeros(len(coord))).astype(np.uint64)
+    # Spread the 16 bits out to every other bit
+    for step, mask in ((8, 0x00ff00ff), (4, 0x0f0f0f0f), (2, 0x33333333), (1, 0x55555555)):
+      bits = (bits | (bits << np.uint64(step))) & np.uint64(mask)
+    key |= bits << np.uint64(shift)
+  return key
+
+
+def density(sg, trips = None):
+  # Expected car load of every node by id: 1 for the node plus 1 for every route through it, of TRIPS
+  # ((origin, destination, ...) specs like parallel.random_trips makes) or else of the cars on SG
+  if trips is None:
+    routes = ([car._last_node] + ([car._next_node] + car._route if car._next_node is not None else [])
+              for car in sg._cars)
+  else:
+    routes = (sg.shortest_path(trip[0], trip[1])[0] for trip in trips)
+  ids = [sg.node_id(label) for route in routes for label in route]
+  return 1 + np.bincount(np.array(ids, dtype = np.int64), minlength = len(sg._node_list))
+
+
+def partition(sg, k, weights = None, imbalance = 0.03, refine = True, seed = 0):
+  # Split SG into K regions with WEIGHTS (by node id, 1 each by default) balanced to within IMBALANCE
+  # and few edges between them. Without REFINE the regions are those of the coordinate bisection
+  n = len(sg._node_list)
+  if not 1 <= k <= n:
+    raise ValueError("Can't split {} nodes into {} regions".format(n, k))
+  vw = np.ones(n) if weights is None else np.asarray(weights, dtype = np.float64)
+  if vw.shape != (n,):
+    raise ValueError("Need one weight per node, got {}".format(vw.shape))
+  c = sg._compact if sg._compact is not None else compact(sg)
+  parts = np.empty(n, dtype = np.int64)
+  _bisect(np.arange(n), k, c.x, c.y, vw, parts, 0)
+
+  if refine and k > 1:
+    rng = np.random.default_rng(seed)
+    limit = (1 + imbalance) * vw.sum() / k
+    graph = _undirected(n, c.offsets, c.targets)
+    # Coarsen, remembering every level and how its nodes were merged
+    levels = []
+    part = parts
+    coarse_vw = vw
+    while len(coarse_vw) > COARSEST * k:
+      merged, m = _match(graph, coarse_vw, part, limit / COARSEST, rng)
+      if m > 0.9 * len(coarse_vw):
+        break
+      levels.append((graph, coarse_vw, merged))
+      graph = _contract(graph, merged, m)
+      coarse_vw = np.bincount(merged, weights = coarse_vw, minlength = m)
+      coarse = np.empty(m, dtype = np.int64)
+      coarse[merged] = part
+      part = coarse
+    part = _refine(graph, coarse_vw, part, k, limit)
+    for graph, coarse_vw, merged in reversed(levels):
+      part = _refine(graph, coarse_vw, part[merged], k, limit)
+    parts = part
+
+  return Partition(sg, parts, k, np.bincount(parts, weights = vw, minlength = k))
+
+
+def _bisect(ids, k, x, y, vw, parts, first):
+  # Regions FIRST .. FIRST + K - 1 for the nodes IDS, by recursive coordinate bisection
+  if k == 1:
+    parts[ids] = first
+    return
+  half = k // 2
+  xs = x[ids]
+  ys = y[ids]
+  coord = xs if np.ptp(xs) >= np.ptp(ys) else ys
+  order = ids[np.argsort(coord, kind = 'stable')]
+  total = np.cumsum(vw[order])
+  target = total[-1] * half / k
+  # The first m nodes go to the first half, with the weight of the first m - 1 or m nodes closest to the target
+  m = int(np.searchsorted(total, target))
+  if m < len(total) and total[m] - target < target - (total[m - 1] if m else 0):
+    m += 1
+  # Enough nodes on each side for one per region
+  m = min(max(m, half), len(order) - (k - half))
+  _bisect(order[:m], half, x, y, vw, parts, first)
+  _bisect(order[m:], k - half, x, y, vw, parts, first + half)
+
+
+def _undirected(n, offsets, targets):
+  # CSR (offsets, targets, weights) of the graph with an edge both ways between every two nodes with an
+  # edge either way, weighing as many edges as there are between them
+  u = np.repeat(np.arange(n), np.diff(offsets))
+  v = targets
+  loop = u == v
+  u, v = u[~loop], v[~loop]
+  key, counts = np.unique(np.concatenate((u * n + v, v * n + u)), return_counts = True)
+  offsets = np.zeros(n + 1, dtype = np.int64)
+  np.cumsum(np.bincount(key // n, minlength = n), out = offsets[1:])
+  return offsets, key % n, counts.astype(np.float64)
+
+
+def _match(graph, vw, part, heaviest, rng):
+  # Pairs of neighbours in the same region to merge, each over one of its heaviest edges (random among
+  # equals) and together weighing at most HEAVIEST. Returns the merged node of every node and their number
+  offsets, targets, ew = graph
+  n = len(vw)
+  u = np.repeat(np.arange(n), np.diff(offsets))
+  v = targets
+  allowed = (part[u] == part[v]) & (vw[u] + vw[v] <= heaviest)
+  score = ew + rng.random(len(ew))
+  mate = np.full(n, -1, dtype = np.int64)
+  # Every free node picks its best free neighbour, and nodes picking each other are matched
+  for _ in range(4):
+    free = mate < 0
+    candidate = allowed & free[u] & free[v]
+    if not candidate.any():
+      break
+    # Rows are already grouped by node, so the best edge of each is a reduceat away
+    s = np.where(candidate, score, -1.0)
+    rows = np.flatnonzero(offsets[:-1] < offsets[1:])
+    best = np.full(n, -1.0)
+    best[rows] = np.maximum.reduceat(s, offsets[rows])
+    pick = candidate & (s == best[u])
+    choice = np.full(n, -1, dtype = np.int64)
+    choice[u[pick]] = v[pick]
+    mutual = np.flatnonzero(choice >= 0)
+    mutual = mutual[choice[choice[mutual]] == mutual]
+    mate[mutual] = choice[mutual]
+  # A pair becomes the node of its lower id
+  ids = np.arange(n)
+  lead = (mate < 0) | (ids < mate)
+  number = np.cumsum(lead) - 1
+  merged = np.where(lead, number, number[np.where(lead, ids, mate)])
+  return merged, int(number[-1]) + 1 if n else 0
+
+
+def _contract(graph, merged, m):
+  # The graph between the M merged nodes, weights of parallel edges added up
+  offsets, targets, ew = graph
+  u = merged[np.repeat(np.arange(len(merged)), np.diff(offsets))]
+  v = merged[targets]
+  keep = u != v
+  key, inverse = np.unique(u[keep] * m + v[keep], return_inverse = True)
+  weights = np.bincount(inverse.ravel(), weights = ew[keep], minlength = len(key))
+  offsets = np.zeros(m + 1, dtype = np.int64)
+  np.cumsum(np.bincount(key // m, minlength = m), out = offsets[1:])
+  return offsets, key % m, weights
+
+
+def _refine(graph, vw, parts, k, limit):
+  # Greedy boundary moves, see the top of the file, until a pass over the nodes next to the last moves
+  # moves nothing. Every move cuts fewer edges or evens out the loads, so this ends
+  offsets, targets, ew = graph
+  n = len(vw)
+  u = np.repeat(np.arange(n), np.diff(offsets))
+  todo = np.unique(u[parts[u] != parts[targets]]).tolist()
+  bounds = offsets.tolist()
+  targets = targets.tolist()
+  ew = ew.tolist()
+  node_weights = vw.tolist()
+  part = parts.tolist()
+  load = np.bincount(parts, weights = vw, minlength = k).tolist()
+  while todo:
+    moved = []
+    for node in todo:
+      here = part[node]
+      links = {}
+      for j in range(bounds[node], bounds[node + 1]):
+        other = part[targets[j]]
+        links[other] = links.get(other, 0) + ew[j]
+      w = node_weights[node]
+      if len(links) == 1 and here in links or load[here] <= w:
+        continue
+      inside = links.pop(here, 0)
+      # Fewer edges cut first, then the lighter region, and moving must beat staying
+      best = None
+      best_key = (0, w - load[here])
+      for region, edges in links.items():
+        if load[region] + w <= limit:
+          key = (edges - inside, -load[region])
+          if key > best_key:
+            best, best_key = region, key
+      if best is not None:
+        part[node] = best
+        load[here] -= w
+        load[best] += w
+        moved.append(node)
+    todo = sorted({other for node in moved for other in targets[bounds[node]:bounds[node + 1]]}.union(moved))
+  return np.array(part, dtype = np.int64)
@@ -0,0 +1,269 @@
+from bisect import insort
+from heapq import heapify, heappop, heappush
+
+# Scheduler backends for Environment. Every backend stores the same
+# (time, seq, ...) tuples and hands them back in tuple order, so the time and
+# FIFO tie-breaking semantics are identical whichever one is plugged in.
+# pop() raises IndexError when the scheduler is empty, like heappop does, and
+# peek() returns what pop() would without taking it out. Entries may be
+# pushed at any time, including earlier than the last one popped. entries()
+# iterates over every entry in no particular order, leaving the scheduler
+# as it is. compact(alive) drops every entry for which alive(entry) is false,
+# keeping the order of the rest intact.
+
+
+class HeapScheduler(object):
+  """Binary heap. O(log n) push and pop, good default for irregular event times"""
+  def __init__(self):
+    self._heap = []
+
+  def __len__(self):
+    return len(self._heap)
+
+  def push(self, entry):
+    heappush(self._heap, entry)
+
+  def pop(self):
+    return heappop(self._heap)
+
+  def peek(self):
+    if not self._heap:
+      raise IndexError("peek into empty heap")
+    return self._heap[0]
+
+  def entries(self):
+    return iter(self._heap)
+
+  def compact(self, alive):
+    self._heap = [e for e in self._heap if alive(e)]
+    heapify(self._heap)
+
+
+class CalendarQueue(object):
+  """Calendar queue (Brown 1988). Events are hashed by time into a ring of buckets one 'day'
+  wide; dequeue walks the ring a day at a time. O(1) amortized when event times are evenly spread.
+  Each bucket is a small heap so a burst of same-time events doesn't degrade to O(n)"""
+  def __init__(self, nbuckets = 2, width = 1.0):
+    self._size = 0
+    self._rebuild(nbuckets, width, 0)
+
+  def __len__(self):
+    return self._size
+
+  def _rebuild(self, nbuckets, width, last_time):
+    self._nbuckets = nbuckets
+    self._width = width
+    self._buckets = [[] for _ in range(nbuckets)]
+    # Day currently being dequeued - bucket index is day % nbuckets
+    self._day = int(last_time // width)
+    self._last_time = last_time
+
+  def push(self, entry):
+    if entry[0] < self._last_time:
+      # Earlier than the last entry popped: dequeueing has to start over from its day
+      self._day = int(entry[0] // self._width)
+      self._last_time = entry[0]
+    heappush(self._buckets[int(entry[0] // self._width) % self._nbuckets], entry)
+    self._size += 1
+    if self._size > 2 * self._nbuckets:
+      self._resize(2 * self._nbuckets)
+
+  def pop(self):
+    if not self._size:
+      raise IndexError("pop from empty calendar queue")
+    return self._take(*self._find())
+
+  def peek(self):
+    if not self._size:
+      raise IndexError("peek into empty calendar queue")
+    bucket, _ = self._find()
+    return bucket[0]
+
+  def entries(self):
+    return (e for b in self._buckets for e in b)
+
+  def _find(self):
+    # (bucket, day) of the earliest entry
+    buckets = self._buckets
+    nbuckets = self._nbuckets
+    width = self._width
+    day = self._day
+    for _ in range(nbuckets):
+      bucket = buckets[day % nbuckets]
+      if bucket and bucket[0][0] // width <= day:
+        return bucket, day
+      day += 1
+    # A whole year went by without an event: jump straight to the earliest one
+    bucket = min((b for b in buckets if b), key = lambda b: b[0])
+    return bucket, int(bucket[0][0] // width)
+
+  def _take(self, bucket, day):
+    entry = heappop(bucket)
+    self._day = day
+    self._last_time = entry[0]
+    self._size -= 1
+    if self._nbuckets > 2 and self._size < self._nbuckets // 2:
+      self._resize(self._nbuckets // 2)
+    return entry
+
+  def compact(self, alive):
+    for i, bucket in enumerate(self._buckets):
+      kept = [e for e in bucket if alive(e)]
+      if len(kept) != len(bucket):
+        heapify(kept)
+        self._buckets[i] = kept
+    self._size = sum(len(b) for b in self._buckets)
+
+  def _resize(self, nbuckets):
+    entries = sorted(e for b in self._buckets for e in b)
+    self._rebuild(nbuckets, self._new_width(entries), self._last_time)
+    buckets = self._buckets
+    width = self._width
+    # Entries are sorted, so appending keeps every bucket a valid heap
+    for entry in entries:
+      buckets[int(entry[0] // width) % nbuckets].append(entry)
+
+  def _new_width(self, entries):
+    # Brown's heuristic: three times the average gap between the first few events,
+    # ignoring gaps more than twice the average
+    sample = [e[0] for e in entries[:25]]
+    gaps = [b - a for a, b in zip(sample, sample[1:])]
+    if not gaps:
+      return self._width
+    avg = sum(gaps) / len(gaps)
+    close = [g for g in gaps if g <= 2 * avg]
+    avg = sum(close) / len(close) if close else avg
+    return 3 * avg if avg > 0 else self._width
+
+
+class LadderQueue(object):
+  """Ladder queue (Tang, Goh and Thng 2005). Far-future events sit unsorted in Top, get spread
+  over rungs of buckets as they come closer, and only a small Bottom list is ever sorted"""
+  THRESHOLD = 50
+  MAX_RUNGS = 8
+
+  def __init__(self):
+    self._top = []
+    self._top_min = None
+    self._top_max = None
+    # Events after top_start go to Top. Bottom can hold events at top_start, which have to sort among them
+    self._top_start = -float('inf')
+    # Each rung is [start, width, buckets, current bucket index]
+    self._rungs = []
+    # Sorted list consumed from the front - entries before bottom_head are spent
+    self._bottom = []
+    self._bottom_head = 0
+    self._size = 0
+
+  def __len__(self):
+    return self._size
+
+  def push(self, entry):
+    self._size += 1
+    t = entry[0]
+    if t > self._top_start:
+      if not self._top:
+        self._top_min = self._top_max = t
+      elif t < self._top_min:
+        self._top_min = t
+      elif t > self._top_max:
+        self._top_max = t
+      self._top.append(entry)
+      return
+    for rung in self._rungs:
+      start, width, buckets, cur = rung
+      if t >= start + cur * width:
+        idx = min(max(int((t - start) / width), cur), len(buckets) - 1)
+        buckets[idx].append(entry)
+        return
+    insort(self._bottom, entry, self._bottom_head)
+
+  def peek(self):
+    # Refilling Bottom only moves entries down the ladder, pop order stays the same
+    if self._bottom_head == len(self._bottom):
+      self._refill()
+    return self._bottom[self._bottom_head]
+
+  def entries(self):
+    yield from self._top
+    for rung in self._rungs:
+      for bucket in rung[2]:
+        yield from bucket
+    yield from self._bottom[self._bottom_head:]
+
+  def pop(self):
+    if self._bottom_head == len(self._bottom):
+      self._refill()
+    bottom = self._bottom
+    head = self._bottom_head
+    entry = bottom[head]
+    bottom[head] = None
+    self._bottom_head = head + 1
+    self._size -= 1
+    return entry
+
+  def compact(self, alive):
+    self._top = [e for e in self._top if alive(e)]
+    for rung in self._rungs:
+      rung[2] = [[e for e in b if alive(e)] for b in rung[2]]
+    self._bottom = [e for e in self._bottom[self._bottom_head:] if alive(e)]
+    self._bottom_head = 0
+    self._size = len(self._top) + len(self._bottom) + sum(
+      len(b) for rung in self._rungs for b in rung[2])
+
+  def _set_bottom(self, entries):
+    entries.sort()
+    self._bottom = entries
+    self._bottom_head = 0
+
+  def _refill(self):
+    rungs = self._rungs
+    while True:
+      if not rungs:
+        if not self._top:
+          raise IndexError("pop from empty ladder queue")
+        if self._spawn_from_top():
+          return
+        continue
+      rung = rungs[-1]
+      start, width, buckets, cur = rung
+      while cur < len(buckets) and not buckets[cur]:
+        cur += 1
+      if cur == len(buckets):
+        rungs.pop()
+        continue
+      bucket = buckets[cur]
+      buckets[cur] = []
+      rung[3] = cur + 1
+      if len(bucket) > self.THRESHOLD and len(rungs) < self.MAX_RUNGS:
+        if self._spawn_rung(start + cur * width, width, bucket):
+          return
+        continue
+      self._set_bottom(bucket)
+      return
+
+  # The spawn helpers return True when they filled Bottom instead of adding a rung
+  def _spawn_from_top(self):
+    top = self._top
+    lo, hi = self._top_min, self._top_max
+    self._top = []
+    if hi == lo or len(top) <= self.THRESHOLD:
+      self._top_start = hi
+      self._set_bottom(top)
+      return True
+    width = (hi - lo) / len(top)
+    self._top_start = lo + (len(top) + 1) * width
+    return self._spawn_rung(lo, (len(top) + 1) * width, top)
+
+  def _spawn_rung(self, start, span, entries):
+    nbuckets = len(entries)
+    width = span / nbuckets
+    if width <= 0:
+      self._set_bottom(entries)
+      return True
+    buckets = [[] for _ in range(nbuckets)]
+    for entry in entries:
+      idx = min(max(int((entry[0] - start) / width), 0), nbuckets - 1)
+      buckets[idx].append(entry)
+    self._rungs.append([start, width, buckets, 0])
+    return False
@@ -0,0 +1,45 @@
+import pickle
+import struct
+
+import numpy as np
+
+# The binary layout snapshot.py and mapfile.py share: an 8 byte magic string, a version and the
+# offset of the table of contents, then 64-byte aligned sections holding flat NumPy arrays, then the
+# pickled table of contents, {name: (dtype, shape, offset)}. Each format has its own magic string
+# and version and checks them itself.
+#
+# Read back from a memory mapping of the file, the arrays are views of it: nothing is read or copied
+# up front, and processes mapping the same file share the pages.
+
+_HEADER = struct.Struct('<8sIQ')
+_ALIGN = 64
+
+
+def write_sections(path, magic, version, arrays):
+  # Write the {name: array} ARRAYS to PATH behind a header with MAGIC and VERSION
+  with open(path, 'wb') as f:
+    f.write(b'\0' * _HEADER.size)
+    toc = {}
+    for name, array in arrays.items():
+      pad = -f.tell() % _ALIGN
+      f.write(b'\0' * pad)
+      array = np.ascontiguousarray(array)
+      toc[name] = (array.dtype.str, array.shape, f.tell())
+      f.write(array.tobytes())
+    toc_offset = f.tell()
+    f.write(pickle.dumps(toc, protocol = pickle.HIGHEST_PROTOCOL))
+    f.seek(0)
+    f.write(_HEADER.pack(magic, version, toc_offset))
+
+
+def read_header(mm):
+  # (magic, version) of the file mapped as MM
+  return _HEADER.unpack_from(mm, 0)[:2]
+
+
+def read_sections(mm):
+  # {name: array} of the file mapped as MM, views of the mapping which keep it open
+  toc = pickle.loads(mm[_HEADER.unpack_from(mm, 0)[2]:])
+  # Shapes of 1-d sections were once stored as plain lengths, which reshape takes as well
+  return {name: np.frombuffer(mm, dtype = np.dtype(dtype), count = int(np.prod(shape)), offset = offset)
+          .reshape(shape) for name, (dtype, shape, offset) in toc.items()}
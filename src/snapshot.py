@@ -0,0 +1,308 @@
+import io
+import mmap
+import pickle
+from itertools import count
+
+import numpy as np
+
+from .components import Car, Node, StreetGraph
+from .edges import EdgeColumns, NO_LIMIT
+from .discrete import Environment, EventHandle, BatchEvent, PeriodicEvent, Process
+from .sections import read_header, read_sections, write_sections
+
+# Whole-simulation snapshots: the Environment queue, the StreetGraph and every Car on it, including
+# link-life tables, written to one binary file that is memory-mapped back in.
+#
+# Layout (see sections.py): an 8 byte magic string, then a version and the offset of the table of
+# contents, then 64-byte aligned sections. Nodes, edges, cars, routes and link lives are flat NumPy arrays (CSR
+# for the variable length ones) that load as zero-copy views of the mapped file. Labels, classes
+# and scalars are pickled into a 'meta' section. The pending events and any extra car attributes
+# go into a 'refs' section, pickled with cars, nodes, the graph and the environment replaced by
+# persistent ids, so the restored events drive the restored cars rather than copies of them.
+#
+# Events are saved with their callables, which therefore have to pickle: module level functions,
+# bound methods of cars and other picklable objects, functools.partial and BatchHandlers of those.
+# Generator processes can't be saved.
+
+MAGIC = b'EE122SNP'
+VERSION = 1
+
+
+class SnapshotError(Exception):
+  pass
+
+
+class _Pickler(pickle.Pickler):
+  def __init__(self, file, ids):
+    super(_Pickler, self).__init__(file, protocol = pickle.HIGHEST_PROTOCOL)
+    self._ids = ids
+
+  def persistent_id(self, obj):
+    if isinstance(obj, (Car, Node, StreetGraph, Environment)):
+      key = self._ids.get(id(obj))
+      if key is None:
+        raise SnapshotError("{!r} is not part of the simulation being saved".format(obj))
+      return key
+    return None
+
+
+class _Unpickler(pickle.Unpickler):
+  def __init__(self, file, objects):
+    super(_Unpickler, self).__init__(file)
+    self._objects = objects
+
+  def persistent_load(self, key):
+    return self._objects[key]
+
+
+def _collect_cars(sg):
+  # Every car on the graph plus every car some link-life table points at
+  cars = list(sg._cars)
+  index = {id(car): i for i, car in enumerate(cars)}
+  i = 0
+  while i < len(cars):
+    for other in cars[i]._linkLife:
+      if id(other) not in index:
+        index[id(other)] = len(cars)
+        cars.append(other)
+    i += 1
+  return cars, index
+
+
+_CAR_FIELDS = ('_source', '_destination', '_label', '_sg', '_speed', '_next_node_dist_traveled',
+               '_linkLife', '_rad', '_last_node', '_route', '_next_node', '_next_node_dist',
+               '_next_node_limit', '_planner')
+
+
+def _save_events(env):
+  events = []
+  for entry in _queue_entries(env.event_queue):
+    time, seq, handle = entry
+    if handle._env is None:
+      continue
+    if isinstance(handle, Process):
+      raise SnapshotError("Generator process {!r} can't be saved".format(handle))
+    if isinstance(handle, PeriodicEvent):
+      events.append(('periodic', time, seq, handle._func, handle.message,
+                     (handle.period, handle.until, handle.fired, handle._start)))
+    elif isinstance(handle, BatchEvent):
+      events.append(('batch', time, seq, handle.eventfunc, handle.message, handle.payload))
+    else:
+      events.append(('event', time, seq, handle.eventfunc, handle.message, None))
+  return events
+
+
+def _queue_entries(queue):
+  # Every entry of the scheduler in order, read without popping so the live queue is left alone
+  return sorted(queue.entries(), key = lambda entry: entry[:2])
+
+
+def save_snapshot(path, env, sg):
+  # Write the complete state of ENV and SG to PATH
+  # Nodes go in id order, so ids survive the round trip
+  nodes = sg._node_list
+  label_index = {node._label: i for i, node in enumerate(nodes)}
+  cars, car_index = _collect_cars(sg)
+
+  ids = {id(sg): ('sg',), id(env): ('env',)}
+  for i, node in enumerate(nodes):
+    ids[id(node)] = ('node', i)
+  for i, car in enumerate(cars):
+    ids[id(car)] = ('car', i)
+
+  def node_id(label):
+    return -1 if label is None else label_index[label]
+
+  offsets = np.zeros(len(nodes) + 1, dtype = np.int64)
+  targets = []
+  weights = []
+  for u, v, dist in sg._arcs():
+    targets.append(v)
+    weights.append(dist)
+    offsets[u + 1] += 1
+  np.cumsum(offsets, out = offsets)
+
+  route_offsets = np.zeros(len(cars) + 1, dtype = np.int64)
+  routes = []
+  link_offsets = np.zeros(len(cars) + 1, dtype = np.int64)
+  link_targets = []
+  link_values = []
+  car_classes = []
+  extras = []
+  for i, car in enumerate(cars):
+    routes.extend(node_id(label) for label in car._route)
+    route_offsets[i + 1] = len(routes)
+    for other, value in car._linkLife.items():
+      link_targets.append(car_index[id(other)])
+      link_values.append(value)
+    link_offsets[i + 1] = len(link_targets)
+    if type(car) not in car_classes:
+      car_classes.append(type(car))
+    extras.append({k: v for k, v in car.__dict__.items() if k not in _CAR_FIELDS})
+
+  registered = set(map(id, sg._cars))
+  arrays = {
+    'node_x': np.array([n._x for n in nodes], dtype = np.float64),
+    'node_y': np.array([n._y for n in nodes], dtype = np.float64),
+    'edge_offsets': offsets,
+    'edge_targets': np.array(targets, dtype = np.int64),
+    'edge_weights': np.array(weights, dtype = np.float64),
+    'car_class': np.array([car_classes.index(type(car)) for car in cars], dtype = np.int32),
+    'car_registered': np.array([id(car) in registered for car in cars], dtype = np.bool_),
+    'car_source': np.array([node_id(car._source) for car in cars], dtype = np.int64),
+    'car_destination': np.array([node_id(car._destination) for car in cars], dtype = np.int64),
+    'car_last': np.array([node_id(car._last_node) for car in cars], dtype = np.int64),
+    'car_next': np.array([node_id(car._next_node) for car in cars], dtype = np.int64),
+    'car_speed': np.array([car._speed for car in cars], dtype = np.float64),
+    'car_rad': np.array([car._rad for car in cars], dtype = np.float64),
+    'car_next_dist': np.array([car._next_node_dist for car in cars], dtype = np.float64),
+    'car_next_limit': np.array([car._next_node_limit for car in cars], dtype = np.float64),
+    'car_traveled': np.array([car._next_node_dist_traveled for car in cars], dtype = np.float64),
+    'route_offsets': route_offsets,
+    'route_nodes': np.array(routes, dtype = np.int64),
+    'link_offsets': link_offsets,
+    'link_targets': np.array(link_targets, dtype = np.int64),
+    'link_values': np.array(link_values, dtype = np.float64),
+  }
+  if sg._edges is not None:
+    arrays.update(zip(('limits_source', 'limits_target', 'limits_length', 'limits_speed_limit', 'limits_capacity'),
+                      sg._edges.rows()))
+
+  meta = {
+    'node_labels': [n._label for n in nodes],
+    'node_cls': sg._nodeCls,
+    'frozen': sg._compact is not None,
+    'car_cls': sg._carCls,
+    'car_classes': car_classes,
+    'car_labels': [car._label for car in cars],
+    'time_elapsed': env.time_elapsed,
+    'verbosity': env.v,
+    'scheduler': type(env.event_queue),
+  }
+  refs = {
+    'car_extras': extras,
+    'events': _save_events(env),
+  }
+  buf = io.BytesIO()
+  try:
+    _Pickler(buf, ids).dump(refs)
+  except (pickle.PicklingError, AttributeError, TypeError) as e:
+    raise SnapshotError("Simulation state can't be pickled: {}".format(e))
+  arrays['meta'] = np.frombuffer(pickle.dumps(meta, protocol = pickle.HIGHEST_PROTOCOL), dtype = np.uint8)
+  arrays['refs'] = np.frombuffer(buf.getvalue(), dtype = np.uint8)
+  write_sections(path, MAGIC, VERSION, arrays)
+
+
+def load_snapshot(path):
+  # Returns a fresh (Environment, StreetGraph) pair in exactly the state they were saved in.
+  # Every call builds independent objects, so many variants can be forked from one file
+  with open(path, 'rb') as f:
+    mm = mmap.mmap(f.fileno(), 0, access = mmap.ACCESS_READ)
+  try:
+    magic, version = read_header(mm)
+    if magic != MAGIC:
+      raise SnapshotError("{} is not a simulation snapshot".format(path))
+    if version != VERSION:
+      raise SnapshotError("Unsupported snapshot version {}".format(version))
+    a = read_sections(mm)
+    return _restore(a)
+  finally:
+    # The arrays are views of the mapping; drop them before closing it
+    a = None
+    mm.close()
+
+
+def _restore(a):
+  objects = {}
+  meta = pickle.loads(a['meta'])
+
+  sg = StreetGraph(nodeCls = meta['node_cls'], carCls = meta['car_cls'])
+  node_cls = meta['node_cls']
+  labels = meta['node_labels']
+  nodes = []
+  for i, (x, y, label) in enumerate(zip(a['node_x'].tolist(), a['node_y'].tolist(), labels)):
+    node = node_cls.__new__(node_cls)
+    node._x = x
+    node._y = y
+    node._label = label
+    node._neighbors = {}
+    sg._register(node)
+    nodes.append(node)
+    objects[('node', i)] = node
+  offsets = a['edge_offsets'].tolist()
+  targets = a['edge_targets'].tolist()
+  weights = a['edge_weights'].tolist()
+  for i, node in enumerate(nodes):
+    neighbors = node._neighbors
+    for j in range(offsets[i], offsets[i + 1]):
+      neighbors[nodes[targets[j]]] = weights[j]
+  if 'limits_source' in a:
+    sg._edges = EdgeColumns(rows = tuple(a['limits_' + name] for name in
+                                         ('source', 'target', 'length', 'speed_limit', 'capacity')))
+  if meta.get('frozen'):
+    sg.freeze()
+
+  def label(i):
+    return None if i < 0 else labels[i]
+
+  classes = meta['car_classes']
+  cars = []
+  for i, cls in enumerate(a['car_class'].tolist()):
+    car = classes[cls].__new__(classes[cls])
+    cars.append(car)
+    objects[('car', i)] = car
+  objects[('sg',)] = sg
+
+  route_offsets = a['route_offsets'].tolist()
+  route_nodes = a['route_nodes'].tolist()
+  link_offsets = a['link_offsets'].tolist()
+  link_targets = a['link_targets'].tolist()
+  link_values = a['link_values'].tolist()
+  # Snapshots from before speed limits have no limit column
+  limits = a['car_next_limit'].tolist() if 'car_next_limit' in a else [NO_LIMIT] * len(a['car_class'])
+  columns = zip(a['car_source'].tolist(), a['car_destination'].tolist(), a['car_last'].tolist(),
+                a['car_next'].tolist(), a['car_speed'].tolist(), a['car_rad'].tolist(),
+                a['car_next_dist'].tolist(), limits, a['car_traveled'].tolist(), a['car_registered'].tolist())
+  for i, (source, destination, last, nxt, speed, rad, next_dist, limit, traveled, registered) in enumerate(columns):
+    car = cars[i]
+    car._source = label(source)
+    car._destination = label(destination)
+    car._label = meta['car_labels'][i]
+    car._sg = sg
+    car._speed = speed
+    car._rad = rad
+    car._next_node_dist_traveled = traveled
+    car._next_node_dist = next_dist
+    car._next_node_limit = limit
+    car._last_node = label(last)
+    car._next_node = label(nxt)
+    car._route = [labels[j] for j in route_nodes[route_offsets[i]:route_offsets[i + 1]]]
+    car._planner = None
+    car._linkLife = {cars[link_targets[j]]: link_values[j] for j in range(link_offsets[i], link_offsets[i + 1])}
+    if registered:
+      sg._cars.add(car)
+
+  env = Environment(verbosity = meta['verbosity'], scheduler = meta['scheduler']())
+  objects[('env',)] = env
+  env.time_elapsed = meta['time_elapsed']
+
+  # Car extras and events may point at any of the objects above
+  refs = _Unpickler(io.BytesIO(a['refs'].tobytes()), objects).load()
+  for car, extra in zip(cars, refs['car_extras']):
+    car.__dict__.update(extra)
+  last_seq = -1
+  for kind, time, seq, func, message, extra in refs['events']:
+    if kind == 'periodic':
+      period, until, fired, start = extra
+      handle = PeriodicEvent(env, func, period, start, until, message)
+      handle.fired = fired
+    elif kind == 'batch':
+      handle = BatchEvent(env, time, func, message, extra)
+    else:
+      handle = EventHandle(env, time, func, message)
+    handle._env = env
+    handle.time = time
+    env.event_queue.push((time, seq, handle))
+    last_seq = max(last_seq, seq)
+  env._seq = count(last_seq + 1)
+  return env, sg
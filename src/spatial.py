@@ -0,0 +1,168 @@
+import heapq
+import math
+
+import numpy as np
+
+# Uniform grid over node coordinates, for nearest node and range queries on a StreetGraph.
+#
+# Space is cut into square cells of side CELL and each occupied cell keeps the ids of the nodes in
+# it, in a dict keyed by (column, row). The cell side is picked so a cell holds about PER_CELL nodes
+# when they are spread evenly over their bounding box. Inserting a node is a dict append; once the
+# node count doubles, or the nodes spread far beyond the box the cell was picked for, the grid is
+# rebuilt with a new cell side. Rebuilds are geometrically spaced, so inserts stay constant time.
+#
+# Nearest queries look at the cells in square rings of growing radius around the query point, and
+# stop once the k-th best distance found is closer than anything in the next ring can be. Box and
+# radius queries visit the cells overlapping the box. Distances are Euclidean, whatever the node class.
+
+PER_CELL = 4
+
+
+class GridIndex(object):
+  """Grid index over points X[i], Y[i] for ids i = 0, 1, ... Kept up to date by StreetGraph.add_node"""
+  def __init__(self, x = (), y = ()):
+    self._x = list(x)
+    self._y = list(y)
+    self._build()
+
+  def __len__(self):
+    return len(self._x)
+
+  def _build(self):
+    n = len(self._x)
+    self._built = n
+    cell = 1.0
+    if n:
+      x = np.array(self._x, dtype = np.float64)
+      y = np.array(self._y, dtype = np.float64)
+      width = x.max() - x.min()
+      height = y.max() - y.min()
+      if width > 0 or height > 0:
+        # No more than about n / PER_CELL cells over the box, nor along its long side when it is
+        # long and thin
+        cell = max(math.sqrt(width * height * PER_CELL / n), max(width, height) * PER_CELL / n)
+    self._cell = cell
+    self._cells = {}
+    # Occupied columns and rows, the area outside holds nothing
+    self._bounds = None
+    if not n:
+      return
+    # Ids grouped by cell in one sort, in id order within each cell like _add leaves them
+    cx = np.floor(x / cell).astype(np.int64)
+    cy = np.floor(y / cell).astype(np.int64)
+    order = np.lexsort((cy, cx))
+    cx = cx[order]
+    cy = cy[order]
+    starts = np.flatnonzero(np.diff(cx, prepend = cx[0] - 1) | np.diff(cy, prepend = cy[0] - 1))
+    ids = np.split(order, starts[1:])
+    self._cells = dict(zip(zip(cx[starts].tolist(), cy[starts].tolist()), (group.tolist() for group in ids)))
+    self._bounds = [int(cx.min()), int(cy.min()), int(cx.max()), int(cy.max())]
+
+  def _cell_of(self, x, y):
+    return math.floor(x / self._cell), math.floor(y / self._cell)
+
+  def _add(self, i, x, y):
+    c = self._cell_of(x, y)
+    ids = self._cells.get(c)
+    if ids is None:
+      ids = self._cells[c] = []
+      b = self._bounds
+      if b is None:
+        self._bounds = [c[0], c[1], c[0], c[1]]
+      else:
+        b[0] = min(b[0], c[0])
+        b[1] = min(b[1], c[1])
+        b[2] = max(b[2], c[0])
+        b[3] = max(b[3], c[1])
+    ids.append(i)
+
+  def insert(self, x, y):
+    # Add the point with the next id
+    i = len(self._x)
+    self._x.append(x)
+    self._y.append(y)
+    self._add(i, x, y)
+    x0, y0, x1, y1 = self._bounds
+    if i + 1 > 2 * max(self._built, 32) or (x1 - x0 + 1) * (y1 - y0 + 1) > 64 * (i + 1):
+      self._build()
+    return i
+
+  def _ring(self, cx, cy, r):
+    # Occupied cells at Chebyshev distance R from cell (CX, CY)
+    cells = self._cells
+    x0, y0, x1, y1 = self._bounds
+    if r == 0:
+      ids = cells.get((cx, cy))
+      if ids is not None:
+        yield ids
+      return
+    for row in (cy - r, cy + r):
+      if y0 <= row <= y1:
+        for col in range(max(cx - r, x0), min(cx + r, x1) + 1):
+          ids = cells.get((col, row))
+          if ids is not None:
+            yield ids
+    for col in (cx - r, cx + r):
+      if x0 <= col <= x1:
+        for row in range(max(cy - r + 1, y0), min(cy + r - 1, y1) + 1):
+          ids = cells.get((col, row))
+          if ids is not None:
+            yield ids
+
+  def nearest(self, x, y, k = 1):
+    # Ids of the K points closest to (X, Y), closest first, ties by id
+    if k <= 0 or self._bounds is None:
+      return []
+    xs = self._x
+    ys = self._y
+    cx, cy = self._cell_of(x, y)
+    x0, y0, x1, y1 = self._bounds
+    # Rings nearer than the occupied area are empty, and past the furthest corner there is nothing left
+    first = max(x0 - cx, cx - x1, y0 - cy, cy - y1, 0)
+    last = max(cx - x0, x1 - cx, cy - y0, y1 - cy)
+    # Max heap of the best K so far as (-squared distance, -id)
+    best = []
+    for r in range(first, last + 1):
+      for ids in self._ring(cx, cy, r):
+        for i in ids:
+          dx = xs[i] - x
+          dy = ys[i] - y
+          entry = (-(dx * dx + dy * dy), -i)
+          if len(best) < k:
+            heapq.heappush(best, entry)
+          elif entry > best[0]:
+            heapq.heapreplace(best, entry)
+      # Anything in a further ring is at least R cells away
+      if len(best) == k and -best[0][0] < (r * self._cell) ** 2:
+        break
+    return [-i for _, i in sorted(best, reverse = True)]
+
+  def box(self, x0, y0, x1, y1):
+    # Ids of the points with X0 <= x <= X1 and Y0 <= y <= Y1, in id order
+    if self._bounds is None or x0 > x1 or y0 > y1:
+      return []
+    bx0, by0, bx1, by1 = self._bounds
+    c0, r0 = self._cell_of(x0, y0)
+    c1, r1 = self._cell_of(x1, y1)
+    c0, r0, c1, r1 = max(c0, bx0), max(r0, by0), min(c1, bx1), min(r1, by1)
+    if c0 > c1 or r0 > r1:
+      return []
+    cells = self._cells
+    if (c1 - c0 + 1) * (r1 - r0 + 1) > len(cells):
+      groups = [ids for (col, row), ids in cells.items() if c0 <= col <= c1 and r0 <= row <= r1]
+    else:
+      groups = [cells[c] for c in ((col, row) for col in range(c0, c1 + 1) for row in range(r0, r1 + 1))
+                if c in cells]
+    xs = self._x
+    ys = self._y
+    found = [i for ids in groups for i in ids if x0 <= xs[i] <= x1 and y0 <= ys[i] <= y1]
+    found.sort()
+    return found
+
+  def within(self, x, y, radius):
+    # Ids of the points at most RADIUS from (X, Y), in id order
+    xs = self._x
+    ys = self._y
+    r2 = radius * radius
+    return [i for i in self.box(x - radius, y - radius, x + radius, y + radius)
+            if (xs[i] - x) ** 2 + (ys[i] - y) ** 2 <= r2]
@@ -0,0 +1,113 @@
+import math
+
+import numpy as np
+
+from .components import Car, EuclideanNode, ManhattanNode
+from .loader import _add_nodes, _add_edges
+
+# Synthetic city maps for scale tests and benchmarks.
+#
+# Every generator works out node coordinates and edge endpoints on whole NumPy arrays and hands
+# them to the loader's bulk path, so a map with a million intersections takes seconds rather than
+# the minutes add_node/add_edge would. Node labels are the node ids 0 .. n-1, and streets go both
+# ways with weights from the node class metric. Anything random comes from np.random.default_rng(SEED),
+# so the same arguments and seed always give the same map. Pass freeze=True for big maps, building
+# the CSR arrays directly is both faster and smaller than filling per-node neighbour dicts.
+
+
+def _graph(x, y, u, v, nodeCls, freeze):
+  sg, _ = _add_nodes(range(len(x)), x, y, nodeCls, Car, freeze)
+  _add_edges(sg, x, y, u.astype(np.int64), v.astype(np.int64), None, False, freeze)
+  return sg
+
+
+def _lattice(width, height, spacing):
+  # Coordinates and street endpoints of a WIDTH x HEIGHT grid, node id x * height + y
+  ids = np.arange(width * height).reshape(width, height)
+  x = np.repeat(np.arange(width, dtype = np.float64) * spacing, height)
+  y = np.tile(np.arange(height, dtype = np.float64) * spacing, width)
+  u = np.concatenate((ids[:-1, :].ravel(), ids[:, :-1].ravel()))
+  v = np.concatenate((ids[1:, :].ravel(), ids[:, 1:].ravel()))
+  return x, y, u, v
+
+
+def grid_map(width, height, spacing = 1.0, nodeCls = ManhattanNode, freeze = False):
+  # Manhattan grid: WIDTH x HEIGHT intersections SPACING apart. Node (x, y) has id x * height + y
+  x, y, u, v = _lattice(width, height, spacing)
+  return _graph(x, y, u, v, nodeCls, freeze)
+
+
+def perturbed_grid(width, height, spacing = 1.0, jitter = 0.25, drop = 0.0, seed = None,
+                   nodeCls = EuclideanNode, freeze = False):
+  # grid_map with every intersection moved up to JITTER * SPACING along each axis and a DROP fraction
+  # of the streets left out (which can disconnect the map)
+  rng = np.random.default_rng(seed)
+  x, y, u, v = _lattice(width, height, spacing)
+  x += rng.uniform(-jitter, jitter, len(x)) * spacing
+  y += rng.uniform(-jitter, jitter, len(y)) * spacing
+  if drop > 0:
+    keep = rng.random(len(u)) >= drop
+    u, v = u[keep], v[keep]
+  return _graph(x, y, u, v, nodeCls, freeze)
+
+
+def random_geometric(n, radius = None, spacing = 1.0, seed = None, nodeCls = EuclideanNode, freeze = False):
+  # N intersections spread uniformly over a square, one per SPACING**2 on average, with a street between
+  # every two at most RADIUS apart. The default radius gives about 6 streets per intersection
+  rng = np.random.default_rng(seed)
+  if radius is None:
+    radius = spacing * math.sqrt(6 / math.pi)
+  side = math.sqrt(n) * spacing
+  x = rng.uniform(0, side, n)
+  y = rng.uniform(0, side, n)
+  # Bucket the points into RADIUS sized cells: close pairs are in the same or adjacent cells. Each
+  # cell is paired with itself and the four neighbours after it, so every pair comes up once
+  cx = np.floor(x / radius).astype(np.int64)
+  cy = np.floor(y / radius).astype(np.int64)
+  cols = int(cx.max()) + 1 if n else 0
+  rows = int(cy.max()) + 1 if n else 0
+  # Points sorted by cell, and where each cell's points start in that order
+  cell = cx * rows + cy
+  order = np.argsort(cell, kind = 'stable')
+  size = np.bincount(cell, minlength = cols * rows)
+  first = np.cumsum(size) - size
+  sources = []
+  targets = []
+  for dx, dy in ((0, 0), (0, 1), (1, -1), (1, 0), (1, 1)):
+    nx = cx + dx
+    ny = cy + dy
+    valid = (nx < cols) & (ny >= 0) & (ny < rows)
+    other = np.where(valid, nx * rows + ny, 0)
+    lo = first[other]
+    counts = np.where(valid, size[other], 0)
+    # Every point against every point of its neighbour cell
+    src = np.repeat(np.arange(n), counts)
+    start = np.repeat(np.cumsum(counts) - counts, counts)
+    dst = order[np.repeat(lo, counts) + np.arange(len(src)) - start]
+    keep = (x[src] - x[dst]) ** 2 + (y[src] - y[dst]) ** 2 <= radius * radius
+    if (dx, dy) == (0, 0):
+      keep &= src < dst
+    sources.append(src[keep])
+    targets.append(dst[keep])
+  return _graph(x, y, np.concatenate(sources), np.concatenate(targets), nodeCls, freeze)
+
+
+def ring_radial(rings, spokes, spacing = 1.0, nodeCls = EuclideanNode, freeze = False):
+  # A centre (node 0) with SPOKES straight avenues running out through RINGS circular streets SPACING
+  # apart. Node 1 + (ring - 1) * spokes + spoke sits where a ring (1 .. RINGS) crosses a spoke
+  if rings < 1 or spokes < 1:
+    raise ValueError("Need at least one ring and one spoke, got {} and {}".format(rings, spokes))
+  ring = np.repeat(np.arange(1, rings + 1), spokes)
+  spoke = np.tile(np.arange(spokes), rings)
+  angle = 2 * np.pi * spoke / spokes
+  x = np.concatenate(([0.0], ring * spacing * np.cos(angle)))
+  y = np.concatenate(([0.0], ring * spacing * np.sin(angle)))
+  ids = 1 + np.arange(rings * spokes).reshape(rings, spokes)
+  # Out from the centre, then from each ring to the next one out
+  u = [np.zeros(spokes, dtype = np.int64), ids[:-1].ravel()]
+  v = [ids[0], ids[1:].ravel()]
+  if spokes > 2:
+    # Around each ring
+    u.append(ids.ravel())
+    v.append(np.roll(ids, -1, axis = 1).ravel())
+  return _graph(x, y, np.concatenate(u), np.concatenate(v), nodeCls, freeze)
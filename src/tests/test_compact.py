@@ -0,0 +1,68 @@
+import pickle
+import unittest
+from ..components import StreetGraph, EuclideanNode, ManhattanNode, Node
+
+def city(nodeCls):
+  sg = StreetGraph(nodeCls = nodeCls)
+  for x in range(7):
+    for y in range(7):
+      sg.add_node(x + 0.3 * ((x * 5 + y * 3) % 4), y + 0.2 * ((x + y * 7) % 5), (x, y))
+  for x in range(7):
+    for y in range(7):
+      if x < 6:
+        sg.add_edge((x, y), (x + 1, y), 1 + (x * y) % 3)
+      if y < 6:
+        sg.add_edge((x, y), (x, y + 1), 1 + (x + y) % 2)
+  return sg
+
+class TestCompactGraph(unittest.TestCase):
+
+  def test_same_answers(self):
+    for nodeCls in (Node, EuclideanNode, ManhattanNode):
+      sg = city(nodeCls)
+      labels = sorted(sg._labels)
+      expected = {}
+      for source in labels[::6]:
+        for target in labels:
+          for method in ('dijkstra', 'astar') if nodeCls.metric else ('dijkstra',):
+            expected[source, target, method] = sg.shortest_path(source, target, method)
+      edges = {(u, v): w for u, v, w in sg._arcs()}
+      coords = [sg.get_xy_coords(label) for label in labels]
+
+      sg.freeze()
+      self.assertIsNone(sg._node_from_label((0, 0))._neighbors)
+      for (source, target, method), route in expected.items():
+        self.assertEqual(sg.shortest_path(source, target, method), route)
+      self.assertEqual({(u, v): w for u, v, w in sg._arcs()}, edges)
+      self.assertEqual([sg.get_xy_coords(label) for label in labels], coords)
+      self.assertEqual(sg.get_edge((2, 3), (3, 3)), edges[sg.node_id((2, 3)), sg.node_id((3, 3))])
+      with self.assertRaises(KeyError):
+        sg.get_edge((0, 0), (6, 6))
+
+      self.assertEqual(sg.routes_from((0, 0), [(6, 6)])[0], expected[(0, 0), (6, 6), 'dijkstra'])
+      sg.contract()
+      self.assertEqual(sg.shortest_path((0, 0), (6, 6))[1], expected[(0, 0), (6, 6), 'dijkstra'][1])
+
+  def test_frozen_changes(self):
+    sg = city(Node)
+    sg.freeze()
+    with self.assertRaises(Exception):
+      sg.add_edge((0, 0), (6, 6))
+    with self.assertRaises(Exception):
+      sg.add_node(9, 9, "new")
+    sg.thaw()
+    sg.add_edge((0, 0), (6, 6), 0.5)
+    self.assertEqual(sg.shortest_path((0, 0), (6, 6)), ([(0, 0), (6, 6)], 0.5))
+
+  def test_cars_and_pickle(self):
+    sg = city(EuclideanNode)
+    sg.freeze()
+    sg = pickle.loads(pickle.dumps(sg))
+    car = sg.add_car((0, 0), (6, 6), "cab", 0.7)
+    while car._next_node is not None:
+      car.drive()
+    self.assertEqual(car.position(), sg.get_xy_coords((6, 6)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,199 @@
+import math
+import random
+import unittest
+from ..components import StreetGraph, EuclideanNode, ManhattanNode
+
+def weighted_grid(n, seed = 0):
+  rng = random.Random(seed)
+  sg = StreetGraph()
+  for x in range(n):
+    for y in range(n):
+      sg.add_node(x, y, (x, y))
+  for x in range(n):
+    for y in range(n):
+      if x < n - 1:
+        sg.add_edge((x, y), (x + 1, y), rng.randint(1, 5))
+      if y < n - 1:
+        sg.add_edge((x, y), (x, y + 1), rng.randint(1, 5))
+  return sg, rng
+
+class TestDynamicRouting(unittest.TestCase):
+
+  def remaining(self, car):
+    # Length of the car's route from the node it is heading to
+    route = [car._next_node] + car._route
+    return sum(car._sg.get_edge(a, b) for a, b in zip(route, route[1:]))
+
+  def test_repairs_match_dijkstra(self):
+    for frozen in (False, True):
+      sg, rng = weighted_grid(8)
+      if frozen:
+        sg.freeze()
+      car = sg.add_car((0, 0), (7, 7), "taxi", 1)
+      edges = [(u, v) for u in sorted(sg._labels) for v in sorted(sg._labels)
+               if u < v and abs(u[0] - v[0]) + abs(u[1] - v[1]) == 1]
+      planner = None
+      for step in range(60):
+        # A few streets at a time, some closed
+        changes = rng.sample(edges, step % 3 + 1)
+        sg.update_edges([(u, v, rng.choice([math.inf, 0.5, 1, 3, 8])) for u, v in changes])
+        if car._next_node is None:
+          break
+        expected = sg.shortest_path(car._next_node, (7, 7), 'dijkstra')[1]
+        if expected < math.inf:
+          self.assertEqual(self.remaining(car), expected)
+        if car._planner is not None:
+          # Repaired from the same search state, not rebuilt
+          self.assertTrue(planner is None or car._planner is planner)
+          planner = car._planner
+        if car._next_node_dist < math.inf and step % 3 == 0:
+          car.drive()
+      self.assertIsNotNone(planner)
+
+  def test_repairs_with_heuristic(self):
+    # Congestion multiplying the lengths of EuclideanNode streets, which D* Lite estimates with the metric
+    rng = random.Random(1)
+    sg = StreetGraph(nodeCls = EuclideanNode)
+    for x in range(7):
+      for y in range(7):
+        sg.add_node(x + rng.uniform(-0.3, 0.3), y + rng.uniform(-0.3, 0.3), (x, y))
+    edges = []
+    for x in range(7):
+      for y in range(7):
+        for other in ((x + 1, y), (x, y + 1)):
+          if max(other) < 7:
+            sg.add_edge((x, y), other)
+            edges.append(((x, y), other, sg.get_edge((x, y), other)))
+    car = sg.add_car((0, 3), (6, 4), "cab", 0.2)
+    for step in range(40):
+      changes = [(a, b, length * rng.choice([1, 1.5, 4])) for a, b, length in rng.sample(edges, 8)]
+      sg.update_edges(changes)
+      if car._next_node is None:
+        break
+      self.assertAlmostEqual(self.remaining(car), sg.shortest_path(car._next_node, (6, 4), 'dijkstra')[1])
+      car.drive()
+    self.assertIsNotNone(car._planner)
+
+  def test_random_graphs(self):
+    # Small random graphs with zero weights, closures and streets changed twice in one call. Every car's
+    # route must stay a shortest one, and finding it must terminate
+    for seed in range(150):
+      rng = random.Random(seed)
+      cls = rng.choice([None, EuclideanNode, ManhattanNode])
+      sg = StreetGraph() if cls is None else StreetGraph(nodeCls = cls)
+      n = rng.randint(3, 20)
+      for i in range(n):
+        sg.add_node(rng.randint(0, 5), rng.randint(0, 5), i)
+      edges = set((rng.randrange(i), i) for i in range(1, n))
+      for _ in range(n):
+        a, b = rng.sample(range(n), 2)
+        if (b, a) not in edges:
+          edges.add((a, b))
+      edges = sorted(edges)
+      shortest = lambda a, b: 0 if cls is None else cls.metric(*(sg.get_xy_coords(a) + sg.get_xy_coords(b)))
+      for a, b in edges:
+        sg.add_edge(a, b, rng.randint(0, 4))
+      if rng.random() < 0.5:
+        sg.freeze()
+      cars = [sg.add_car(*rng.sample(range(n), 2), label = i, speed = rng.choice([0.3, 1, 2])) for i in range(4)]
+      for _ in range(10):
+        changes = []
+        for a, b in rng.sample(edges, rng.randint(1, min(4, len(edges)))):
+          weight = rng.choice([math.inf, 0, 0.5, 1, 3]) + shortest(a, b)
+          if rng.random() < 0.3:
+            changes.append((a, b, weight + 1))
+          changes.append((a, b, weight))
+        sg.update_edges(changes)
+        for car in cars:
+          if car._next_node is None or car._next_node_dist == math.inf:
+            continue
+          expected = sg.shortest_path(car._next_node, car._destination, 'dijkstra')[1]
+          if expected < math.inf:
+            self.assertAlmostEqual(self.remaining(car), expected)
+          car.drive()
+
+  def test_only_affected_cars(self):
+    sg = StreetGraph()
+    for i, label in enumerate("ABCDE"):
+      sg.add_node(i, 0, label)
+    sg.add_edge("A", "B", 1)
+    sg.add_edge("B", "C", 1)
+    sg.add_edge("A", "D", 2)
+    sg.add_edge("D", "C", 2)
+    sg.add_edge("C", "E", 1)
+    car = sg.add_car("A", "E", "bus", 0.5)
+    self.assertEqual(car._route, ["C", "E"])
+    # Longer, but not on the route
+    self.assertEqual(sg.update_edge("D", "C", 3), set())
+    self.assertIsNone(car._planner)
+    # The street being driven gets longer: the car finishes it, then turns back for the detour
+    self.assertEqual(sg.update_edge("B", "C", 10), {car})
+    self.assertEqual((car._next_node, car._next_node_dist), ("B", 1))
+    self.assertEqual(car._route, ["A", "D", "C", "E"])
+    car.drive()
+    car.drive()
+    self.assertEqual((car._next_node, car._next_node_dist), ("A", 1))
+    # The edge the car is on changes length, but its route stays
+    self.assertEqual(sg.update_edge("A", "B", 2), set())
+    self.assertEqual(car._next_node_dist, 2)
+    # A closure the car can't avoid keeps the old route
+    self.assertEqual(sg.update_edge("C", "E", math.inf), set())
+    self.assertEqual(car._route, ["D", "C", "E"])
+
+  def test_route_through_detour(self):
+    sg = StreetGraph()
+    for i, label in enumerate("ABCD"):
+      sg.add_node(i, 0, label)
+    sg.add_edge("A", "B", 1)
+    sg.add_edge("B", "D", 1)
+    sg.add_edge("B", "C", 2)
+    sg.add_edge("C", "D", 2)
+    car = sg.add_car("A", "D", "van", 0.5)
+    self.assertEqual(sg.update_edge("B", "D", math.inf), {car})
+    self.assertEqual(car._route, ["C", "D"])
+    self.assertEqual(sg.update_edge("B", "D", 1), {car})
+    self.assertEqual(car._route, ["D"])
+
+  def test_riders(self):
+    sg = StreetGraph()
+    for i, label in enumerate("ABCDE"):
+      sg.add_node(i, 0, label)
+    for a, b in ("AB", "BC", "CD", "DE", "AE"):
+      sg.add_edge(a, b, 1 if b != "E" else 10)
+    car = sg.add_car("A", "D", "cab")
+    other = sg.add_car("E", "A", "bus", 20)
+    self.assertEqual(sg.update_edge("D", "E", 20), set())
+    legs = lambda car: sorted((sg.node_label(u), sg.node_label(v)) for (u, v), cars in sg._riders.items() if car in cars)
+    self.assertEqual(legs(car), [("A", "B"), ("B", "C"), ("C", "D")])
+    self.assertEqual(legs(other), [("E", "A")])
+    # Passed streets leave the index, and arriving leaves none behind
+    car.drive()
+    self.assertEqual(legs(car), [("B", "C"), ("C", "D")])
+    other.drive()
+    self.assertEqual(legs(other), [])
+    # Only the car driving it hears of a longer street
+    self.assertEqual(sg.update_edge("C", "D", 40), {car})
+    self.assertEqual(car._route, ["B", "A", "E", "D"])
+    self.assertEqual(legs(car), [("A", "E"), ("B", "A"), ("B", "C"), ("C", "B"), ("E", "D")])
+
+  def test_invalid_updates(self):
+    sg = StreetGraph(nodeCls = EuclideanNode)
+    sg.add_node(0, 0, "A")
+    sg.add_node(3, 4, "B")
+    sg.add_node(0, 1, "C")
+    sg.add_edge("A", "B")
+    sg.add_edge("B", "C", directed = True)
+    with self.assertRaises(ValueError):
+      sg.update_edge("A", "B", -1)
+    # No shorter than the straight line, which A* relies on
+    with self.assertRaises(ValueError):
+      sg.update_edge("A", "B", 4)
+    with self.assertRaisesRegex(KeyError, "from C to B"):
+      sg.update_edge("B", "C", 10)
+    # Nothing was changed by the failed updates
+    self.assertEqual(sg.get_edge("A", "B"), 5)
+    sg.update_edge("A", "B", 7)
+    self.assertEqual((sg.get_edge("A", "B"), sg.get_edge("B", "A")), (7, 7))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,210 @@
+import os
+import pickle
+import random
+import shutil
+import tempfile
+import unittest
+from ..components import StreetGraph, EuclideanNode
+from ..edges import NO_LIMIT
+from ..loader import build_graph, load_map
+from ..synthetic import grid_map
+
+def fast_road():
+  # A two step slow road from A to C, and a four step detour through D, E with a speed limit of 3.
+  # Times are lengths at the highest limit, 3: the detour takes 4, the slow road 2 * 3 / 0.5
+  sg = StreetGraph(nodeCls = EuclideanNode)
+  for label, x, y in (("A", 0, 0), ("B", 1, 0), ("C", 2, 0), ("D", 0, 1), ("E", 2, 1)):
+    sg.add_node(x, y, label)
+  sg.add_edge("A", "B", speed_limit = 0.5)
+  sg.add_edge("B", "C", speed_limit = 0.5, capacity = 1)
+  sg.add_edge("A", "D", speed_limit = 3)
+  sg.add_edge("D", "E", speed_limit = 3)
+  sg.add_edge("E", "C", speed_limit = 3)
+  return sg
+
+class TestSpeedLimits(unittest.TestCase):
+
+  def test_travel_time_routing(self):
+    for frozen in (False, True):
+      sg = fast_road()
+      if frozen:
+        sg.freeze()
+      self.assertEqual(sg.get_edge("A", "D"), 1)
+      self.assertEqual(sg.get_edge("D", "E"), 2)
+      self.assertEqual(sg.get_limits("B", "C"), (0.5, 1))
+      self.assertEqual(sg.get_limits("C", "B"), (0.5, 1))
+      for method in ('dijkstra', 'astar', 'bidirectional'):
+        path, time = sg.shortest_path("A", "C", method)
+        self.assertEqual(path, ["A", "D", "E", "C"])
+        self.assertEqual(time, 4)
+      with self.assertRaises(KeyError):
+        sg.get_limits("A", "C")
+
+  def test_no_limits(self):
+    sg = grid_map(3, 3)
+    self.assertIsNone(sg._edges)
+    self.assertEqual(sg.get_limits(0, 1), (NO_LIMIT, NO_LIMIT))
+    self.assertEqual(sg.shortest_path(0, 8), ([0, 1, 2, 5, 8], 4))
+    # Cars heading for node 0 are not done driving
+    car = sg.add_car(8, 0, "cab", 1)
+    for _ in range(4):
+      car.drive()
+    self.assertEqual((car._last_node, car._next_node), (0, None))
+
+  def test_unlimited_streets(self):
+    # A direct street without a limit against a detour twice as long with a limit of 3. Without a limit
+    # a street is no slower than the fastest one, so every car is quicker going direct
+    for frozen in (False, True):
+      sg = StreetGraph()
+      for i, label in enumerate("ABC"):
+        sg.add_node(i, 0, label)
+      sg.add_edge("A", "C", 10)
+      sg.add_edge("A", "B", 10, speed_limit = 3)
+      sg.add_edge("B", "C", 10, speed_limit = 3)
+      if frozen:
+        sg.freeze()
+      self.assertEqual(sg.shortest_path("A", "C"), (["A", "C"], 10))
+      for speed, ticks in ((1, 10), (2, 5), (5, 2)):
+        car = sg.add_car("A", "C", speed, speed)
+        for tick in range(1, 100):
+          car.drive()
+          if car._next_node is None:
+            break
+        self.assertEqual(tick, ticks)
+      # Raising the highest limit retimes the limited streets, lowering it again puts them back
+      sg.set_limit("A", "C", 6)
+      self.assertEqual(sg.shortest_path("A", "B"), (["A", "B"], 20))
+      sg.set_limit("A", "C", NO_LIMIT)
+      self.assertEqual(sg.shortest_path("A", "B"), (["A", "B"], 10))
+      self.assertEqual(sg.shortest_path("A", "C"), (["A", "C"], 10))
+
+  def test_cars_capped(self):
+    sg = StreetGraph()
+    for i, label in enumerate("ABC"):
+      sg.add_node(i, 0, label)
+    sg.add_edge("A", "B", 0.75, speed_limit = 0.5)
+    sg.add_edge("B", "C", 10)
+    car = sg.add_car("A", "C", "racer", 2)
+    car.drive()
+    self.assertEqual((car._next_node, car._next_node_dist_traveled), ("B", 0.5))
+    # Half a step to finish A - B at 0.5, the other half at full speed
+    car.drive()
+    self.assertEqual((car._next_node, car._next_node_dist_traveled), ("C", 1))
+    car.drive()
+    self.assertEqual(car._next_node_dist_traveled, 3)
+    # A limit put on the street being driven applies from the next step
+    sg.set_limit("B", "C", 1.5)
+    car.drive()
+    self.assertEqual(car._next_node_dist_traveled, 4.5)
+    sg.set_limit("B", "C", NO_LIMIT)
+    car.drive()
+    self.assertEqual(car._next_node_dist_traveled, 6.5)
+
+  def test_set_limits_reroutes(self):
+    for frozen in (False, True):
+      sg = fast_road()
+      # The car starts one street before A, so can still choose at A
+      sg.add_node(-1, 0, "S")
+      sg.add_edge("S", "A")
+      sg.set_limits([("A", "D", 0.1, NO_LIMIT)])
+      if frozen:
+        sg.freeze()
+      car = sg.add_car("S", "C", "bus", 0.25)
+      self.assertEqual(car._route, ["B", "C"])
+      self.assertEqual(sg.set_limit("A", "D", 3), {car})
+      self.assertEqual(car._route, ["D", "E", "C"])
+      self.assertEqual(sg.shortest_path("A", "C")[1], 4)
+      # Longer streets take longer at the same limit
+      self.assertEqual(sg.update_edge("D", "E", 20), {car})
+      self.assertEqual(car._route, ["B", "C"])
+      self.assertEqual((sg.get_edge("D", "E"), sg.get_limits("D", "E")), (20, (3, NO_LIMIT)))
+      with self.assertRaises(ValueError):
+        sg.set_limit("A", "B", 0)
+      with self.assertRaises(ValueError):
+        sg.set_limit("A", "B", 1, -1)
+      with self.assertRaises(KeyError):
+        sg.set_limits([("A", "B", 2, 5), ("A", "C", 2, 5)])
+      # Nothing was changed by the failed updates
+      self.assertEqual(sg.get_limits("A", "B"), (0.5, NO_LIMIT))
+
+  def test_freeze_thaw(self):
+    sg = fast_road()
+    sg.freeze()
+    # Frozen, every street has a row, lined up with the CSR slots
+    self.assertEqual(len(sg._edges), len(sg._compact.targets))
+    sg.set_limit("A", "B", 2)
+    copy = pickle.loads(pickle.dumps(sg))
+    for graph in (sg, copy):
+      graph.thaw()
+      # Thawed, only the streets with a limit or capacity have one
+      self.assertEqual(len(graph._edges), 10)
+      self.assertEqual(graph.get_limits("B", "A"), (2, NO_LIMIT))
+      self.assertEqual(graph.get_limits("B", "C"), (0.5, 1))
+      self.assertEqual(graph.shortest_path("A", "B"), (["A", "B"], 1.5))
+      graph.add_edge("A", "E", 3)
+      self.assertEqual(graph.get_limits("A", "E"), (NO_LIMIT, NO_LIMIT))
+
+  def test_all_methods_agree(self):
+    rng = random.Random(5)
+    sg = StreetGraph(nodeCls = EuclideanNode)
+    for x in range(9):
+      for y in range(9):
+        sg.add_node(x + rng.uniform(-0.3, 0.3), y + rng.uniform(-0.3, 0.3), (x, y))
+    for x in range(9):
+      for y in range(9):
+        for other in ((x + 1, y), (x, y + 1)):
+          if max(other) < 9:
+            sg.add_edge((x, y), other, speed_limit = rng.choice([0.5, 1, 2, 4]))
+    sg.select_landmarks(4)
+    pairs = [(rng.choice(sorted(sg._labels)), rng.choice(sorted(sg._labels))) for _ in range(30)]
+    expected = [sg.shortest_path(a, b, 'dijkstra')[1] for a, b in pairs]
+    for method in ('astar', 'bidirectional', 'alt'):
+      for (a, b), time in zip(pairs, expected):
+        self.assertAlmostEqual(sg.shortest_path(a, b, method)[1], time)
+    sg.contract()
+    for (a, b), time in zip(pairs, expected):
+      self.assertAlmostEqual(sg.shortest_path(a, b, 'ch')[1], time)
+
+  def test_congestion(self):
+    sg = fast_road()
+    self.assertEqual(sg.congested_edges(), {})
+    sg.set_limit("A", "D", 0.1)
+    for label in ("van", "truck"):
+      sg.add_car("B", "C", label, 1)
+    self.assertEqual(sg.congested_edges(), {("B", "C"): 2})
+
+  def test_loaded_limits(self):
+    labels = ["A", "B", "C", "D", "E"]
+    x = [0, 1, 2, 0, 2]
+    y = [0, 0, 0, 1, 1]
+    sources = ["A", "B", "A", "D", "E"]
+    targets = ["B", "C", "D", "E", "C"]
+    limits = [0.5, 0.5, 3, 3, 3]
+    capacities = [NO_LIMIT, 1, NO_LIMIT, NO_LIMIT, NO_LIMIT]
+    expected = fast_road()
+    for freeze in (False, True):
+      sg = build_graph(labels, x, y, sources, targets, speed_limits = limits, capacities = capacities, freeze = freeze)
+      self.assertEqual(sorted(sg._arcs()), sorted(expected._arcs()))
+      for a, b in zip(sources + targets, targets + sources):
+        self.assertEqual(sg.get_edge(a, b), expected.get_edge(a, b))
+        self.assertEqual(sg.get_limits(a, b), expected.get_limits(a, b))
+    with self.assertRaises(ValueError):
+      build_graph(labels, x, y, sources, targets, speed_limits = [0.5, 0.5, 3, 0, 3])
+
+    directory = tempfile.mkdtemp()
+    try:
+      nodes = os.path.join(directory, "nodes.csv")
+      edges = os.path.join(directory, "edges.csv")
+      with open(nodes, "w") as f:
+        f.write("label,x,y\n" + "".join("{},{},{}\n".format(*row) for row in zip(labels, x, y)))
+      with open(edges, "w") as f:
+        f.write("source,target,speed_limit\n" + "".join("{},{},{}\n".format(*row) for row in
+                                                         zip(sources, targets, limits)))
+      sg = load_map(nodes, edges)
+      self.assertEqual(sg.shortest_path("A", "C"), (["A", "D", "E", "C"], 4))
+      self.assertEqual(sg.get_limits("C", "B"), (0.5, NO_LIMIT))
+    finally:
+      shutil.rmtree(directory)
+
+if __name__ == '__main__':
+    unittest.main()
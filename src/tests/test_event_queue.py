@@ -1,5 +1,6 @@
 import unittest
-from ..discrete import Environment
+from ..discrete import Environment, BatchHandler
+from ..schedulers import CalendarQueue
 
 class TestDiscreteEventSim(unittest.TestCase):
 
@@ -51,6 +52,274 @@ class TestDiscreteEventSim(unittest.TestCase):
 
     self.assertEqual(x, 122)
 
+  def test_relative_and_fixed_times(self):
+    """ Tests that add_event is relative to now and add_fixed_event is absolute """
+    e = Environment()
+    fired = []
+
+    def later():
+      fired.append(('relative', e.time_elapsed))
+
+    def fixed():
+      fired.append(('fixed', e.time_elapsed))
+
+    def first():
+      fired.append(('first', e.time_elapsed))
+      e.add_event(later, 5)
+      e.add_fixed_event(fixed, 6)
+
+    e.add_event(first, 2)
+    e.run()
+
+    self.assertEqual(fired, [('first', 2), ('fixed', 6), ('relative', 7)])
+
+  def test_same_time_fifo(self):
+    """ Tests that events scheduled for the same time run in insertion order """
+    e = Environment()
+    order = []
+
+    for i in range(10):
+      e.add_event(lambda i=i: order.append(i), 3)
+
+    e.run()
+
+    self.assertEqual(order, list(range(10)))
+    self.assertEqual(e.time_elapsed, 3)
+
+  def test_cancel(self):
+    """ Tests that cancelled events never run and cancelling twice or after running is a no-op """
+    e = Environment()
+    fired = []
+
+    keep = e.add_event(lambda: fired.append('keep'), 1)
+    drop = e.add_event(lambda: fired.append('drop'), 2)
+
+    self.assertTrue(drop.cancel())
+    self.assertFalse(drop.cancel())
+    self.assertEqual(e.pending_events(), 1)
+
+    e.run()
+
+    self.assertEqual(fired, ['keep'])
+    self.assertFalse(keep.pending)
+    self.assertFalse(keep.cancel())
+    self.assertEqual(e.time_elapsed, 1)
+
+  def test_next_event_time_peeks(self):
+    """ Tests that looking at the next event leaves the scheduler untouched """
+    e = Environment(scheduler = CalendarQueue())
+    fired = []
+
+    e.add_event(lambda: fired.append(5), 5)
+    e.add_event(lambda: fired.append(6), 6)
+    e.add_event(lambda: fired.append(1), 1).cancel()
+    self.assertEqual(e.next_event_time(), 5)
+    self.assertEqual(e.pending_events(), 2)
+
+    e.add_event(lambda: fired.append(2), 2)
+    self.assertEqual(e.next_event_time(), 2)
+    e.run()
+
+    self.assertEqual(fired, [2, 5, 6])
+
+  def test_compaction(self):
+    """ Tests that mass cancellation compacts the queue without disturbing the survivors """
+    e = Environment()
+    fired = []
+
+    handles = [e.add_event(lambda i=i: fired.append(i), i) for i in range(1, 5001)]
+    for h in handles[::4]:
+      h.cancel()
+    for h in handles[1::4]:
+      h.cancel()
+    for h in handles[2::4]:
+      h.cancel()
+
+    self.assertLess(len(e.event_queue), 5000)
+    self.assertEqual(e.pending_events(), 1250)
+
+    e.run()
+
+    self.assertEqual(fired, list(range(4, 5001, 4)))
+
+
+  def test_process_timeouts(self):
+    """ Tests that a generator process sleeps for the delays it yields """
+    e = Environment()
+    ticks = []
+
+    def car():
+      for _ in range(3):
+        ticks.append(e.time_elapsed)
+        yield 2
+      return 'arrived'
+
+    p = e.process(car())
+    e.run()
+
+    self.assertEqual(ticks, [0, 2, 4])
+    self.assertFalse(p.alive)
+    self.assertEqual(p.value, 'arrived')
+    self.assertEqual(e.time_elapsed, 6)
+
+  def test_process_signals(self):
+    """ Tests that processes can wait on signals and on each other """
+    e = Environment()
+    green = e.signal()
+    log = []
+
+    def car(name):
+      colour = yield green
+      log.append((name, colour, e.time_elapsed))
+      yield 1
+      return name
+
+    def follower(leader):
+      result = yield leader
+      log.append(('follower', result, e.time_elapsed))
+
+    a = e.process(car('a'))
+    e.process(car('b'))
+    e.process(follower(a))
+    e.add_event(lambda: green.fire('green'), 5)
+    e.run()
+
+    self.assertEqual(log, [('a', 'green', 5), ('b', 'green', 5), ('follower', 'a', 6)])
+
+  def test_process_cancel(self):
+    """ Tests that a cancelled process stops whether it is sleeping or waiting """
+    e = Environment()
+    never = e.signal()
+    steps = []
+
+    def sleeper():
+      while True:
+        steps.append(e.time_elapsed)
+        yield 1
+
+    def waiter():
+      yield never
+      steps.append('woke')
+
+    s = e.process(sleeper())
+    w = e.process(waiter())
+    e.add_event(s.cancel, 2.5)
+    e.add_event(w.cancel, 3)
+    e.add_event(never.fire, 4)
+    e.run()
+
+    self.assertEqual(steps, [0, 1, 2])
+    self.assertFalse(s.alive)
+    self.assertFalse(w.alive)
+    self.assertFalse(s.cancel())
+    self.assertEqual(e.pending_events(), 0)
+
+  def test_process_cancels_itself(self):
+    """ Tests that a process can cancel itself from inside its generator """
+    e = Environment()
+    steps = []
+    procs = []
+
+    def quitter():
+      try:
+        for i in range(5):
+          steps.append(e.time_elapsed)
+          if i == 2:
+            self.assertTrue(procs[0].cancel())
+          yield 1
+      finally:
+        steps.append('closed')
+
+    def follower():
+      value = yield procs[0]
+      steps.append(('follower', value, e.time_elapsed))
+
+    procs.append(e.process(quitter()))
+    e.process(follower())
+    e.run()
+
+    self.assertEqual(steps, [0, 1, 2, 'closed', ('follower', None, 2)])
+    self.assertFalse(procs[0].alive)
+    self.assertFalse(procs[0].cancel())
+    self.assertEqual(e.pending_events(), 0)
+
+  def test_batch_handler(self):
+    """ Tests that a batch handler gets one call per instant with every payload due then """
+    e = Environment()
+    calls = []
+    drive = BatchHandler(lambda ids: calls.append((e.time_elapsed, list(ids))), as_array = True)
+
+    for car in range(5):
+      e.add_event(drive, 1 + car % 2, payload = car)
+    e.add_event(lambda: calls.append((e.time_elapsed, 'plain')), 1)
+
+    e.run()
+
+    self.assertEqual(calls, [(1, [0, 2, 4]), (1, 'plain'), (2, [1, 3])])
+
+  def test_cancel_later_in_batch(self):
+    """ Tests that cancelling not yet run events of the current instant keeps the books straight """
+    e = Environment()
+    fired = []
+    drive = BatchHandler(fired.append)
+
+    canceller = e.add_event(lambda: (plain.cancel(), batched.cancel()), 1)
+    plain = e.add_event(lambda: fired.append('plain'), 1)
+    batched = e.add_event(drive, 1, payload = 'x')
+    e.add_event(drive, 1, payload = 'y')
+
+    e.run()
+
+    self.assertEqual(fired, [['y']])
+    self.assertFalse(canceller.pending)
+    self.assertEqual(e.pending_events(), 0)
+    self.assertEqual(e._tombstones, 0)
+
+  def test_cancel_many_in_batch(self):
+    """ Tests that cancelling more than COMPACT_MIN events of the running batch keeps the count right """
+    e = Environment()
+    ran = []
+    handles = [e.add_event(lambda: ran.append(1), 1) for _ in range(3000)]
+    handles[0].eventfunc = lambda: [h.cancel() for h in handles[1:]]
+    e.add_event(lambda: ran.append(2), 2)
+    e.do_next_batch()
+    self.assertEqual(e._tombstones, 0)
+    self.assertEqual(e.pending_events(), 1)
+    e.run()
+    self.assertEqual(ran, [2])
+
+  def test_periodic(self):
+    """ Tests periodic events with a phase and an end time """
+    e = Environment()
+    sampled = []
+    ticked = []
+
+    e.add_periodic_event(lambda: sampled.append(e.time_elapsed), 2.5, phase = 1, until = 10)
+    tick = e.add_periodic_event(lambda: ticked.append(e.time_elapsed), 1)
+    e.add_fixed_event(tick.cancel, 4.5)
+
+    e.run()
+
+    self.assertEqual(sampled, [1, 3.5, 6, 8.5])
+    self.assertEqual(ticked, [1, 2, 3, 4])
+    self.assertEqual(tick.fired, 4)
+    self.assertEqual(e.pending_events(), 0)
+
+  def test_periodic_cancels_itself(self):
+    """ Tests that a periodic event can stop its own recurrence """
+    e = Environment()
+    ticked = []
+
+    def refresh():
+      ticked.append(e.time_elapsed)
+      if len(ticked) == 3:
+        handle.cancel()
+
+    handle = e.add_periodic_event(refresh, 1, phase = 0)
+    e.run()
+
+    self.assertEqual(ticked, [0, 1, 2])
+    self.assertFalse(handle.pending)
 
 
 if __name__ == '__main__':
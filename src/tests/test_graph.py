@@ -1,3 +1,4 @@
+import math
 import unittest
 from ..components import StreetGraph, EuclideanNode, ManhattanNode
 
@@ -19,6 +20,134 @@ class TestGraph(unittest.TestCase):
     self.assertEqual(dist, 15)
     self.assertEqual(path, ["A", "C", "D"])
 
+  def test_dijkstra_ties_and_unreachable(self):
+    sg = StreetGraph()
+    for label in "ABCDE":
+      sg.add_node(0, 0, label)
+    sg.add_edge("A", "C")
+    sg.add_edge("A", "B")
+    sg.add_edge("C", "D")
+    sg.add_edge("B", "D")
+
+    # Both routes cost 2, the one through the lower node id wins
+    self.assertEqual(sg.shortest_path("A", "D"), (["A", "B", "D"], 2))
+    self.assertEqual(sg.shortest_path("A", "A"), (["A"], 0))
+    self.assertEqual(sg.shortest_path("A", "E"), (["E"], math.inf))
+
+  def test_label_index(self):
+    sg = StreetGraph()
+    self.assertEqual(sg.add_node(0, 0, "A"), 0)
+    self.assertEqual(sg.add_node(3, 4, (1, 2)), 1)
+    self.assertEqual(sg.node_id((1, 2)), 1)
+    self.assertEqual(sg.node_label(0), "A")
+    self.assertEqual(sg.get_xy_coords((1, 2)), (3, 4))
+    with self.assertRaises(Exception):
+      sg.get_xy_coords("B")
+    with self.assertRaises(AssertionError):
+      sg.add_node(1, 1, "A")
+
+  def test_bidirectional(self):
+    sg = StreetGraph()
+    for i, label in enumerate("ABCDEFG"):
+      sg.add_node(i, 0, label)
+    sg.add_edge("A", "B", 2)
+    sg.add_edge("B", "C", 2)
+    sg.add_edge("C", "D", 2)
+    sg.add_edge("A", "E", 1, directed = True)
+    sg.add_edge("E", "D", 1, directed = True)
+    sg.add_edge("D", "F", 1)
+
+    for frozen in (False, True):
+      if frozen:
+        sg.freeze()
+      self.assertEqual(sg.shortest_path("A", "F", 'bidirectional'), (["A", "E", "D", "F"], 3))
+      # The one way streets can't be taken back
+      self.assertEqual(sg.shortest_path("F", "A", 'bidirectional'), (["F", "D", "C", "B", "A"], 7))
+      self.assertEqual(sg.shortest_path("E", "E", 'bidirectional'), (["E"], 0))
+      self.assertEqual(sg.shortest_path("B", "G", 'bidirectional'), (["G"], math.inf))
+
+  def test_astar(self):
+    for nodeCls in (EuclideanNode, ManhattanNode):
+      sg = StreetGraph(nodeCls = nodeCls)
+      for x in range(8):
+        for y in range(8):
+          sg.add_node(x + 0.1 * (y % 3), y, (x, y))
+      for x in range(8):
+        for y in range(8):
+          if x < 7:
+            sg.add_edge((x, y), (x + 1, y))
+          if y < 7:
+            sg.add_edge((x, y), (x, y + 1))
+          if x < 7 and y < 7 and (x + y) % 3 == 0:
+            sg.add_edge((x, y), (x + 1, y + 1))
+
+      for target in ((7, 7), (3, 6), (6, 0)):
+        path, dist = sg.shortest_path((0, 0), target)
+        self.assertAlmostEqual(dist, sg.shortest_path((0, 0), target, 'dijkstra')[1])
+        self.assertAlmostEqual(dist, sum(sg.get_edge(a, b) for a, b in zip(path, path[1:])))
+
+      s = sg._node_from_label((0, 3))
+      t = sg._node_from_label((7, 3))
+      self.assertLess(sg._search(s, t, nodeCls.metric)[2], sg._search(s, t)[2] / 2)
+
+  def test_astar_needs_geometry(self):
+    sg = StreetGraph()
+    sg.add_node(0, 0, "A")
+    sg.add_node(0, 1, "B")
+    sg.add_edge("A", "B", 5)
+    self.assertEqual(sg.shortest_path("A", "B"), (["A", "B"], 5))
+    with self.assertRaises(ValueError):
+      sg.shortest_path("A", "B", 'astar')
+    with self.assertRaises(ValueError):
+      sg.shortest_path("A", "B", 'teleport')
+
+
+class TestTreeCache(unittest.TestCase):
+
+  def setUp(self):
+    self.sg = StreetGraph(nodeCls = ManhattanNode)
+    for x in range(5):
+      for y in range(5):
+        self.sg.add_node(x, y * (1 + x % 2), (x, y))
+    for x in range(5):
+      for y in range(5):
+        if x < 4:
+          self.sg.add_edge((x, y), (x + 1, y))
+        if y < 4:
+          self.sg.add_edge((x, y), (x, y + 1))
+    self.labels = sorted(self.sg._labels)
+
+  def test_routes_from(self):
+    routes = self.sg.routes_from((0, 0), self.labels)
+    for label, route in zip(self.labels, routes):
+      self.assertEqual(route, self.sg.shortest_path((0, 0), label, 'dijkstra'))
+    # Cars leaving the same source are served from the cached tree
+    tree = self.sg.shortest_path_tree((0, 0))
+    car = self.sg.add_car((0, 0), (4, 4), "van")
+    self.assertIs(self.sg.shortest_path_tree((0, 0)), tree)
+    self.assertEqual(car._route[-1], (4, 4))
+
+  def test_lru_bound(self):
+    self.sg.TREE_CACHE_NODES = 60
+    for source in ((0, 0), (1, 1), (2, 2)):
+      self.sg.shortest_path_tree(source)
+    self.assertEqual(list(self.sg._trees), [self.sg._node_from_label(l) for l in ((1, 1), (2, 2))])
+    self.sg.shortest_path_tree((1, 1))
+    self.sg.shortest_path_tree((3, 3))
+    self.assertEqual(list(self.sg._trees), [self.sg._node_from_label(l) for l in ((1, 1), (3, 3))])
+    self.assertEqual(self.sg._tree_nodes, 50)
+
+  def test_invalidated(self):
+    self.sg.shortest_path_tree((0, 0))
+    self.sg.add_edge((0, 0), (4, 4))
+    self.assertEqual(len(self.sg._trees), 0)
+    self.assertEqual(self.sg.shortest_path((0, 0), (4, 4)), ([(0, 0), (4, 4)], 8))
+
+    self.sg.shortest_path_tree((0, 0))
+    self.sg.add_node(9, 9, "new")
+    self.sg.add_edge((4, 4), "new")
+    self.assertEqual(self.sg.routes_from((0, 0), ["new"]), [([(0, 0), (4, 4), "new"], 18)])
+
 
 class TestEuclideanNode(unittest.TestCase):
 
@@ -0,0 +1,79 @@
+import os
+import shutil
+import tempfile
+import unittest
+from ..components import StreetGraph, EuclideanNode, Node
+from ..hierarchy import load_hierarchy
+
+def city(nodeCls = EuclideanNode):
+  # 6x6 grid with jittered intersections, a few diagonals and a one-way street
+  sg = StreetGraph(nodeCls = nodeCls)
+  for x in range(6):
+    for y in range(6):
+      sg.add_node(x + 0.1 * ((x * 7 + y * 3) % 5), y + 0.1 * ((x + y * 5) % 4), (x, y))
+  for x in range(6):
+    for y in range(6):
+      if x < 5:
+        sg.add_edge((x, y), (x + 1, y), 1 + (x * y) % 3)
+      if y < 5:
+        sg.add_edge((x, y), (x, y + 1), 1 + (x + y) % 2)
+      if x < 5 and y < 5 and (x * y) % 4 == 1:
+        sg.add_edge((x, y), (x + 1, y + 1), 2)
+  sg._node_from_label((0, 5)).add_neighbor(sg._node_from_label((5, 0)), 0.5)
+  return sg
+
+class TestContractionHierarchy(unittest.TestCase):
+
+  def check(self, sg):
+    labels = sorted(sg._labels)
+    for source in labels[::5]:
+      for target in labels:
+        path, dist = sg.shortest_path(source, target, 'ch')
+        self.assertAlmostEqual(dist, sg.shortest_path(source, target, 'dijkstra')[1])
+        self.assertEqual((path[0], path[-1]), (source, target))
+        self.assertEqual(dist, sum(sg.get_edge(a, b) for a, b in zip(path, path[1:])))
+
+  def test_matches_dijkstra(self):
+    for nodeCls in (EuclideanNode, Node):
+      sg = city(nodeCls)
+      sg.contract()
+      self.check(sg)
+      # The one-way street only goes one way
+      self.assertEqual(sg.shortest_path((0, 5), (5, 0))[0], [(0, 5), (5, 0)])
+      self.assertGreater(len(sg.shortest_path((5, 0), (0, 5))[0]), 2)
+
+  def test_unreachable(self):
+    sg = city()
+    sg.add_node(20, 20, "island")
+    sg.contract()
+    self.assertEqual(sg.shortest_path((0, 0), "island"), (["island"], float('inf')))
+
+  def test_invalidated(self):
+    sg = city(Node)
+    sg.contract()
+    sg.add_edge((0, 0), (5, 5), 0.25)
+    self.assertIsNone(sg._hierarchy)
+    self.assertEqual(sg.shortest_path((0, 0), (5, 5)), ([(0, 0), (5, 5)], 0.25))
+    with self.assertRaises(ValueError):
+      sg.shortest_path((0, 0), (5, 5), 'ch')
+
+  def test_save_load(self):
+    directory = tempfile.mkdtemp()
+    try:
+      path = os.path.join(directory, "city.ch")
+      city().contract().save(path)
+
+      sg = city()
+      sg.contract(load_hierarchy(path, sg))
+      self.check(sg)
+
+      other = city()
+      other.add_edge((0, 0), (5, 5))
+      with self.assertRaises(ValueError):
+        load_hierarchy(path, other)
+    finally:
+      shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    unittest.main()
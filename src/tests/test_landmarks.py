@@ -0,0 +1,84 @@
+import math
+import random
+import unittest
+from ..components import StreetGraph
+
+def weighted_city(seed = 0):
+  # 8x8 grid of plain nodes with random weights, some one-way streets and an unreachable corner
+  rng = random.Random(seed)
+  sg = StreetGraph()
+  for x in range(8):
+    for y in range(8):
+      sg.add_node(x, y, (x, y))
+  sg.add_node(9, 9, "island")
+  for x in range(8):
+    for y in range(8):
+      if x < 7:
+        sg.add_edge((x, y), (x + 1, y), rng.uniform(1, 10), directed = rng.random() < 0.2)
+      if y < 7:
+        sg.add_edge((x, y), (x, y + 1), rng.uniform(1, 10), directed = rng.random() < 0.2)
+  return sg
+
+class TestLandmarks(unittest.TestCase):
+
+  def check(self, sg):
+    labels = sorted(sg._labels, key = str)
+    for source in labels[::7]:
+      for target in labels:
+        path, dist = sg.shortest_path(source, target, 'alt')
+        self.assertAlmostEqual(dist, sg.shortest_path(source, target, 'dijkstra')[1])
+        if dist < math.inf:
+          self.assertEqual((path[0], path[-1]), (source, target))
+          self.assertAlmostEqual(dist, sum(sg.get_edge(a, b) for a, b in zip(path, path[1:])))
+
+  def test_matches_dijkstra(self):
+    sg = weighted_city()
+    for count in (1, 4, 16):
+      landmarks = sg.select_landmarks(count)
+      self.assertEqual(landmarks.from_.shape, (count, 65))
+      self.assertEqual(len(set(landmarks.nodes.tolist())), count)
+      self.check(sg)
+    sg.freeze()
+    self.check(sg)
+
+  def test_bounds(self):
+    sg = weighted_city()
+    landmarks = sg.select_landmarks(4)
+    t = sg.node_id((3, 4))
+    bound = landmarks.bounds(t)
+    self.assertEqual(bound(t), 0)
+    self.assertEqual(bound(sg.node_id("island")), math.inf)
+    for label in sg._labels:
+      dist = sg.shortest_path(label, (3, 4), 'dijkstra')[1]
+      self.assertLessEqual(bound(sg.node_id(label)), dist + 1e-9)
+
+  def test_fewer_settled(self):
+    sg = StreetGraph()
+    for x in range(20):
+      for y in range(20):
+        sg.add_node(x, y, (x, y))
+    for x in range(20):
+      for y in range(20):
+        if x < 19:
+          sg.add_edge((x, y), (x + 1, y), 1 + (x * y) % 3)
+        if y < 19:
+          sg.add_edge((x, y), (x, y + 1), 1 + (x + y) % 2)
+    landmarks = sg.select_landmarks(8)
+    s = sg._key((0, 10))
+    t = sg._key((19, 10))
+    alt = sg._search(s, t, bound = landmarks.bounds(t._id))
+    plain = sg._search(s, t)
+    self.assertAlmostEqual(alt[0][t], plain[0][t])
+    self.assertLess(alt[2], plain[2] / 2)
+
+  def test_dropped_on_change(self):
+    sg = weighted_city()
+    with self.assertRaises(ValueError):
+      sg.shortest_path((0, 0), (7, 7), 'alt')
+    sg.select_landmarks(2)
+    sg.add_edge((0, 0), (7, 7), 0.5)
+    self.assertIsNone(sg._landmarks)
+    self.assertEqual(sg.shortest_path((0, 0), (7, 7)), ([(0, 0), (7, 7)], 0.5))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+import csv
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from ..components import StreetGraph, EuclideanNode, ManhattanNode, Node
+from ..loader import build_graph, load_map
+
+NODES = [("a", 0, 0), ("b", 3, 4), ("c", 3.5, -1.25), ("d", -2, 7)]
+EDGES = [("a", "b", 2), ("b", "c", 5), ("a", "d", 1.5), ("c", "d", 4)]
+
+def arcs(sg):
+  return {(sg.node_label(u), sg.node_label(v)): w for u, v, w in sg._arcs()}
+
+class TestLoader(unittest.TestCase):
+
+  def setUp(self):
+    self.directory = tempfile.mkdtemp()
+
+  def tearDown(self):
+    shutil.rmtree(self.directory)
+
+  def path(self, name):
+    return os.path.join(self.directory, name)
+
+  def expected(self, nodeCls):
+    sg = StreetGraph(nodeCls = nodeCls)
+    for x, y, label in ((x, y, label) for label, x, y in NODES):
+      sg.add_node(x, y, label)
+    for source, target, weight in EDGES:
+      sg.add_edge(source, target, weight)
+    return arcs(sg)
+
+  def test_formats(self):
+    with open(self.path("nodes.csv"), "w", newline = "") as f:
+      writer = csv.writer(f)
+      writer.writerow(("label", "x", "y"))
+      writer.writerows(NODES)
+    with open(self.path("edges.csv"), "w", newline = "") as f:
+      writer = csv.writer(f)
+      writer.writerow(("source", "target", "weight"))
+      writer.writerows(EDGES)
+    with open(self.path("nodes.json"), "w") as f:
+      json.dump([{"label": l, "x": x, "y": y} for l, x, y in NODES], f)
+    with open(self.path("edges.json"), "w") as f:
+      json.dump([{"source": s, "target": t, "weight": w} for s, t, w in EDGES], f)
+    np.savez(self.path("nodes.npz"), label = [n[0] for n in NODES], x = [n[1] for n in NODES],
+             y = [n[2] for n in NODES])
+    np.savez(self.path("edges.npz"), source = [e[0] for e in EDGES], target = [e[1] for e in EDGES],
+             weight = [e[2] for e in EDGES])
+
+    for nodeCls in (Node, EuclideanNode, ManhattanNode):
+      expected = self.expected(nodeCls)
+      for ext in ("csv", "json", "npz"):
+        for freeze in (False, True):
+          sg = load_map(self.path("nodes." + ext), self.path("edges." + ext), nodeCls, freeze = freeze)
+          self.assertEqual(arcs(sg), expected)
+          self.assertEqual(sg.get_xy_coords("c"), (3.5, -1.25))
+          self.assertEqual(sg._compact is not None, freeze)
+          self.assertEqual(sg.shortest_path("a", "c")[0][0], "a")
+
+  def test_build_graph(self):
+    labels = [(0, 0), (0, 1), (1, 1)]
+    sg = build_graph(labels, [0, 0, 1], [0, 1, 1], [(0, 0), (0, 1)], [(0, 1), (1, 1)],
+                     nodeCls = ManhattanNode, directed = True)
+    self.assertEqual(sg.shortest_path((0, 0), (1, 1)), ([(0, 0), (0, 1), (1, 1)], 2))
+    self.assertEqual(sg.shortest_path((1, 1), (0, 0))[1], float('inf'))
+
+    with self.assertRaises(ValueError):
+      build_graph(labels, [0, 0, 1], [0, 1, 1], [(0, 0), (0, 1)], [(0, 1), (0, 0)])
+    with self.assertRaises(Exception):
+      build_graph(labels, [0, 0, 1], [0, 1, 1], [(0, 0)], [(5, 5)])
+
+
+if __name__ == '__main__':
+    unittest.main()
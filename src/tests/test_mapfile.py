@@ -0,0 +1,110 @@
+import math
+import os
+import pickle
+import shutil
+import tempfile
+import unittest
+from ..components import StreetGraph, Node, ManhattanNode
+from ..mapfile import save_map, open_map
+from ..synthetic import perturbed_grid
+from .test_edges import fast_road
+
+class TestMapFile(unittest.TestCase):
+
+  def setUp(self):
+    self.dir = tempfile.mkdtemp()
+    self.path = os.path.join(self.dir, "city.map")
+
+  def tearDown(self):
+    shutil.rmtree(self.dir)
+
+  def assertSameGraph(self, a, b):
+    self.assertEqual([n._label for n in a._node_list], [n._label for n in b._node_list])
+    self.assertEqual(sorted(a._arcs()), sorted(b._arcs()))
+    self.assertIs(a._nodeCls, b._nodeCls)
+    for node in a._node_list:
+      self.assertEqual(a.get_xy_coords(node._label), b.get_xy_coords(node._label))
+
+  def test_labels(self):
+    for labels in (["A", "Bé", "", "long label"], [3, -1, 7, 10**12], [(0, 0), "x", 5]):
+      sg = StreetGraph(nodeCls = ManhattanNode)
+      for i, label in enumerate(labels):
+        sg.add_node(i, i * i, label)
+      for a, b in zip(labels, labels[1:]):
+        sg.add_edge(a, b)
+      save_map(self.path, sg)
+      loaded = open_map(self.path)
+      self.assertSameGraph(sg, loaded)
+      self.assertEqual(loaded.shortest_path(labels[0], labels[-1]), sg.shortest_path(labels[0], labels[-1]))
+
+  def test_no_edges(self):
+    sg = StreetGraph()
+    sg.add_node(1, 2, "lonely")
+    save_map(self.path, sg)
+    loaded = open_map(self.path)
+    self.assertEqual(loaded.get_xy_coords("lonely"), (1, 2))
+    self.assertEqual(loaded.shortest_path("lonely", "lonely"), (["lonely"], 0))
+
+  def test_routing_data(self):
+    sg = perturbed_grid(12, 12, drop = 0.1, seed = 4)
+    sg.contract()
+    sg.select_landmarks(3)
+    save_map(self.path, sg)
+    loaded = open_map(self.path)
+    self.assertSameGraph(sg, loaded)
+    self.assertEqual(loaded._hierarchy.shortcuts, sg._hierarchy.shortcuts)
+    # Queries read the hierarchy straight from the file's pages
+    for view in loaded._hierarchy._fwd + loaded._hierarchy._bwd:
+      self.assertFalse(view.obj.flags.owndata)
+    copy = pickle.loads(pickle.dumps(loaded._hierarchy))
+    self.assertEqual(copy.node_path(0, 143), loaded._hierarchy.node_path(0, 143))
+    self.assertEqual(loaded._landmarks.from_.shape, (3, 144))
+    for target in (143, 77, 5):
+      expected = sg.shortest_path(0, target, 'dijkstra')[1]
+      for method in ('ch', 'alt', 'dijkstra'):
+        self.assertAlmostEqual(loaded.shortest_path(0, target, method)[1], expected)
+    # Left out on request
+    save_map(self.path, sg, routing = False)
+    loaded = open_map(self.path)
+    self.assertIsNone(loaded._hierarchy)
+    self.assertIsNone(loaded._landmarks)
+
+  def test_speed_limits(self):
+    sg = fast_road()
+    save_map(self.path, sg)
+    loaded = open_map(self.path)
+    self.assertSameGraph(sg, loaded)
+    for a, b, _ in sg._arcs():
+      a, b = sg.node_label(a), sg.node_label(b)
+      self.assertEqual(loaded.get_edge(a, b), sg.get_edge(a, b))
+      self.assertEqual(loaded.get_limits(a, b), sg.get_limits(a, b))
+    self.assertEqual(loaded.shortest_path("A", "C", 'astar'), sg.shortest_path("A", "C", 'astar'))
+
+  def test_shared_and_private(self):
+    sg = StreetGraph(nodeCls = Node)
+    for label in "ABC":
+      sg.add_node(0, 0, label)
+    sg.add_edge("A", "B", 2)
+    sg.add_edge("B", "C", 3)
+    save_map(self.path, sg)
+    first = open_map(self.path)
+    second = open_map(self.path)
+    # Edge arrays are views of the file, not copies
+    self.assertFalse(first._compact.weights.flags.owndata)
+    first.update_edge("A", "B", math.inf)
+    self.assertEqual(first.shortest_path("A", "C")[1], math.inf)
+    # Writes stay in the process that made them
+    self.assertEqual(second.shortest_path("A", "C")[1], 5)
+    self.assertEqual(open_map(self.path).shortest_path("A", "C")[1], 5)
+    first.thaw()
+    first.add_node(1, 1, "D")
+    self.assertEqual(first.get_edge("B", "C"), 3)
+
+  def test_not_a_map(self):
+    with open(self.path, 'wb') as f:
+      f.write(b'EE122SNP' + b'\0' * 64)
+    with self.assertRaises(ValueError):
+      open_map(self.path)
+
+if __name__ == '__main__':
+    unittest.main()
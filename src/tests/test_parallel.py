@@ -0,0 +1,47 @@
+import unittest
+from ..components import StreetGraph, EuclideanNode
+from ..parallel import random_trips, strip_regions, run_sequential, run_parallel
+
+def grid(n):
+  sg = StreetGraph(nodeCls = EuclideanNode)
+  for x in range(n):
+    for y in range(n):
+      sg.add_node(x * 3, y * 2, "{},{}".format(x, y))
+  for x in range(n):
+    for y in range(n):
+      if x + 1 < n:
+        sg.add_edge("{},{}".format(x, y), "{},{}".format(x + 1, y))
+      if y + 1 < n:
+        sg.add_edge("{},{}".format(x, y), "{},{}".format(x, y + 1))
+  return sg
+
+class TestParallel(unittest.TestCase):
+
+  def setUp(self):
+    self.sg = grid(6)
+    self.trips = random_trips(self.sg, 40, seed = 7)
+
+  def test_strip_regions(self):
+    regions = strip_regions(self.sg, 3)
+    self.assertEqual(sorted(regions.values()), [0] * 12 + [1] * 12 + [2] * 12)
+    self.assertEqual(regions["0,5"], 0)
+    self.assertEqual(regions["5,0"], 2)
+
+  def test_matches_sequential(self):
+    """ Tests that the region workers reproduce the sequential run exactly """
+    expected = run_sequential(self.sg, self.trips)
+    self.assertTrue(all(time is not None for time, _ in expected.values()))
+    for k in (1, 3):
+      actual = run_parallel(self.sg, self.trips, strip_regions(self.sg, k))
+      self.assertEqual(actual, expected)
+
+  def test_matches_sequential_until(self):
+    """ Tests that stopping part way leaves every car where the sequential run has it """
+    expected = run_sequential(self.sg, self.trips, until = 6)
+    self.assertTrue(any(time is None for time, _ in expected.values()))
+    actual = run_parallel(self.sg, self.trips, strip_regions(self.sg, 2), until = 6)
+    self.assertEqual(actual, expected)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,93 @@
+import unittest
+
+import numpy as np
+
+from ..components import StreetGraph
+from ..parallel import random_trips, run_sequential, run_parallel
+from ..partition import partition, density
+from ..synthetic import grid_map, random_geometric
+
+def labelled_edges(sg):
+  return sorted((sg.node_label(u), sg.node_label(v), w) for u, v, w in sg._arcs())
+
+class TestPartition(unittest.TestCase):
+
+  def test_grid(self):
+    sg = grid_map(8, 6)
+    p = partition(sg, 4)
+    self.assertEqual(np.bincount(p.parts).tolist(), [12] * 4)
+    self.assertEqual(p.weights.tolist(), [12] * 4)
+    # Four 4 x 3 blocks, 2 * (6 + 8) edges between them
+    self.assertEqual(p.cut(), 28)
+    boundary = p.boundary()
+    self.assertEqual(sum(map(len, boundary)), 28)
+    regions = p.region_of()
+    for region, edges in enumerate(boundary):
+      for a, b in edges:
+        self.assertEqual(regions[a], region)
+        self.assertNotEqual(regions[b], region)
+
+  def test_refinement(self):
+    sg = random_geometric(3000, seed = 4)
+    for k in (2, 3, 8):
+      bisected = partition(sg, k, refine = False)
+      refined = partition(sg, k)
+      self.assertEqual(sorted(set(refined.parts.tolist())), list(range(k)))
+      self.assertLess(refined.cut(), bisected.cut())
+      self.assertLessEqual(refined.weights.max(), 1.03 * 3000 / k)
+      self.assertEqual(refined.cut(), sum(1 for u, v, _ in sg._arcs() if refined.parts[u] != refined.parts[v]))
+      # Seeded
+      self.assertEqual(refined.parts.tolist(), partition(sg, k).parts.tolist())
+
+  def test_weights(self):
+    # Busy streets on the left: the left region holds fewer of them
+    sg = grid_map(10, 4)
+    weights = np.array([5.0 if n._x < 3 else 1.0 for n in sg._node_list])
+    p = partition(sg, 2, weights)
+    self.assertAlmostEqual(p.weights[0], p.weights[1], delta = 5)
+    self.assertLess(np.bincount(p.parts).min(), 12)
+    with self.assertRaises(ValueError):
+      partition(sg, 2, weights[1:])
+    with self.assertRaises(ValueError):
+      partition(sg, 0)
+    with self.assertRaises(ValueError):
+      partition(sg, 41)
+
+  def test_density(self):
+    sg = StreetGraph()
+    for i, label in enumerate("ABCD"):
+      sg.add_node(i, 0, label)
+    sg.add_edge("A", "B")
+    sg.add_edge("B", "C")
+    sg.add_edge("C", "D")
+    self.assertEqual(density(sg, [("A", "C"), ("D", "B")]).tolist(), [2, 3, 3, 2])
+    sg.add_car("B", "D", "van")
+    self.assertEqual(density(sg).tolist(), [1, 2, 2, 2])
+
+  def test_renumber(self):
+    for freeze in (False, True):
+      sg = random_geometric(500, seed = 2, freeze = freeze)
+      p = partition(sg, 5)
+      copy, q = p.renumber()
+      self.assertEqual(q.parts.tolist(), sorted(p.parts.tolist()))
+      self.assertEqual(q.region_of(), p.region_of())
+      self.assertEqual(q.cut(), p.cut())
+      self.assertEqual(labelled_edges(copy), labelled_edges(sg))
+      self.assertEqual(copy._compact is not None, freeze)
+      self.assertEqual(copy.shortest_path(0, 499), sg.shortest_path(0, 499))
+
+  def test_parallel_regions(self):
+    sg = StreetGraph()
+    for x in range(6):
+      for y in range(6):
+        sg.add_node(x, y, (x, y))
+        if x:
+          sg.add_edge((x - 1, y), (x, y))
+        if y:
+          sg.add_edge((x, y - 1), (x, y))
+    trips = random_trips(sg, 30, seed = 3)
+    regions = partition(sg, 3, density(sg, trips)).region_of()
+    self.assertEqual(run_parallel(sg, trips, regions), run_sequential(sg, trips))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,111 @@
+import random
+import unittest
+from ..discrete import Environment
+from ..schedulers import HeapScheduler, CalendarQueue, LadderQueue
+
+BACKENDS = (HeapScheduler, CalendarQueue, LadderQueue)
+
+class TestSchedulers(unittest.TestCase):
+
+  def check_against_heap(self, cls, delay, seed):
+    rng = random.Random(seed)
+    s = cls()
+    ref = HeapScheduler()
+    now = 0
+    for seq in range(3000):
+      if rng.random() < 0.55 or not len(ref):
+        entry = (now + delay(rng), seq)
+        s.push(entry)
+        ref.push(entry)
+      else:
+        entry = ref.pop()
+        self.assertEqual(s.peek(), entry)
+        self.assertEqual(s.pop(), entry)
+        now = entry[0]
+      self.assertEqual(len(s), len(ref))
+      self.assertEqual(sorted(s.entries()), sorted(ref.entries()))
+    while len(ref):
+      self.assertEqual(s.pop(), ref.pop())
+    self.assertRaises(IndexError, s.pop)
+    self.assertRaises(IndexError, s.peek)
+
+  def test_uniform_times(self):
+    """ Tests that every backend pops in the same order as the heap for spread out times """
+    for cls in BACKENDS:
+      self.check_against_heap(cls, lambda rng: rng.random() * 100, 1)
+
+  def test_integer_ticks(self):
+    """ Tests that every backend keeps FIFO order among many same-time tick events """
+    for cls in BACKENDS:
+      self.check_against_heap(cls, lambda rng: rng.randint(0, 3), 2)
+
+  def test_compact(self):
+    """ Tests that compaction drops exactly the dead entries and keeps the order of the rest """
+    for cls in BACKENDS:
+      rng = random.Random(3)
+      s = cls()
+      times = [rng.random() * 100 for _ in range(2000)]
+      for seq, t in enumerate(times):
+        s.push((t, seq))
+      for _ in range(300):
+        s.pop()
+      s.compact(lambda entry: entry[1] % 3)
+      rest = []
+      while len(s):
+        rest.append(s.pop())
+      expected = sorted((t, seq) for seq, t in enumerate(times))[300:]
+      self.assertEqual(rest, [entry for entry in expected if entry[1] % 3])
+
+  def test_environment_backends(self):
+    """ Tests that Environment runs identically on each backend """
+    for cls in BACKENDS:
+      e = Environment(scheduler = cls())
+      order = []
+      for t in (5, 1, 3, 3, 2, 8, 1):
+        e.add_event(lambda t=t: order.append((t, e.time_elapsed)), t)
+      e.run()
+      self.assertEqual(order, [(1, 1), (1, 1), (2, 2), (3, 3), (3, 3), (5, 5), (8, 8)])
+
+  def test_earlier_than_popped(self):
+    """ Tests that every backend takes entries earlier than the last one popped """
+    for cls in BACKENDS:
+      s = cls()
+      for seq, t in enumerate((5, 6, 7, 1)):
+        s.push((t, seq))
+      self.assertEqual(s.pop(), (1, 3))
+      self.assertEqual(s.pop(), (5, 0))
+      s.push((2, 4))
+      self.assertEqual([s.pop() for _ in range(3)], [(2, 4), (6, 1), (7, 2)])
+      # Taken and put back among entries at the same time
+      s.push((9, 5))
+      s.push((9, 6))
+      s.push(s.pop())
+      self.assertEqual([s.pop() for _ in range(2)], [(9, 5), (9, 6)])
+
+  def test_environment_handlers_schedule(self):
+    """ Tests that Environment runs identically on each backend when handlers add events before the next one """
+    results = []
+    for cls in BACKENDS:
+      rng = random.Random(4)
+      e = Environment(scheduler = cls())
+      order = []
+
+      def handler(i):
+        order.append((i, e.time_elapsed))
+        if i < 600:
+          # Somewhere between now and (often) before the next pending event
+          e.add_event(lambda i=i: handler(2 * i + 1), rng.random() * 3)
+          e.add_event(lambda i=i: handler(2 * i + 2), rng.choice([0, 1, 10 * rng.random()]))
+
+      for t in (5, 6, 7):
+        e.add_event(lambda t=t: order.append(('fixed', t)), t)
+      e.add_event(lambda: handler(0), 1)
+      e.run()
+      results.append(order)
+    self.assertIn(('fixed', 7), results[0])
+    self.assertEqual(results[1], results[0])
+    self.assertEqual(results[2], results[0])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,110 @@
+import functools
+import os
+import shutil
+import tempfile
+import unittest
+from .test_parallel import grid
+from ..discrete import Environment, BatchHandler
+from ..schedulers import CalendarQueue, LadderQueue
+from ..snapshot import save_snapshot, load_snapshot, SnapshotError
+
+class Odometer(object):
+  """Picklable batch target counting how far each car was told to drive"""
+  def __init__(self):
+    self.ticks = {}
+
+  def __call__(self, labels):
+    for label in labels:
+      self.ticks[label] = self.ticks.get(label, 0) + 1
+
+def drive_all(sg):
+  for car in sorted(sg._cars, key = lambda c: c._label):
+    if car._next_node is not None:
+      car.drive()
+
+def state(env, sg):
+  cars = sorted(sg._cars, key = lambda c: c._label)
+  return (env.time_elapsed, env.pending_events(),
+          [(c._label, c._last_node, c._next_node, c._next_node_dist_traveled, list(c._route), c.position(),
+            sorted((o._label, v) for o, v in c._linkLife.items())) for c in cars])
+
+class TestSnapshot(unittest.TestCase):
+
+  def setUp(self):
+    self.dir = tempfile.mkdtemp()
+    self.path = os.path.join(self.dir, "warm.snap")
+
+  def tearDown(self):
+    shutil.rmtree(self.dir)
+
+  def warm_up(self, scheduler = LadderQueue):
+    sg = grid(5)
+    env = Environment(scheduler = scheduler())
+    for i, (a, b, speed) in enumerate([("0,0", "4,4", 1.5), ("4,0", "0,3", 0.7), ("2,2", "0,0", 2.2)]):
+      sg.add_car(a, b, "car{}".format(i), speed)
+    c0, c1, c2 = sorted(sg._cars, key = lambda c: c._label)
+    c0.setLinkLife(c1, 3.5)
+    c1.setLinkLife(c2, 0.25)
+    env.add_periodic_event(functools.partial(drive_all, sg), 1, message = "drive", phase = 1, until = 30)
+    odometer = Odometer()
+    c2.odometer = odometer
+    handler = BatchHandler(odometer)
+    for t in range(1, 12):
+      env.add_event(handler, t, payload = c2._label)
+    env.add_event(c1.resetLink, 9)
+    env.run_till_time(4)
+    return env, sg
+
+  def test_restore_continues_identically(self):
+    """ Tests that a restored simulation carries on exactly like the one that was saved """
+    env, sg = self.warm_up()
+    save_snapshot(self.path, env, sg)
+    restored = [load_snapshot(self.path) for _ in range(2)]
+    self.assertEqual(state(*restored[0]), state(env, sg))
+    for pair in [(env, sg)] + restored:
+      pair[0].run()
+    self.assertEqual(state(*restored[0]), state(env, sg))
+    self.assertEqual(state(*restored[1]), state(env, sg))
+    # Events drive the restored cars, not copies of them
+    odometer = next(c for c in restored[0][1]._cars if c._label == "car2").odometer
+    self.assertEqual(odometer.ticks, {"car2": 11})
+
+  def test_save_leaves_queue_alone(self):
+    """ Tests that saving doesn't disturb the simulation being saved """
+    for scheduler in (CalendarQueue, LadderQueue):
+      env, sg = self.warm_up(scheduler)
+      untouched = self.warm_up(scheduler)
+      save_snapshot(self.path, env, sg)
+      restored = load_snapshot(self.path)
+      for pair in (env, sg), untouched, restored:
+        pair[0].run()
+      self.assertEqual(state(env, sg), state(*untouched))
+      self.assertEqual(state(*restored), state(*untouched))
+
+  def test_speed_limits(self):
+    """ Tests that speed limits, and cars capped by them, come back as they were """
+    env, sg = self.warm_up()
+    sg.set_limits([("{},{}".format(x, y), "{},{}".format(x + 1, y), 0.6, 2) for x in range(4) for y in range(5)])
+    save_snapshot(self.path, env, sg)
+    restored_env, restored = load_snapshot(self.path)
+    self.assertEqual(restored.get_limits("1,3", "0,3"), (0.6, 2))
+    self.assertEqual(state(restored_env, restored), state(env, sg))
+    env.run()
+    restored_env.run()
+    self.assertEqual(state(restored_env, restored), state(env, sg))
+
+  def test_processes_refused(self):
+    env, sg = self.warm_up()
+    def car():
+      yield 1
+    env.process(car())
+    self.assertRaises(SnapshotError, save_snapshot, self.path, env, sg)
+
+  def test_closures_refused(self):
+    env, sg = self.warm_up()
+    env.add_event(lambda: None, 1)
+    self.assertRaises(SnapshotError, save_snapshot, self.path, env, sg)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+import math
+import random
+import unittest
+from ..components import StreetGraph
+from ..loader import build_graph
+from ..spatial import GridIndex
+
+class TestGridIndex(unittest.TestCase):
+
+  def brute_nearest(self, points, x, y, k):
+    order = sorted(range(len(points)), key = lambda i: ((points[i][0] - x) ** 2 + (points[i][1] - y) ** 2, i))
+    return order[:k]
+
+  def check(self, points, rng):
+    index = GridIndex([p[0] for p in points], [p[1] for p in points])
+    for _ in range(50):
+      x, y = rng.uniform(-20, 120), rng.uniform(-20, 120)
+      for k in (1, 3, 10):
+        self.assertEqual(index.nearest(x, y, k), self.brute_nearest(points, x, y, k))
+      x0, x1 = sorted((rng.uniform(-10, 110), rng.uniform(-10, 110)))
+      y0, y1 = sorted((rng.uniform(-10, 110), rng.uniform(-10, 110)))
+      self.assertEqual(index.box(x0, y0, x1, y1),
+                       [i for i, (px, py) in enumerate(points) if x0 <= px <= x1 and y0 <= py <= y1])
+      radius = rng.uniform(0, 30)
+      self.assertEqual(index.within(x, y, radius),
+                       [i for i, (px, py) in enumerate(points) if math.hypot(px - x, py - y) <= radius])
+
+  def test_matches_brute_force(self):
+    rng = random.Random(0)
+    self.check([(rng.uniform(0, 100), rng.uniform(0, 100)) for _ in range(500)], rng)
+    # Clustered, on a line, on a lattice with exact ties, and all in one spot
+    self.check([(rng.gauss(20, 2), rng.gauss(70, 2)) for _ in range(300)] + [(90, 5)], rng)
+    self.check([(rng.uniform(0, 100), 50) for _ in range(200)], rng)
+    self.check([(x * 10, y * 10) for x in range(11) for y in range(11)], rng)
+    self.check([(3, 3)] * 20, rng)
+
+  def test_inserts(self):
+    rng = random.Random(1)
+    index = GridIndex()
+    self.assertEqual(index.nearest(0, 0), [])
+    self.assertEqual(index.box(0, 0, 1, 1), [])
+    points = []
+    # Far apart while the cell is still tiny, then many more forcing rebuilds
+    for p in [(0, 0), (1e6, 1e6), (5e5, 0)] + [(rng.uniform(0, 1e6), rng.uniform(0, 1e6)) for _ in range(400)]:
+      self.assertEqual(index.insert(*p), len(points))
+      points.append(p)
+      self.assertEqual(index.nearest(4e5, 3e5, 2), self.brute_nearest(points, 4e5, 3e5, 2))
+    self.assertEqual(len(index), len(points))
+    self.assertLess(len(index._cells), len(points))
+
+
+class TestStreetGraphQueries(unittest.TestCase):
+
+  def test_in_sync_with_add_node(self):
+    sg = StreetGraph()
+    for x in range(10):
+      for y in range(10):
+        sg.add_node(x, y, (x, y))
+    self.assertEqual(sg.nearest_nodes(3.2, 4.4), [(3, 4)])
+    self.assertEqual(sg.nearest_nodes(3.5, 4.5, 4), [(3, 4), (3, 5), (4, 4), (4, 5)])
+    sg.add_node(3.4, 4.4, "roadside")
+    self.assertEqual(sg.nearest_nodes(3.5, 4.5, 2), ["roadside", (3, 4)])
+    self.assertEqual(sg.nodes_in_box(2.5, 3.5, 4, 4.5), [(3, 4), (4, 4), "roadside"])
+    self.assertEqual(sg.nodes_within(0, 0, 1), [(0, 0), (0, 1), (1, 0)])
+    sg.freeze()
+    self.assertEqual(sg.nearest_nodes(9.9, 9.9), [(9, 9)])
+
+  def test_loaded_graph(self):
+    sg = build_graph(["a", "b", "c"], [0, 5, 10], [0, 5, 0], ["a", "b"], ["b", "c"], freeze = True)
+    self.assertEqual(sg.nearest_nodes(6, 6), ["b"])
+    self.assertEqual(sg.nodes_within(10, 1, 2), ["c"])
+
+if __name__ == '__main__':
+    unittest.main()
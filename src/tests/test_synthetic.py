@@ -0,0 +1,66 @@
+import unittest
+
+import numpy as np
+
+from ..components import EuclideanNode, ManhattanNode
+from ..synthetic import grid_map, perturbed_grid, random_geometric, ring_radial
+
+def edges(sg):
+  return sorted((u, v, w) for u, v, w in sg._arcs())
+
+class TestSynthetic(unittest.TestCase):
+
+  def test_grid(self):
+    sg = grid_map(4, 3, spacing = 2)
+    self.assertEqual(len(sg._node_list), 12)
+    # 3 * 3 + 4 * 2 streets, both ways
+    self.assertEqual(len(edges(sg)), 34)
+    self.assertEqual(sg.get_xy_coords(2 * 3 + 1), (4, 2))
+    self.assertEqual(sg.get_edge(0, 1), 2)
+    self.assertEqual(sg.get_edge(0, 3), 2)
+    self.assertEqual(sg.shortest_path(0, 11)[1], 3 * 2 + 2 * 2)
+    self.assertIsInstance(sg._node_list[0], ManhattanNode)
+
+  def test_seeded(self):
+    for make in (lambda seed, freeze: perturbed_grid(6, 5, drop = 0.2, seed = seed, freeze = freeze),
+                 lambda seed, freeze: random_geometric(300, seed = seed, freeze = freeze)):
+      a = make(1, False)
+      self.assertEqual(edges(a), edges(make(1, True)))
+      self.assertEqual([n._x for n in a._node_list], [n._x for n in make(1, False)._node_list])
+      self.assertNotEqual(edges(a), edges(make(2, False)))
+
+  def test_perturbed(self):
+    sg = perturbed_grid(10, 10, jitter = 0.3, drop = 0.25, seed = 0)
+    for node in sg._node_list:
+      self.assertLessEqual(abs(node._x - node._id // 10), 0.3)
+      self.assertLessEqual(abs(node._y - node._id % 10), 0.3)
+    self.assertLess(len(edges(sg)), 360)
+    for u, v, w in edges(sg):
+      self.assertAlmostEqual(w, EuclideanNode.metric(*(sg.get_xy_coords(u) + sg.get_xy_coords(v))))
+
+  def test_random_geometric(self):
+    sg = random_geometric(400, radius = 1.5, seed = 3)
+    xy = np.array([(n._x, n._y) for n in sg._node_list])
+    d = np.hypot(xy[:, None, 0] - xy[None, :, 0], xy[:, None, 1] - xy[None, :, 1])
+    expected = sorted((int(u), int(v)) for u, v in zip(*np.nonzero(d <= 1.5)) if u != v)
+    self.assertEqual([(u, v) for u, v, _ in edges(sg)], expected)
+    # About 6 streets per intersection by default
+    sg = random_geometric(5000, seed = 0, freeze = True)
+    self.assertAlmostEqual(len(sg._compact.targets) / 5000, 6, delta = 0.5)
+
+  def test_ring_radial(self):
+    sg = ring_radial(3, 8, spacing = 10, nodeCls = EuclideanNode)
+    self.assertEqual(len(sg._node_list), 25)
+    # 8 spokes of 3 segments and 3 rings of 8, both ways
+    self.assertEqual(len(edges(sg)), 96)
+    x, y = sg.get_xy_coords(1 + 2 * 8 + 2)
+    self.assertAlmostEqual(x, 0)
+    self.assertAlmostEqual(y, 30)
+    # Across the map through the centre
+    self.assertAlmostEqual(sg.shortest_path(1 + 2 * 8, 1 + 2 * 8 + 4)[1], 60)
+    self.assertEqual(repr(sg._node_list[5]), "5")
+    self.assertRaises(ValueError, ring_radial, 0, 8)
+    self.assertRaises(ValueError, ring_radial, 3, 0)
+
+if __name__ == '__main__':
+    unittest.main()
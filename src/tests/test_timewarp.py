@@ -0,0 +1,40 @@
+import unittest
+from .test_parallel import grid
+from ..parallel import random_trips, strip_regions, run_sequential
+from ..timewarp import run_timewarp
+
+class TestTimeWarp(unittest.TestCase):
+
+  def setUp(self):
+    self.sg = grid(6)
+    self.trips = random_trips(self.sg, 40, seed = 7)
+
+  def test_matches_sequential(self):
+    """ Tests that rolling back stragglers still reproduces the sequential run exactly """
+    expected = run_sequential(self.sg, self.trips)
+    stats = {}
+    actual = run_timewarp(self.sg, self.trips, strip_regions(self.sg, 3), stats = stats)
+    self.assertEqual(actual, expected)
+    self.assertGreater(stats['rollbacks'], 0)
+    self.assertGreater(stats['rolled_back'], 0)
+
+  def test_matches_sequential_until(self):
+    """ Tests that stopping part way leaves every car where the sequential run has it """
+    expected = run_sequential(self.sg, self.trips, until = 6)
+    for optimism in (1, 4, 100):
+      actual = run_timewarp(self.sg, self.trips, strip_regions(self.sg, 2),
+                                until = 6, optimism = optimism)
+      self.assertEqual(actual, expected)
+
+  def test_speed_limits(self):
+    """ Tests that rolled back cars get the speed limit of the street they were on back """
+    self.sg.set_limits([("{},{}".format(x, y), "{},{}".format(x, y + 1), 0.7, 3) for x in range(6) for y in range(5)])
+    trips = random_trips(self.sg, 30, seed = 2)
+    expected = run_sequential(self.sg, trips)
+    stats = {}
+    self.assertEqual(run_timewarp(self.sg, trips, strip_regions(self.sg, 3), stats = stats), expected)
+    self.assertGreater(stats['rollbacks'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
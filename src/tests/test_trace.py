@@ -0,0 +1,89 @@
+import os
+import shutil
+import tempfile
+import unittest
+from ..components import StreetGraph, EuclideanNode
+from ..discrete import Environment, BatchHandler
+from ..trace import Tracer, load_trace, EVENT, PASS, DEPTH
+
+class TestTracer(unittest.TestCase):
+
+  def setUp(self):
+    self.sg = StreetGraph(nodeCls = EuclideanNode)
+    self.sg.add_node(0, 0, 'A')
+    self.sg.add_node(0, 2, 'B')
+    self.sg.add_node(2, 2, 'C')
+    self.sg.add_edge('A', 'B')
+    self.sg.add_edge('B', 'C')
+    self.car = self.sg.add_car('A', 'C', 'ferrari', 1)
+    self.env = Environment()
+    self.env.add_periodic_event(self.car.drive, 1, "drive", until = 4)
+    self.env.add_event(BatchHandler(lambda payloads: None), 2, "batch", payload = 1)
+
+  def test_collects(self):
+    tracer = Tracer()
+    tracer.attach(self.env, self.sg)
+    self.env.run()
+
+    self.assertEqual(tracer.counts, {"drive": 4, "batch": 1})
+    self.assertEqual(sum(tracer.histogram), 5)
+
+    records = tracer.records()
+    strings = tracer.strings()
+    passes = records[records['kind'] == PASS]
+    self.assertEqual([strings[c] for c in passes['code']], ['B', 'C'])
+    self.assertEqual(passes['time'].tolist(), [2, 4])
+    self.assertEqual(set(strings[c] for c in passes['car']), {'ferrari'})
+    self.assertEqual(len(records[records['kind'] == EVENT]), 5)
+
+    times, depths = tracer.queue_depth()
+    self.assertEqual(times.tolist(), [1, 2, 3, 4])
+    self.assertEqual(depths.tolist(), [2, 1, 1, 0])
+
+  def test_ring_buffer_and_dump(self):
+    tracer = Tracer(capacity = 4)
+    tracer.attach(self.env, self.sg)
+    self.env.run()
+    self.assertEqual(len(tracer.records()), 4)
+    self.assertEqual(tracer.records()[-1]['kind'], DEPTH)
+
+    directory = tempfile.mkdtemp()
+    try:
+      path = os.path.join(directory, "run.trace")
+      tracer.dump(path)
+      records, info = load_trace(path)
+    finally:
+      shutil.rmtree(directory)
+    self.assertEqual(records.tolist(), tracer.records().tolist())
+    self.assertEqual(info['counts'], {"drive": 4, "batch": 1})
+    # 5 events, 2 node passes and 4 depth samples
+    self.assertEqual(info['dropped'], 11 - 4)
+
+  def test_cancel_in_batch(self):
+    # Traced batches go through Environment.do_next_batch, tombstone bookkeeping included
+    env = Environment()
+    victims = []
+    env.add_event(lambda: [h.cancel() for h in victims], 1, "killer")
+    victims.extend(env.add_event(lambda: None, 1, "victim") for _ in range(2000))
+    env.add_event(lambda: None, 2, "late")
+    tracer = Tracer()
+    tracer.attach(env)
+    env.do_next_batch()
+    self.assertEqual(tracer.counts, {"killer": 1})
+    self.assertEqual((env._tombstones, env.pending_events()), (0, 1))
+    tracer.detach()
+    self.assertIsNone(env._run_handler)
+
+  def test_detach(self):
+    tracer = Tracer()
+    tracer.attach(self.env, self.sg)
+    tracer.detach()
+    self.assertNotIn('do_next_batch', self.env.__dict__)
+    self.assertIsNone(self.sg._on_pass)
+    self.env.run()
+    self.assertEqual(tracer.counts, {})
+    self.assertEqual(len(tracer.records()), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,231 @@
+import traceback
+from collections import defaultdict
+
+from .discrete import Environment
+from .parallel import DRIVE_PERIOD, _recv, _start_workers, _stop_workers
+
+# Optimistic (Time Warp) parallel simulation of cars driving on a StreetGraph.
+#
+# Regions are logical processes (LPs), each with its own Environment in a worker process, like in
+# parallel.py. Instead of waiting at every lookahead window, each round an LP runs ahead to
+# GVT + optimism and hands off cars immediately. A hand-off that turns up in an LP's past (a
+# straggler) makes that LP roll back: every car step at or after the straggler's time is undone
+# from the undo log, and the hand-offs those steps sent are revoked with anti-messages, which can
+# roll back their receivers in turn.
+#
+# State is saved incrementally: every step logs only the few car fields it is about to change,
+# and copies the route only when the step will pass a node. The street graph itself is never
+# modified while cars drive, so it needs no saving. GVT (global virtual time) is the earliest
+# time any LP or in-flight message could still roll back to; it is computed by the coordinator
+# at the end of each round, and undo records older than GVT are fossil collected.
+
+
+def _save(car):
+  # The car fields a drive() may change. The route only changes when a node will be passed
+  route = None
+  if car._next_node_dist_traveled + car._speed >= car._next_node_dist:
+    route = list(car._route)
+  return (car._last_node, car._next_node, car._next_node_dist, car._next_node_limit, car._next_node_dist_traveled,
+          route)
+
+
+def _restore(car, saved):
+  (car._last_node, car._next_node, car._next_node_dist, car._next_node_limit, car._next_node_dist_traveled,
+   route) = saved
+  if route is not None:
+    car._route = route
+
+
+class _LogicalProcess(object):
+  """One region of a Time Warp run. Cars are keyed by incarnation - ('trip', label) for cars that
+  start here, the message id for cars that were handed in - so a car that leaves and comes back
+  is never confused with its rolled back past self"""
+  def __init__(self, sg, region, region_of):
+    self.sg = sg
+    self.region = region
+    self.region_of = region_of
+    self.env = Environment()
+    self.cars = {}
+    self.pending = {}
+    self.steppers = {}
+    # Undo records in execution order: [time, key, car, saved fields, sent message or None, finished]
+    self.log = []
+    self.log_start = 0
+    self.finished = {}
+    self.outbox = []
+    self.sent = 0
+    self.executed = 0
+    self.rolled_back = 0
+    self.rollbacks = 0
+
+  def add_car(self, key, car, time):
+    car._sg = self.sg
+    self._own(key, car)
+    self.pending[key] = self.env.add_fixed_event(self.steppers[key], time)
+
+  def _own(self, key, car):
+    self.cars[key] = car
+    self.steppers[key] = lambda: self._step(key)
+
+  def _disown(self, key):
+    del self.cars[key]
+    del self.steppers[key]
+
+  def _step(self, key):
+    time = self.env.time_elapsed
+    car = self.cars[key]
+    del self.pending[key]
+    record = [time, key, car, _save(car), None, False]
+    self.log.append(record)
+    self.executed += 1
+    car.drive()
+    if car._next_node is None:
+      self.finished[car._label] = (time, car.position())
+      record[5] = True
+      self._disown(key)
+      return
+    owner = self.region_of[car._last_node]
+    if owner != self.region:
+      message = (self.region, self.sent)
+      self.sent += 1
+      record[4] = (owner, message, time + DRIVE_PERIOD)
+      self.outbox.append(('msg', owner, message, time + DRIVE_PERIOD, car))
+      self._disown(key)
+      return
+    self.pending[key] = self.env.add_fixed_event(self.steppers[key], time + DRIVE_PERIOD)
+
+  def rollback(self, time):
+    # Undo every step taken at or after TIME, newest first
+    log = self.log
+    if len(log) == self.log_start or log[-1][0] < time:
+      return
+    self.rollbacks += 1
+    while len(log) > self.log_start and log[-1][0] >= time:
+      when, key, car, saved, message, finished = log.pop()
+      self.rolled_back += 1
+      if key in self.pending:
+        self.pending.pop(key).cancel()
+      if message is not None:
+        owner, mid, due = message
+        self.outbox.append(('anti', owner, mid, due, None))
+      if finished:
+        del self.finished[car._label]
+      _restore(car, saved)
+      if key not in self.cars:
+        self._own(key, car)
+      self.pending[key] = self.env.add_fixed_event(self.steppers[key], when)
+    self.env.time_elapsed = time
+
+  def deliver(self, incoming):
+    # Roll back far enough for every straggler and anti-message first, then apply them
+    if incoming:
+      self.rollback(min(due for _, _, _, due, _ in incoming))
+    for kind, _, mid, due, car in incoming:
+      if kind == 'msg':
+        self.add_car(mid, car, due)
+      else:
+        # Rolled back to the moment it arrived, so the car is waiting for its first step here
+        self.pending.pop(mid).cancel()
+        self._disown(mid)
+
+  def fossil_collect(self, gvt):
+    # Undo records older than GVT can never be needed again
+    log = self.log
+    start = self.log_start
+    while start < len(log) and log[start][0] < gvt:
+      log[start] = None
+      start += 1
+    if start > len(log) // 2:
+      del log[:start]
+      start = 0
+    self.log_start = start
+
+  def run_before(self, horizon):
+    env = self.env
+    while True:
+      time = env.next_event_time()
+      if time is None or time >= horizon:
+        return time
+      env.do_next_batch()
+
+
+def _lp_worker(conn, sg, region, region_of, trips):
+  try:
+    lp = _LogicalProcess(sg, region, region_of)
+    for origin, destination, label, speed in trips:
+      lp.add_car(('trip', label), sg._carCls(origin, destination, label, sg, speed), DRIVE_PERIOD)
+    conn.send(('ok', [], lp.env.next_event_time()))
+
+    while True:
+      message = conn.recv()
+      if message[0] == 'finish':
+        reported = [(car._label, None, car.position()) for car in lp.cars.values()]
+        reported += [(label, time, position) for label, (time, position) in lp.finished.items()]
+        conn.send(('ok', reported, (lp.executed, lp.rolled_back, lp.rollbacks)))
+        return
+      _, horizon, gvt, incoming = message
+      lp.fossil_collect(gvt)
+      lp.deliver(incoming)
+      next_time = lp.run_before(horizon)
+      conn.send(('ok', lp.outbox, next_time))
+      lp.outbox = []
+  except Exception:
+    conn.send(('error', traceback.format_exc()))
+
+
+def run_timewarp(sg, trips, region_of, until = None, optimism = 20 * DRIVE_PERIOD, stats = None):
+  # Same results as parallel.run_sequential, computed by optimistic region workers that run up to
+  # OPTIMISM time units past GVT each round. Pass a dict as STATS to get event and rollback counts
+  conns, workers = _start_workers(_lp_worker, sg, trips, region_of)
+  k = len(conns)
+
+  results = {}
+  totals = defaultdict(int)
+  try:
+    next_times = [_recv(conn)[1] for conn in conns]
+    inboxes = [[] for _ in range(k)]
+    while True:
+      pending = [t for t in next_times if t is not None] + [m[3] for box in inboxes for m in box]
+      if not pending:
+        break
+      gvt = min(pending)
+      if until is not None and gvt >= until:
+        break
+      horizon = gvt + optimism
+      if until is not None:
+        horizon = min(horizon, until)
+      for r, conn in enumerate(conns):
+        conn.send(('round', horizon, gvt, inboxes[r]))
+      inboxes = [[] for _ in range(k)]
+      for r, conn in enumerate(conns):
+        outbox, next_times[r] = _recv(conn)
+        for message in outbox:
+          box = inboxes[message[1]]
+          if message[0] == 'anti':
+            # A message still in flight is simply annihilated with its anti-message
+            match = [m for m in box if m[0] == 'msg' and m[2] == message[2]]
+            if match:
+              box.remove(match[0])
+              continue
+          box.append(message)
+      totals['rounds'] += 1
+
+    # Cars still waiting in an inbox are in flight between regions
+    for box in inboxes:
+      for kind, _, _, _, car in box:
+        car._sg = sg
+        results[car._label] = (None, car.position())
+    for conn in conns:
+      conn.send(('finish',))
+    for conn in conns:
+      reported, (executed, rolled_back, rollbacks) = _recv(conn)
+      for label, time, position in reported:
+        results[label] = (time, position)
+      totals['executed'] += executed
+      totals['rolled_back'] += rolled_back
+      totals['rollbacks'] += rollbacks
+  finally:
+    _stop_workers(workers)
+  if stats is not None:
+    stats.update(totals)
+  return results
@@ -0,0 +1,144 @@
+import json
+import struct
+import time as _time
+
+import numpy as np
+
+from .discrete import Environment
+
+# Structured tracing for an Environment and the cars on a StreetGraph.
+#
+# Nothing is traced until a Tracer is attached, and an untraced simulation pays one None check per
+# event: attaching sets the environment's _run_handler hook to a timed call, shadows its
+# do_next_event/do_next_batch on that one instance to sample the queue depth after each, and sets the
+# street graph's node-passing hook, which Car.drive only calls when it is set. Detaching puts
+# everything back.
+#
+# What gets collected:
+#   counts       events run per message (event type)
+#   histogram    handler wall time, bucket i holds calls that took [2**(i-1), 2**i) ns
+#   ring buffer  the latest CAPACITY records - one per event run, one per node passed by a car and
+#                one queue depth sample per batch - readable with records() or dumped to a file
+
+EVENT = 0
+PASS = 1
+DEPTH = 2
+
+RECORD = np.dtype([('kind', '<u1'), ('time', '<f8'), ('code', '<i4'), ('car', '<i4'), ('value', '<f8')])
+
+MAGIC = b'EE122TRC'
+VERSION = 1
+_HEADER = struct.Struct('<8sIQQ')
+
+
+class Tracer(object):
+  """Collects counters, a handler wall-time histogram and a ring buffer of trace records"""
+  def __init__(self, capacity = 1 << 16):
+    self.capacity = capacity
+    self.counts = {}
+    self.histogram = [0] * 64
+    self._ring = [None] * capacity
+    self._written = 0
+    # Messages, node labels and car labels are stored in records as indexes into this table
+    self._strings = []
+    self._codes = {}
+    self._env = None
+    self._sg = None
+
+  def _code(self, obj):
+    code = self._codes.get(obj)
+    if code is None:
+      code = self._codes[obj] = len(self._strings)
+      self._strings.append(obj)
+    return code
+
+  def _record(self, kind, time, code, car, value):
+    self._ring[self._written % self.capacity] = (kind, time, code, car, value)
+    self._written += 1
+
+  def attach(self, env, sg = None):
+    assert self._env is None
+    self._env = env
+    env.do_next_event = self._do_next_event
+    env.do_next_batch = self._do_next_batch
+    env._run_handler = self._timed
+    if sg is not None:
+      self._sg = sg
+      sg._on_pass = self._passed
+
+  def detach(self):
+    del self._env.do_next_event
+    del self._env.do_next_batch
+    self._env._run_handler = None
+    self._env = None
+    if self._sg is not None:
+      self._sg._on_pass = None
+      self._sg = None
+
+  def _passed(self, car, label):
+    self._record(PASS, self._env.time_elapsed, self._code(label), self._code(car._label), 0)
+
+  def _timed(self, handle, args):
+    # Run one handler, counting and timing it
+    message = handle.message
+    self.counts[message] = self.counts.get(message, 0) + 1
+    start = _time.perf_counter_ns()
+    handle.eventfunc(*args)
+    elapsed = _time.perf_counter_ns() - start
+    self.histogram[min(elapsed.bit_length(), 63)] += 1
+    self._record(EVENT, self._env.time_elapsed, self._code(message), -1, elapsed)
+
+  def _do_next_event(self):
+    env = self._env
+    Environment.do_next_event(env)
+    self._record(DEPTH, env.time_elapsed, -1, -1, env.pending_events())
+
+  def _do_next_batch(self):
+    # Environment.do_next_batch, followed by a queue depth sample
+    env = self._env
+    Environment.do_next_batch(env)
+    self._record(DEPTH, env.time_elapsed, -1, -1, env.pending_events())
+
+  def records(self):
+    # The ring buffer contents, oldest first, as a RECORD array
+    if self._written <= self.capacity:
+      rows = self._ring[:self._written]
+    else:
+      start = self._written % self.capacity
+      rows = self._ring[start:] + self._ring[:start]
+    return np.array(rows, dtype = RECORD)
+
+  def strings(self):
+    return list(self._strings)
+
+  def queue_depth(self):
+    # (times, depths) of the depth samples still in the ring buffer
+    records = self.records()
+    depth = records[records['kind'] == DEPTH]
+    return depth['time'], depth['value'].astype(np.int64)
+
+  def dump(self, path):
+    # Write the ring buffer, string table, counters and histogram to a binary file for offline analysis
+    info = json.dumps({
+      'strings': [str(s) for s in self._strings],
+      'counts': {str(k): v for k, v in self.counts.items()},
+      'histogram': self.histogram,
+      'dropped': max(0, self._written - self.capacity),
+    }).encode('utf-8')
+    records = self.records()
+    with open(path, 'wb') as f:
+      f.write(_HEADER.pack(MAGIC, VERSION, len(info), len(records)))
+      f.write(info)
+      f.write(records.tobytes())
+
+
+def load_trace(path):
+  # Read a Tracer.dump file back. Returns (records, info) where info has the string table,
+  # counters, histogram and the number of records dropped by the ring buffer
+  with open(path, 'rb') as f:
+    magic, version, info_len, n = _HEADER.unpack(f.read(_HEADER.size))
+    if magic != MAGIC or version != VERSION:
+      raise ValueError("{} is not a version {} trace file".format(path, VERSION))
+    info = json.loads(f.read(info_len).decode('utf-8'))
+    records = np.frombuffer(f.read(n * RECORD.itemsize), dtype = RECORD)
+  return records, info